@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Response-time and manager-load analytics over a parsed chat, vectorized.
+
+The chat is parsed once into flat NumPy arrays (timestamp, manager code,
+hour); everything after that is array arithmetic over all messages at once:
+- question -> first manager reply latency (searchsorted on reply positions)
+- per-manager p50 / p90 / p99 latency
+- unanswered-question rate (overall, per hour of day)
+- hourly load curves: messages per manager per hour, questions per hour
+
+Output: src/data/response-times.json
+"""
+
+import re
+import sys
+import time as timer
+from datetime import date as Date
+
+from chat_export import iter_chat_lines
+from artifact_store import write_json
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required: pip install numpy")
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/response-times.json"
+
+MESSAGE_PATTERN = re.compile(r'\[(\d+)\.(\d+)\.(\d+), (\d+):(\d+):(\d+)\] ([^:]+): (.+)')
+
+MANAGERS = {
+    "nevo": ["Nevo Perets", "נבו פרץ", "נבו"],
+    "hila": ["Hila Peretz", "הילה פרץ", "הילה"],
+    "sari": ["Sari Peretz", "שרי פרץ", "שרי"],
+    "yeshi": ["Yeshi Peretz", "ישי פרץ", "ישי"],
+}
+MANAGER_IDS = list(MANAGERS)
+EMPLOYEE = -1
+
+# A question with no manager reply within this window is unanswered
+REPLY_WINDOW_SECONDS = 24 * 60 * 60
+PERCENTILES = [50, 90, 99]
+
+def clean_text(text):
+    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
+
+def parse_arrays(filepath):
+    """
+    One pass over the chat into columns:
+    ts (epoch seconds, local time), role (manager index or EMPLOYEE), is_question.
+    """
+    ts, role, is_question = [], [], []
+    day_cache = {}
+    sender_cache = {}
+
+    for line in iter_chat_lines(filepath):
+        match = MESSAGE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        d, m, y, hh, mm, ss, sender, text = match.groups()
+        text = clean_text(text)
+        if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
+            continue
+
+        day_key = (d, m, y)
+        day = day_cache.get(day_key)
+        if day is None:
+            year = int(y) + 2000 if len(y) == 2 else int(y)
+            day = day_cache[day_key] = Date(year, int(m), int(d)).toordinal() * 86400
+
+        code = sender_cache.get(sender)
+        if code is None:
+            sender_clean = clean_text(sender)
+            code = EMPLOYEE
+            for i, manager_id in enumerate(MANAGER_IDS):
+                if any(name in sender_clean for name in MANAGERS[manager_id]):
+                    code = i
+                    break
+            sender_cache[sender] = code
+
+        ts.append(day + int(hh) * 3600 + int(mm) * 60 + int(ss))
+        role.append(code)
+        is_question.append(code == EMPLOYEE and len(text) >= 3 and '<מצורף:' not in text)
+
+    return (
+        np.array(ts, dtype=np.int64),
+        np.array(role, dtype=np.int8),
+        np.array(is_question, dtype=bool)
+    )
+
+def percentiles(values):
+    if values.size == 0:
+        return {f'p{p}': None for p in PERCENTILES}
+    result = np.percentile(values, PERCENTILES)
+    return {f'p{p}': round(float(v), 1) for p, v in zip(PERCENTILES, result)}
+
+def analyze(ts, role, is_question):
+    n_managers = len(MANAGER_IDS)
+    hour = (ts % 86400) // 3600
+
+    manager_pos = np.flatnonzero(role >= 0)
+    question_pos = np.flatnonzero(is_question)
+
+    # First manager message after each question (by position, so same-second replies count).
+    # A sentinel slot past the end stands for "no reply at all".
+    reply_slot = np.searchsorted(manager_pos, question_pos, side='right')
+    reply_ts = np.append(ts[manager_pos], np.iinfo(np.int64).max // 2)[reply_slot]
+    reply_role = np.append(role[manager_pos], EMPLOYEE)[reply_slot]
+    latency_min = (reply_ts - ts[question_pos]) / 60.0
+    answered = latency_min <= REPLY_WINDOW_SECONDS / 60
+    replier = np.where(answered, reply_role, EMPLOYEE)
+
+    question_hour = hour[question_pos]
+    questions_per_hour = np.bincount(question_hour, minlength=24)
+    unanswered_per_hour = np.bincount(question_hour[~answered], minlength=24)
+
+    # Manager load: messages per (manager, hour)
+    load = np.bincount(role[manager_pos].astype(np.int64) * 24 + hour[manager_pos],
+                       minlength=n_managers * 24).reshape(n_managers, 24)
+    answered_by = np.bincount(replier[answered].astype(np.int64), minlength=n_managers)
+
+    per_manager = {}
+    for i, manager_id in enumerate(MANAGER_IDS):
+        mine = latency_min[replier == i]
+        if load[i].sum() == 0 and mine.size == 0:
+            continue
+        per_manager[manager_id] = {
+            'messages': int(load[i].sum()),
+            'questions_answered': int(answered_by[i]),
+            'latency_minutes': percentiles(mine),
+            'hourly_messages': load[i].tolist()
+        }
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        unanswered_rate_per_hour = np.where(questions_per_hour > 0,
+                                            unanswered_per_hour / questions_per_hour, 0.0)
+
+    return {
+        'total_messages': int(ts.size),
+        'total_questions': int(question_pos.size),
+        'answered_questions': int(answered.sum()),
+        'unanswered_rate': round(float(1 - answered.mean()), 4) if question_pos.size else None,
+        'latency_minutes': percentiles(latency_min[answered]),
+        'per_manager': per_manager,
+        'hourly_questions': questions_per_hour.tolist(),
+        'hourly_unanswered_rate': [round(float(r), 4) for r in unanswered_rate_per_hour]
+    }
+
+def main():
+    start = timer.perf_counter()
+    ts, role, is_question = parse_arrays(CHAT_FILE)
+    parsed = timer.perf_counter()
+    stats = analyze(ts, role, is_question)
+    done = timer.perf_counter()
+
+    print(f"Messages: {stats['total_messages']}, questions: {stats['total_questions']}")
+    print(f"Parse: {parsed - start:.3f}s, analytics: {done - parsed:.4f}s")
+    print(f"Unanswered rate: {stats['unanswered_rate']}")
+    print(f"Latency (min): {stats['latency_minutes']}")
+    print("\nPer manager:")
+    for manager_id, m in stats['per_manager'].items():
+        print(f"  {manager_id}: {m['messages']} messages, {m['questions_answered']} answers, "
+              f"latency {m['latency_minutes']}")
+
+    stats['window_hours'] = REPLY_WINDOW_SECONDS // 3600
+    write_json(OUTPUT_FILE, stats)
+
+    print(f"\nSaved to {OUTPUT_FILE}")
+
+if __name__ == '__main__':
+    main()
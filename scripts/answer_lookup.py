@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Exact-match answer lookup table for approved automation patterns.
+
+Every example question of an approved pattern (status 'approved'; pending
+and rejected patterns never answer blindly) is reduced to a signature: its keywords (stop words
+dropped, see hebrew_text.py), stemmed, deduplicated and sorted, so word
+order, punctuation and prefixes do not matter. The table maps the first 16
+hex chars of sha256(signature) to an index into a shared answers list:
+
+  {"keys": {"<hash>": 0, ...}, "answers": [{"answer", "media", ...}, ...]}
+
+A question whose signature is in the table is answered with one hash
+lookup, no retrieval or model call. A signature shared by patterns with
+different answers is ambiguous and left out, so those questions still go
+through retrieval.
+
+Extractors write new patterns as pending_approval; a status set on the
+knowledge file (approved or rejected) is carried to the same pattern id in
+the next build (knowledge_ids.carry_forward), so approvals survive
+re-extraction.
+
+The ingestion pipeline (ingest_pipeline.py) rebuilds the table after every
+extraction, as TENANT_OUTPUT_DIR/<tenant>-answer-lookup.json next to the
+tenant's knowledge file.
+
+Usage:
+  answer_lookup.py                        # build from automation-knowledge.json
+  answer_lookup.py --source src/data/tenants/amir-bnei-brak-automation-knowledge.json --output ...
+  answer_lookup.py --query "מי סוגר היום?"
+"""
+
+import json
+import hashlib
+import argparse
+
+from hebrew_text import extract_keywords, stem_hebrew
+from artifact_store import write_json
+
+AUTOMATION_FILE = "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json"
+OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/answer-lookup.json"
+
+# Fewer keywords than this are too generic to answer blindly ("מה קורה?")
+MIN_KEYWORDS = 2
+KEY_LENGTH = 16
+
+def signature(question):
+    stems = {stem_hebrew(word) for word in extract_keywords(question)}
+    return ' '.join(sorted(stems)) if len(stems) >= MIN_KEYWORDS else None
+
+def signature_key(question):
+    sig = signature(question)
+    if sig is None:
+        return None
+    return hashlib.sha256(sig.encode('utf-8')).hexdigest()[:KEY_LENGTH]
+
+def is_approved(item):
+    return item.get('status') == 'approved'
+
+def build_table(items):
+    """(table, stats) from automation knowledge items."""
+    owners, answers = {}, []
+    stats = {'patterns': 0, 'questions': 0, 'too_generic': 0, 'ambiguous': 0}
+
+    for item in sorted(filter(is_approved, items), key=lambda i: -i.get('frequency', 0)):
+        stats['patterns'] += 1
+        index = len(answers)
+        answers.append({
+            'answer': item.get('raw_answer') or item.get('contentHe') or item.get('content'),
+            'media': [
+                {k: m[k] for k in ('filename', 'type', 'url', 'thumbnailUrl') if k in m}
+                for m in item.get('associated_media') or []
+            ],
+            'manager_name': item.get('manager_name'),
+            'categorySlug': item.get('categorySlug'),
+            'frequency': item.get('frequency', 0),
+        })
+        for question in [item.get('titleHe') or item.get('title')] + (item.get('example_questions') or []):
+            if not question:
+                continue
+            key = signature_key(question)
+            if key is None:
+                stats['too_generic'] += 1
+                continue
+            owners.setdefault(key, set()).add(index)
+
+    keys = {}
+    for key, indexes in owners.items():
+        if len(indexes) > 1:
+            stats['ambiguous'] += 1
+        else:
+            keys[key] = indexes.pop()
+    stats['questions'] = len(keys)
+
+    # Keep only answers some key still points to
+    used = {index: i for i, index in enumerate(sorted(set(keys.values())))}
+    keys = {key: used[index] for key, index in keys.items()}
+    answers = [answers[index] for index in sorted(used)]
+
+    return {'keys': keys, 'answers': answers}, stats
+
+def lookup(table, question):
+    """The answer entry for question, or None."""
+    key = signature_key(question)
+    index = table['keys'].get(key) if key else None
+    return table['answers'][index] if index is not None else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=AUTOMATION_FILE)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--query', help='look a question up in the built table')
+    args = parser.parse_args()
+
+    if args.query:
+        with open(args.output, 'r', encoding='utf-8') as f:
+            entry = lookup(json.load(f), args.query)
+        print(json.dumps(entry, ensure_ascii=False, indent=2) if entry else "No exact match")
+        return
+
+    with open(args.source, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    items = data['items'] if isinstance(data, dict) else data
+
+    table, stats = build_table(items)
+    table['signature'] = f"sha256(sorted stemmed keywords joined by ' ')[:{KEY_LENGTH}], min {MIN_KEYWORDS} keywords"
+
+    write_json(args.output, table, keep=0, indent=None, separators=(',', ':'))
+
+    print(f"Approved patterns: {stats['patterns']} of {len(items)}")
+    print(f"Question signatures: {stats['questions']} "
+          f"({stats['too_generic']} too generic, {stats['ambiguous']} ambiguous)")
+    print(f"\nSaved to {args.output}")
+
+if __name__ == '__main__':
+    main()
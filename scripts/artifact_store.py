@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Crash-safe writes for the JSON artifacts the app imports, with rollback.
+
+write_json() never touches the live file until the new content is complete:
+
+  1. serialize, write to a temp file in the same directory, fsync
+  2. hard-link the current live file into GENERATIONS_DIR/<name>-<hash>/<n>.json
+  3. os.replace(temp, live) and fsync the directory
+
+A crash at any point leaves either the old or the new file in place, never a
+truncated one. Readers that open the live path see one whole generation even
+while a rebuild is running; read_json(path, generation=n) reads an older one.
+The last KEEP_GENERATIONS previous versions are kept for rollback. <hash>
+is of the absolute path, so same-named files in different directories (one
+rollup per company, one knowledge file per tenant) keep separate histories.
+
+A merge that rewrites the file it reads (whatsapp-faqs.json) keeps what it
+read in a base file (save_base) and, while its output is still live, merges
+from that base again (load_base), so a re-run does not merge its own output.
+
+Usage:
+  artifact_store.py list src/data/whatsapp-faqs.json
+  artifact_store.py rollback src/data/whatsapp-faqs.json [--generation N]
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import argparse
+from datetime import datetime
+
+GENERATIONS_DIR = "/Users/avivgranot/klear-ai/.cache/generations"
+KEEP_GENERATIONS = 5
+
+def generations_path(path, generations_dir=GENERATIONS_DIR):
+    path = os.path.abspath(path)
+    digest = hashlib.sha256(path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(generations_dir, f"{os.path.basename(path)}-{digest}")
+
+def generation_file(path, generation, generations_dir=GENERATIONS_DIR):
+    return os.path.join(generations_path(path, generations_dir), f"{generation}.json")
+
+def list_generations(path, generations_dir=GENERATIONS_DIR):
+    """Stored generation numbers of path, oldest first."""
+    directory = generations_path(path, generations_dir)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[:-5]) for name in os.listdir(directory)
+                  if name.endswith('.json') and name[:-5].isdigit())
+
+def fsync_dir(directory):
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def keep_generation(path, generations_dir=GENERATIONS_DIR, keep=KEEP_GENERATIONS):
+    """Store the current live file as the next generation and prune old ones."""
+    if keep <= 0 or not os.path.exists(path):
+        return None
+    existing = list_generations(path, generations_dir)
+    generation = existing[-1] + 1 if existing else 1
+    target = generation_file(path, generation, generations_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(path, target)
+    except OSError:
+        # Different filesystem or no hard-link support
+        shutil.copy2(path, target)
+    for old in (existing + [generation])[:-keep]:
+        os.remove(generation_file(path, old, generations_dir))
+    return generation
+
+def write_bytes(path, data, generations_dir=GENERATIONS_DIR, keep=KEEP_GENERATIONS):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        keep_generation(path, generations_dir, keep)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_dir(directory)
+
+def write_json(path, data, generations_dir=GENERATIONS_DIR, keep=KEEP_GENERATIONS, **dump_args):
+    """Atomically replace path with data as JSON (ensure_ascii=False, indent=2 by default)."""
+    dump_args = {'ensure_ascii': False, 'indent': 2, **dump_args}
+    write_bytes(path, json.dumps(data, **dump_args).encode('utf-8'), generations_dir, keep)
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_base(path, base_file):
+    """
+    The content of path before a merge that rewrites it in place: the items
+    saved in base_file while path is still the output written with them,
+    else path itself (another build replaced it, so it is the new base).
+    """
+    if os.path.exists(base_file):
+        with open(base_file, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        if base.get('output_sha256') == file_hash(path):
+            print(f"{os.path.basename(path)} is the previous merge output, merging from its base")
+            return base['items']
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_base(path, base_file, items):
+    """Record items as the base of the output just written to path."""
+    write_json(base_file, {'output_sha256': file_hash(path), 'items': items}, keep=0)
+
+def read_json(path, generation=None, generations_dir=GENERATIONS_DIR):
+    """The live file, or a stored generation of it."""
+    if generation is not None:
+        path = generation_file(path, generation, generations_dir)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def rollback(path, generation=None, generations_dir=GENERATIONS_DIR, keep=KEEP_GENERATIONS):
+    """Restore a generation (default: the latest) as the live file; the replaced one is kept too."""
+    existing = list_generations(path, generations_dir)
+    if not existing:
+        raise FileNotFoundError(f"No stored generations of {path}")
+    if generation is None:
+        generation = existing[-1]
+    with open(generation_file(path, generation, generations_dir), 'rb') as f:
+        data = f.read()
+    write_bytes(path, data, generations_dir, keep)
+    return generation
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['list', 'rollback'])
+    parser.add_argument('path')
+    parser.add_argument('--generation', type=int)
+    parser.add_argument('--generations-dir', default=GENERATIONS_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for generation in list_generations(args.path, args.generations_dir):
+            stored = generation_file(args.path, generation, args.generations_dir)
+            modified = datetime.fromtimestamp(os.path.getmtime(stored)).isoformat(timespec='seconds')
+            print(f"  {generation}: {modified} ({os.path.getsize(stored) / 1024:.0f}KB)")
+        return
+
+    try:
+        generation = rollback(args.path, args.generation, args.generations_dir)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    print(f"Restored generation {generation} of {args.path}")
+
+if __name__ == '__main__':
+    main()
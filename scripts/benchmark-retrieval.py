@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval benchmark: quality and latency per engine and KB size.
+
+Ground truth is the question -> answer pairs mined from the chat
+(all-conversations.json, top_qa_pairs in top-repetitive.json). Every distinct
+answer becomes a KB document; questions are split into folds, and a fold's
+questions are held out as queries while the other folds' questions are
+attached to their answers as example_questions.
+
+Engines:
+- static:  Python port of the ai-static.ts scorer (calculateSimilarity),
+           a linear scan over every item
+- bm25:    the FTS5 index from search_index.py
+- trigram:   hashed character-trigram TF-IDF vectors, brute-force cosine (NumPy)
+- embedding: the KB's embedding path: items embedded by embedding_client.py
+             ("title\n\ncontent" plus example questions) into an
+             embedding_store.py file, searched two-stage; the query is embedded
+             by the same backend inside the timed search (--backend stub runs
+             offline, openai measures the real model)
+
+Each KB size pads the documents with distractor items from the existing
+knowledge files. Reported: recall@k, MRR@10 and p50 / p99 query latency.
+
+Usage:
+  benchmark-retrieval.py [--sizes 0,1000,10000] [--folds 5] [--output report.json]
+  benchmark-retrieval.py --engines bm25,embedding --backend openai
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import tempfile
+
+from hebrew_text import normalize_hebrew, calculate_similarity
+import search_index
+from embedding_client import BACKENDS, embed, knowledge_text
+from embedding_store import EmbeddingStore, write_store
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required: pip install numpy")
+
+CONVERSATIONS_FILE = "/Users/avivgranot/klear-ai/src/data/all-conversations.json"
+REPETITIVE_FILE = "/Users/avivgranot/klear-ai/src/data/top-repetitive.json"
+DISTRACTOR_FILES = [
+    "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json",
+    "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json",
+]
+
+RECALL_AT = [1, 3, 5]
+MRR_AT = 10
+FOLDS = 5
+VECTOR_DIM = 1024
+
+def load_pairs():
+    pairs = []
+    if os.path.exists(CONVERSATIONS_FILE):
+        with open(CONVERSATIONS_FILE, 'r', encoding='utf-8') as f:
+            for conv in json.load(f).get('conversations', []):
+                if conv.get('question') and conv.get('answer') and not conv.get('isMedia'):
+                    pairs.append((conv['question'], conv['answer']))
+    if os.path.exists(REPETITIVE_FILE):
+        with open(REPETITIVE_FILE, 'r', encoding='utf-8') as f:
+            for pair in json.load(f).get('top_qa_pairs', []):
+                pairs.append((pair['question'], pair['answer']))
+    return pairs
+
+def build_ground_truth(pairs):
+    """(documents by id, {normalized question: (question, relevant doc ids)})"""
+    docs, doc_ids, queries = {}, {}, {}
+    for question, answer in pairs:
+        answer_key = normalize_hebrew(answer)
+        question_key = normalize_hebrew(question)
+        if not answer_key or not question_key:
+            continue
+        doc_id = doc_ids.get(answer_key)
+        if doc_id is None:
+            doc_id = doc_ids[answer_key] = f"doc-{len(doc_ids)}"
+            docs[doc_id] = {'id': doc_id, 'content': answer, 'questions': []}
+        docs[doc_id]['questions'].append(question_key)
+        queries.setdefault(question_key, (question, set()))[1].add(doc_id)
+    return docs, queries
+
+def fold_of(key, folds):
+    return zlib.crc32(key.encode('utf-8')) % folds
+
+def fold_documents(docs, queries, fold, folds):
+    """KB items for one fold: held-out questions never appear as examples."""
+    examples = {key: question for key, (question, _) in queries.items() if fold_of(key, folds) != fold}
+    items = []
+    for doc in docs.values():
+        questions = [examples[key] for key in dict.fromkeys(doc['questions']) if key in examples]
+        items.append({
+            'id': doc['id'],
+            'title': questions[0][:100] if questions else doc['content'][:100],
+            'content': doc['content'],
+            'example_questions': questions,
+        })
+    return items
+
+def load_distractors(count):
+    source = []
+    for path in DISTRACTOR_FILES:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            source.extend(data['items'] if isinstance(data, dict) else data)
+    if not source or not count:
+        return []
+    return [
+        {
+            'id': f"distractor-{i}",
+            'title': source[i % len(source)].get('titleHe') or source[i % len(source)].get('title') or '',
+            'content': source[i % len(source)].get('contentHe') or source[i % len(source)].get('content') or '',
+            'example_questions': source[i % len(source)].get('example_questions') or [],
+        }
+        for i in range(count)
+    ]
+
+class StaticEngine:
+    name = 'static'
+
+    def __init__(self, items):
+        self.items = items
+
+    def search(self, query, k):
+        results = []
+        for item in self.items:
+            content_sim = calculate_similarity(query, item['content'], item['example_questions'])
+            title_sim = calculate_similarity(query, item['title'])
+            score = max(content_sim, title_sim * 1.2)
+            if score > 0.2:
+                results.append((score, item['id']))
+        results.sort(key=lambda r: -r[0])
+        return [item_id for _, item_id in results[:k]]
+
+class Bm25Engine:
+    name = 'bm25'
+
+    def __init__(self, items):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'benchmark.sqlite')
+        search_index.write_index(items, self.path)
+
+    def search(self, query, k):
+        return [result['id'] for result in search_index.search(self.path, query, k)]
+
+    def close(self):
+        self.dir.cleanup()
+
+class TrigramEngine:
+    name = 'trigram'
+
+    def __init__(self, items, dim=VECTOR_DIM):
+        self.dim = dim
+        self.ids = [item['id'] for item in items]
+        counts = np.stack([self.counts(' '.join([item['title'], item['content']] + item['example_questions']))
+                           for item in items]) if items else np.zeros((0, dim), dtype=np.float32)
+        df = (counts > 0).sum(axis=0)
+        self.idf = np.log((1 + len(items)) / (1 + df)).astype(np.float32) + 1
+        self.matrix = self.normalize(np.log1p(counts) * self.idf)
+
+    def counts(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in normalize_hebrew(text).split(' '):
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vector[zlib.crc32(padded[i:i + 3].encode('utf-8')) % self.dim] += 1
+        return vector
+
+    @staticmethod
+    def normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+    def search(self, query, k):
+        vector = self.normalize(np.log1p(self.counts(query)) * self.idf)
+        scores = self.matrix @ vector
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.ids[i] for i in top if scores[i] > 0]
+
+class EmbeddingEngine:
+    name = 'embedding'
+
+    def __init__(self, items, backend, cache):
+        self.backend = backend
+        self.dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.dir.name, 'benchmark.emb')
+        texts = [knowledge_text(item['title'], None, '\n'.join([item['content']] + item['example_questions']), None)
+                 for item in items]
+        # Distractors repeat across folds and sizes: embed each text once per run
+        missing = list(dict.fromkeys(text for text in texts if text not in cache))
+        cache.update(zip(missing, embed(missing, backend)))
+        write_store(path, [item['id'] for item in items], [cache[text] for text in texts])
+        self.store = EmbeddingStore(path)
+
+    def search(self, query, k):
+        vector = embed([query], self.backend)[0]
+        return [item_id for item_id, _ in self.store.search(vector, k)]
+
+    def close(self):
+        del self.store
+        self.dir.cleanup()
+
+ENGINES = [StaticEngine, Bm25Engine, TrigramEngine, EmbeddingEngine]
+
+def evaluate(engine, queries, fold, folds, stats):
+    depth = max(max(RECALL_AT), MRR_AT)
+    for key, (question, relevant) in queries.items():
+        if fold_of(key, folds) != fold:
+            continue
+        start = time.perf_counter()
+        ranked = engine.search(question, depth)
+        stats['latencies'].append(time.perf_counter() - start)
+
+        rank = next((i + 1 for i, doc_id in enumerate(ranked) if doc_id in relevant), None)
+        stats['queries'] += 1
+        for k in RECALL_AT:
+            stats[f'hits@{k}'] += 1 if rank is not None and rank <= k else 0
+        stats['reciprocal_rank'] += 1 / rank if rank is not None and rank <= MRR_AT else 0
+
+def summarize(stats):
+    n = stats['queries']
+    latencies = np.array(stats['latencies']) * 1000
+    summary = {f'recall@{k}': round(stats[f'hits@{k}'] / n, 4) for k in RECALL_AT}
+    summary[f'mrr@{MRR_AT}'] = round(stats['reciprocal_rank'] / n, 4)
+    summary['latency_p50_ms'] = round(float(np.percentile(latencies, 50)), 3)
+    summary['latency_p99_ms'] = round(float(np.percentile(latencies, 99)), 3)
+    summary['queries'] = n
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='0,1000,10000', help='distractor items added per run, comma-separated')
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--engines', default=','.join(e.name for e in ENGINES))
+    parser.add_argument('--backend', choices=list(BACKENDS), default='stub', help='embedding engine backend')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+    engine_options = {'embedding': {'backend': BACKENDS[args.backend](), 'cache': {}}}
+
+    docs, queries = build_ground_truth(load_pairs())
+    if not queries:
+        sys.exit("No question/answer pairs found")
+    print(f"Ground truth: {len(queries)} questions, {len(docs)} answers, {args.folds} folds")
+
+    engines = [e for e in ENGINES if e.name in args.engines.split(',')]
+    report = []
+    for size in [int(s) for s in args.sizes.split(',')]:
+        distractors = load_distractors(size)
+        for engine_class in engines:
+            stats = {'queries': 0, 'reciprocal_rank': 0.0, 'latencies': [], **{f'hits@{k}': 0 for k in RECALL_AT}}
+            build_time = 0.0
+            for fold in range(args.folds):
+                items = fold_documents(docs, queries, fold, args.folds) + distractors
+                start = time.perf_counter()
+                engine = engine_class(items, **engine_options.get(engine_class.name, {}))
+                build_time += time.perf_counter() - start
+                evaluate(engine, queries, fold, args.folds, stats)
+                if hasattr(engine, 'close'):
+                    engine.close()
+
+            summary = summarize(stats)
+            summary.update({'engine': engine_class.name, 'kb_size': len(docs) + len(distractors),
+                            'build_s': round(build_time / args.folds, 3)})
+            report.append(summary)
+            print(f"  {engine_class.name:9} kb={summary['kb_size']:<6} "
+                  + ' '.join(f"R@{k}={summary[f'recall@{k}']:.3f}" for k in RECALL_AT)
+                  + f" MRR={summary[f'mrr@{MRR_AT}']:.3f}"
+                  + f" p50={summary['latency_p50_ms']:.2f}ms p99={summary['latency_p99_ms']:.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nSaved to {args.output}")
+
+if __name__ == '__main__':
+    main()
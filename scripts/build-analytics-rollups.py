@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Precompute dashboard analytics as compact per-company rollups.
+
+Streams question events from a WhatsApp export (employee question -> first
+manager reply) or from a local SQLite database, and aggregates them in one
+pass by day, month, hour, weekday, manager and topic: counts, answered /
+escalation rates and response-time percentiles.
+
+A question counts as escalated only on an actual handoff to a human:
+  QueryLog  an Escalation row for the same company and question text,
+            created within REPLY_WINDOW_SECONDS after the bot query
+  Message   a reply from a signed-in user (senderId set, not the bot) after
+            the bot's answer, or the last question of a conversation whose
+            status is 'escalated'
+In a chat export every reply is already human, so escalation is not
+measured there (escalation_rate is null).
+
+Response times go into log-spaced histogram buckets (~5% wide), so every
+cell has fixed size and percentiles are accurate to one bucket. by_day
+covers the last DAY_WINDOW days only; older days live on in by_month, so a
+rollup stays bounded however long the history.
+The dashboard reads src/data/rollups/<company>.json instead of re-aggregating.
+
+Usage:
+  build-analytics-rollups.py                                  # chat export (CHAT_FILE)
+  build-analytics-rollups.py --db prisma/dev.db               # QueryLog + Escalation, all companies
+  build-analytics-rollups.py --db prisma/dev.db --table Message   # web chat conversations
+"""
+
+import os
+import re
+import math
+import sqlite3
+import argparse
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from chat_export import iter_chat_lines
+from message_fingerprints import normalize_date, normalize_time
+from artifact_store import write_json
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+DB_FILE = "/Users/avivgranot/klear-ai/prisma/dev.db"
+OUTPUT_DIR = "/Users/avivgranot/klear-ai/src/data/rollups"
+
+# Tenant the chat export belongs to
+EXPORT_COMPANY = "amir-bnei-brak"
+COMPANY_TIMEZONE = "Asia/Jerusalem"
+
+MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
+
+MANAGERS = {
+    "nevo": ["Nevo Perets", "נבו פרץ", "נבו"],
+    "hila": ["Hila Peretz", "הילה פרץ", "הילה"],
+    "sari": ["Sari Peretz", "שרי פרץ", "שרי"],
+    "yeshi": ["Yeshi Peretz", "ישי פרץ", "ישי"],
+}
+
+# A question still unanswered after this long counts as unanswered
+REPLY_WINDOW_SECONDS = 24 * 60 * 60
+
+# Mirrors GAS_STATION_TOPICS in src/data/gas-station-data.ts
+TOPICS = [
+    ('fuel', ['משאב', 'תדלוק', 'דלק', 'בנזין', 'סולר']),
+    ('payments', ['קופה', 'עסקה', 'תשלום', 'מזומן', 'אשראי', 'ביט', 'פייבוקס']),
+    ('inventory', ['מלאי', 'חסר', 'הזמנ', 'ספק', 'משלוח']),
+    ('shifts', ['עובד', 'משמרת', 'שעות', 'חופש']),
+    ('safety', ['בטיח', 'חירום', 'כיבוי', 'אש', 'נכה', 'חשוד']),
+    ('customers', ['לקוח', 'שירות', 'תלונ']),
+    ('pricing', ['מכיר', 'הנחה', 'מבצע', 'קופון']),
+    ('products', ['מקרר', 'קפה', 'חלב', 'מזון', 'מוצר']),
+    ('maintenance', ['תקלה', 'בעיה', 'תיקון', 'שירות טכני']),
+]
+
+HISTOGRAM_BASE = 1.05
+PERCENTILES = [50, 90, 99]
+DIMENSIONS = ['day', 'month', 'hour', 'weekday', 'manager', 'topic']
+DAY_WINDOW = 90
+
+def clean_text(text):
+    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
+
+def get_manager_id(sender):
+    for manager_id, names in MANAGERS.items():
+        if any(name in sender for name in names):
+            return manager_id
+    return None
+
+def detect_topic(text):
+    lower = text.lower()
+    for topic_id, keywords in TOPICS:
+        if any(kw in lower for kw in keywords):
+            return topic_id
+    return 'other'
+
+class LatencyHistogram:
+    """Log-bucketed response times: bucket i holds [base^i, base^(i+1)) seconds."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        bucket = math.floor(math.log(max(seconds, 0.001), HISTOGRAM_BASE))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Geometric midpoint of the bucket
+                return HISTOGRAM_BASE ** (bucket + 0.5)
+        return None
+
+class Cell:
+    __slots__ = ('count', 'answered', 'escalated', 'escalation_known', 'latency')
+
+    def __init__(self):
+        self.count = 0
+        self.answered = 0
+        self.escalated = 0
+        self.escalation_known = 0   # events whose source can tell (escalated is not None)
+        self.latency = LatencyHistogram()
+
+    def add(self, event):
+        self.count += 1
+        if event['answered']:
+            self.answered += 1
+        if event['escalated'] is not None:
+            self.escalation_known += 1
+            if event['escalated']:
+                self.escalated += 1
+        if event['response_s'] is not None:
+            self.latency.add(event['response_s'])
+
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'answered': self.answered,
+            'escalated': self.escalated if self.escalation_known else None,
+            'answer_rate': round(self.answered / self.count, 4) if self.count else None,
+            'escalation_rate': round(self.escalated / self.escalation_known, 4) if self.escalation_known else None,
+            'response_mean_s': round(self.latency.total / self.latency.count, 2) if self.latency.count else None,
+        }
+        for p in PERCENTILES:
+            value = self.latency.percentile(p)
+            summary[f'response_p{p}_s'] = round(value, 2) if value is not None else None
+        return summary
+
+class Rollup:
+    """One company's cube: a Cell per value of each dimension, plus a total."""
+
+    def __init__(self):
+        self.total = Cell()
+        self.cells = {dim: {} for dim in DIMENSIONS}
+        self.first = None
+        self.last = None
+
+    def add(self, event):
+        ts = event['ts']
+        keys = {
+            'day': ts.strftime('%Y-%m-%d'),
+            'month': ts.strftime('%Y-%m'),
+            'hour': ts.hour,
+            'weekday': ts.isoweekday() % 7,  # 0 = Sunday, as in JS getDay()
+            'manager': event['manager'] or 'bot',
+            'topic': event['topic'],
+        }
+        if self.first is None or ts < self.first:
+            self.first = ts
+        if self.last is None or ts > self.last:
+            self.last = ts
+        oldest_day = (self.last - timedelta(days=DAY_WINDOW - 1)).strftime('%Y-%m-%d')
+        if keys['day'] < oldest_day:
+            del keys['day']     # Only in by_month
+
+        self.total.add(event)
+        for dim, key in keys.items():
+            cell = self.cells[dim].get(key)
+            if cell is None:
+                cell = self.cells[dim][key] = Cell()
+                if dim == 'day':
+                    self.expire_days(oldest_day)
+            cell.add(event)
+
+    def expire_days(self, oldest_day):
+        """Drop days that left the window; a new day appears at most once a day, so this stays cheap."""
+        for day in [day for day in self.cells['day'] if day < oldest_day]:
+            del self.cells['day'][day]
+
+    def to_dict(self, company, source):
+        return {
+            'company': company,
+            'source': source,
+            'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'date_range': {
+                'start': self.first.strftime('%Y-%m-%d') if self.first else None,
+                'end': self.last.strftime('%Y-%m-%d') if self.last else None,
+            },
+            'total': self.total.summary(),
+            **{
+                f'by_{dim}': {str(key): cell.summary() for key, cell in sorted(cells.items())}
+                for dim, cells in self.cells.items()
+            }
+        }
+
+def iter_export_events(path, company=EXPORT_COMPANY):
+    """
+    Employee questions from a chat export. A question is answered by the first
+    manager message after it (within REPLY_WINDOW_SECONDS). There is no bot in
+    a group chat, so escalation is unknown (None).
+    """
+    pending = deque()  # questions waiting for a manager reply
+    for line in iter_chat_lines(path):
+        match = MESSAGE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        date, time, sender, text = match.groups()
+        text = clean_text(text)
+        if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
+            continue
+        ts = datetime.fromisoformat(f"{normalize_date(date)}T{normalize_time(time)}")
+
+        # Expire questions nobody answered in time
+        while pending and (ts - pending[0]['ts']).total_seconds() > REPLY_WINDOW_SECONDS:
+            yield pending.popleft()
+
+        manager_id = get_manager_id(clean_text(sender))
+        if manager_id is None:
+            if len(text) >= 3 and '<מצורף:' not in text:
+                pending.append({
+                    'company': company,
+                    'ts': ts,
+                    'manager': None,
+                    'topic': detect_topic(text),
+                    'response_s': None,
+                    'answered': False,
+                    'escalated': None,
+                })
+            continue
+
+        for event in pending:
+            event['manager'] = manager_id
+            event['response_s'] = (ts - event['ts']).total_seconds()
+            event['answered'] = True
+            yield event
+        pending.clear()
+
+    yield from pending
+
+def parse_db_datetime(value):
+    """Prisma stores DateTime in SQLite as epoch milliseconds or ISO text (UTC)."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    text = str(value)
+    if text.isdigit():
+        return datetime.fromtimestamp(int(text) / 1000, tz=timezone.utc)
+    ts = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def load_escalations(conn):
+    """{(company, question text): deque of escalation times}, oldest first."""
+    escalations = {}
+    cursor = conn.execute('SELECT "companyId", "employeeQuery", "createdAt" FROM "Escalation" ORDER BY "createdAt"')
+    for company, query, created_at in cursor:
+        escalations.setdefault((company, query), deque()).append(parse_db_datetime(created_at))
+    return escalations
+
+def iter_db_events(db_path, tz=COMPANY_TIMEZONE):
+    """
+    Bot queries from QueryLog. A query is escalated when an Escalation with
+    the same question follows it within REPLY_WINDOW_SECONDS; each
+    Escalation is matched to one query.
+    """
+    local = ZoneInfo(tz)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        escalations = load_escalations(conn)
+        cursor = conn.execute(
+            'SELECT "companyId", "createdAt", "query", "response", "responseTime" '
+            'FROM "QueryLog" ORDER BY "companyId", "createdAt"'
+        )
+        for company, created_at, query, response, response_time in cursor:
+            ts = parse_db_datetime(created_at)
+            handoffs = escalations.get((company, query))
+            while handoffs and handoffs[0] < ts:
+                handoffs.popleft()  # Belongs to an earlier query, or none
+            escalated = bool(handoffs) and (handoffs[0] - ts).total_seconds() <= REPLY_WINDOW_SECONDS
+            if escalated:
+                handoffs.popleft()
+            yield {
+                'company': company,
+                'ts': ts.astimezone(local),
+                'manager': None,
+                'topic': detect_topic(query or ''),
+                'response_s': response_time / 1000 if response_time is not None else None,
+                'answered': response is not None,
+                'escalated': escalated,
+            }
+    finally:
+        conn.close()
+
+def iter_message_events(db_path, tz=COMPANY_TIMEZONE):
+    """
+    Questions from web chat conversations (Message). A user message is
+    answered by the next bot reply; it is escalated when a signed-in user
+    (senderId set) replies after the bot, or when it is the last question of
+    a conversation with status 'escalated'.
+    """
+    local = ZoneInfo(tz)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(
+            'SELECT c."companyId", c."id", c."status", m."role", m."senderId", m."content", '
+            'm."createdAt", m."responseTimeMs" '
+            'FROM "Message" m JOIN "Conversation" c ON c."id" = m."conversationId" '
+            'ORDER BY c."companyId", c."id", m."createdAt"'
+        )
+        question = None
+        conversation = None
+        for company, conversation_id, status, role, sender_id, content, created_at, response_ms in cursor:
+            if conversation_id != conversation:
+                if question is not None:
+                    question['escalated'] = question['escalated'] or conversation_status == 'escalated'
+                    yield question
+                question = None
+                conversation, conversation_status = conversation_id, status
+            ts = parse_db_datetime(created_at)
+
+            if role == 'user':
+                if question is not None:
+                    yield question
+                question = {
+                    'company': company,
+                    'ts': ts.astimezone(local),
+                    'utc': ts,
+                    'manager': None,
+                    'topic': detect_topic(content or ''),
+                    'response_s': None,
+                    'answered': False,
+                    'escalated': False,
+                }
+            elif role == 'assistant' and question is not None:
+                if sender_id is not None:
+                    question['escalated'] = True    # A human took over
+                elif not question['answered']:
+                    question['answered'] = True
+                    question['response_s'] = (response_ms / 1000 if response_ms is not None
+                                              else (ts - question['utc']).total_seconds())
+        if question is not None:
+            question['escalated'] = question['escalated'] or conversation_status == 'escalated'
+            yield question
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', nargs='?', const=DB_FILE,
+                        help='read QueryLog from this SQLite database (default DB_FILE) instead of the chat export')
+    parser.add_argument('--table', choices=['QueryLog', 'Message'], default='QueryLog',
+                        help='with --db: bot queries (QueryLog) or web chat conversations (Message)')
+    parser.add_argument('--chat', default=CHAT_FILE, help='chat export (_chat.txt, folder or .zip)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    if args.db and args.table == 'Message':
+        source = 'messages'
+        events = iter_message_events(args.db)
+    elif args.db:
+        source = 'query_log'
+        events = iter_db_events(args.db)
+    else:
+        source = 'chat_export'
+        events = iter_export_events(args.chat)
+
+    rollups = {}
+    for event in events:
+        rollup = rollups.get(event['company'])
+        if rollup is None:
+            rollup = rollups[event['company']] = Rollup()
+        rollup.add(event)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for company, rollup in sorted(rollups.items()):
+        output_file = os.path.join(args.output_dir, f"{company}.json")
+        write_json(output_file, rollup.to_dict(company, source))
+
+        total = rollup.total.summary()
+        print(f"{company}: {total['count']} questions, "
+              f"{total['answer_rate']:.0%} answered, p50 {total['response_p50_s']}s "
+              f"-> {output_file} ({os.path.getsize(output_file) / 1024:.1f}KB)")
+
+    if not rollups:
+        print("No events found")
+
+if __name__ == '__main__':
+    main()
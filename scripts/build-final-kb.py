@@ -3,10 +3,17 @@
 Build final knowledge base:
 - Keep documents (90 items)
 - Add Nevo's operational knowledge (90 items)
+
+Near-duplicates across all sources are merged once, by build-final-structure.py.
 """
 
 import json
 
+from category_classifier import classify_items
+from search_index import build_index
+from knowledge_ids import record_build
+from artifact_store import write_json
+
 EXISTING_FILE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
 NEVO_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-operational.json"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
@@ -38,16 +45,21 @@ def main():
 
     # Combine
     final_kb = documents + nevo_items
+    classify_items(final_kb)
 
     print(f"\nFinal knowledge base: {len(final_kb)} items")
     print(f"  - Documents: {len(documents)}")
     print(f"  - Nevo operational: {len(nevo_items)}")
 
+    record_build(final_kb, OUTPUT_FILE)
+
     # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_kb, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, final_kb)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
+    if build_index(OUTPUT_FILE):
+        print("Search index rebuilt")
+
 if __name__ == '__main__':
     main()
@@ -2,51 +2,34 @@
 """
 Build final data structure:
 1. all-conversations.json - ALL Q&A for analytics (including noise)
-2. whatsapp-faqs.json - Automation knowledge + documents for Knowledge page
+2. whatsapp-faqs.json - documents + automation, Nevo operational and core
+   knowledge for Knowledge page
+
+This is the final merge: near-duplicates (near_duplicates.py) are merged
+once, over the union of all sources. The documents are taken from the FAQ
+file as it was before this step last wrote it (artifact_store.load_base),
+so a re-run does not merge its own output again.
+
+Messages come from the shared per-message feature table (message_features.py).
 """
 
-import re
-import json
 from collections import defaultdict
 
+from search_index import build_index
+from knowledge_ids import record_build
+from artifact_store import write_json, load_base, save_base
+from near_duplicates import dedupe, load
+from message_features import load_features
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 AUTOMATION_FILE = "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json"
+NEVO_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-operational.json"
+CORE_FILE = "/Users/avivgranot/klear-ai/src/data/core-knowledge.json"
 EXISTING_KB = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
+BASE_FILE = "/Users/avivgranot/klear-ai/.cache/build-final-structure/whatsapp-faqs.base.json"
 OUTPUT_CONVERSATIONS = "/Users/avivgranot/klear-ai/src/data/all-conversations.json"
 OUTPUT_KNOWLEDGE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-    return messages
-
 def main():
     print("=" * 50)
     print("BUILDING FINAL DATA STRUCTURE")
@@ -54,7 +37,7 @@ def main():
 
     # Parse chat
     print("\nParsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     # ============================================
@@ -99,8 +82,7 @@ def main():
         'total': len(all_qa),
         'conversations': all_qa
     }
-    with open(OUTPUT_CONVERSATIONS, 'w', encoding='utf-8') as f:
-        json.dump(conversations_output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_CONVERSATIONS, conversations_output)
     print(f"Saved to {OUTPUT_CONVERSATIONS}")
 
     # ============================================
@@ -109,29 +91,34 @@ def main():
     print("\n--- Building KNOWLEDGE BASE ---")
 
     # Load existing KB to get documents
-    with open(EXISTING_KB, 'r', encoding='utf-8') as f:
-        existing = json.load(f)
+    existing = load_base(EXISTING_KB, BASE_FILE)
 
     # Get documents only
     documents = [item for item in existing if item.get('type') == 'document']
     print(f"Documents from existing KB: {len(documents)}")
 
-    # Load automation knowledge
-    with open(AUTOMATION_FILE, 'r', encoding='utf-8') as f:
-        automation = json.load(f)
-
-    automation_items = automation['items']
+    automation_items = load(AUTOMATION_FILE)
     print(f"Automation patterns: {len(automation_items)}")
+    nevo_items = load(NEVO_FILE)
+    print(f"Nevo operational: {len(nevo_items)}")
+    core_items = load(CORE_FILE)
+    print(f"Core knowledge: {len(core_items)}")
 
     # Combine
-    knowledge_items = documents + automation_items
+    knowledge_items, clusters = dedupe(documents + automation_items + nevo_items + core_items)
+    print(f"Merged {clusters} near-duplicate clusters")
     print(f"Total knowledge items: {len(knowledge_items)}")
 
+    record_build(knowledge_items, OUTPUT_KNOWLEDGE)
+
     # Save knowledge base
-    with open(OUTPUT_KNOWLEDGE, 'w', encoding='utf-8') as f:
-        json.dump(knowledge_items, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_KNOWLEDGE, knowledge_items)
+    save_base(OUTPUT_KNOWLEDGE, BASE_FILE, existing)
     print(f"Saved to {OUTPUT_KNOWLEDGE}")
 
+    if build_index(OUTPUT_KNOWLEDGE):
+        print("Search index rebuilt")
+
     # ============================================
     # Summary
     # ============================================
@@ -144,6 +131,8 @@ def main():
     print(f"\nKnowledge Base (whatsapp-faqs.json):")
     print(f"  - {len(documents)} documents (uploaded files)")
     print(f"  - {len(automation_items)} automation patterns (repeated answers)")
+    print(f"  - {len(nevo_items)} Nevo operational, {len(core_items)} core knowledge items")
+    print(f"  - {clusters} near-duplicate clusters merged")
     print(f"  - {len(knowledge_items)} total items")
 
     print("\nAutomation patterns:")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Generate thumbnails and web-optimized renditions for manager media.
+
+Reads the media referenced by automation-knowledge.json (media_info and
+associated_media), renders into public/uploads/media in a process pool:
+- images: thumbnail + size-capped JPEG (Pillow)
+- videos: poster-frame thumbnail + size-capped H.264 MP4 (ffmpeg, if installed)
+
+Exports can be a folder or a WhatsApp .zip (see chat_export.py).
+Renditions are addressed by content key (see media_catalog.py), so media
+already processed in a previous run - under any filename - is skipped.
+Each media entry in the knowledge file gets url / thumbnailUrl, and the
+file is saved as a new build (knowledge_ids.record_build) so DB sync
+(load-knowledge.py --changes) picks the links up. extract-all-managers.py
+re-attaches them from the manifest, so a later extraction keeps them.
+
+The ingestion pipeline (ingest_pipeline.py) runs this after every
+extraction, on the tenant's knowledge file and exports.
+
+Usage:
+  build-media-renditions.py
+  build-media-renditions.py --knowledge src/data/tenants/amir-bnei-brak-automation-knowledge.json --export PATH ...
+"""
+
+import os
+import json
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from artifact_store import write_json
+from chat_export import ExportMedia
+from knowledge_ids import record_build
+from media_catalog import index_export, load_renditions, link_renditions, RENDITIONS_FILE
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+AUTOMATION_FILE = "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json"
+UPLOADS_DIR = "/Users/avivgranot/klear-ai/public/uploads/media"
+UPLOADS_URL = "/uploads/media"
+MANIFEST_FILE = RENDITIONS_FILE
+
+THUMBNAIL_SIZE = 320      # px, longest side
+WEB_MAX_SIZE = 1280       # px, longest side
+JPEG_QUALITY = 80
+VIDEO_MAX_HEIGHT = 720
+VIDEO_CRF = 28
+WORKERS = os.cpu_count() or 4
+
+VIDEO_EXTENSIONS = ['mp4', 'mov', 'avi']
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+
+def media_kind(filename):
+    ext = filename.split('.')[-1].lower() if '.' in filename else ''
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+def output_paths(sha256, kind):
+    """Content-addressed output locations, sharded by hash prefix."""
+    rel_dir = sha256[:2]
+    web_ext = 'jpg' if kind == 'image' else 'mp4'
+    return {
+        'thumb': f"{rel_dir}/{sha256}-thumb.jpg",
+        'web': f"{rel_dir}/{sha256}-web.{web_ext}"
+    }
+
+def render_image(src, thumb_path, web_path):
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        web = img.copy()
+        web.thumbnail((WEB_MAX_SIZE, WEB_MAX_SIZE))
+        web.save(web_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        img.save(thumb_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        return {'width': web.width, 'height': web.height}
+
+def render_video(src, thumb_path, web_path):
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-ss', '1', '-i', src, '-frames:v', '1',
+         '-vf', f"scale='min({THUMBNAIL_SIZE},iw)':-2", thumb_path],
+        check=True
+    )
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-i', src,
+         '-vf', f"scale=-2:'min({VIDEO_MAX_HEIGHT},ih)'",
+         '-c:v', 'libx264', '-crf', str(VIDEO_CRF), '-preset', 'veryfast',
+         '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', web_path],
+        check=True
+    )
+    return {}
+
+_exports = {}
+
+def open_export(path):
+    """One ExportMedia per worker process, so a zip's directory is read once."""
+    if path not in _exports:
+        _exports[path] = ExportMedia(path)
+    return _exports[path]
+
+def render(job):
+    """Worker entry point: render one source file. Runs in a child process."""
+    media = open_export(job['export'])
+    kind, sha256 = job['kind'], job['sha256']
+    paths = output_paths(sha256, kind)
+    thumb_path = os.path.join(UPLOADS_DIR, paths['thumb'])
+    web_path = os.path.join(UPLOADS_DIR, paths['web'])
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+
+    try:
+        if kind == 'image':
+            with media.open(job['filename']) as src:
+                info = render_image(src, thumb_path, web_path)
+            mime_type = 'image/jpeg'
+        else:
+            with media.local_path(job['filename']) as src:
+                info = render_video(src, thumb_path, web_path)
+            mime_type = 'video/mp4'
+    except Exception as e:
+        return sha256, {'error': str(e)}
+
+    info.update({
+        'url': f"{UPLOADS_URL}/{paths['web']}",
+        'thumbnailUrl': f"{UPLOADS_URL}/{paths['thumb']}",
+        'mimeType': mime_type,
+        'size': os.path.getsize(web_path),
+        'originalSize': media.entries[job['filename']]['size']
+    })
+    return sha256, info
+
+def collect_media(items):
+    """All media dicts referenced by knowledge items."""
+    media = []
+    for item in items:
+        if item.get('media_info') and item['media_info'].get('filename'):
+            media.append(item['media_info'])
+        for m in item.get('associated_media') or []:
+            if m and m.get('filename'):
+                media.append(m)
+    return media
+
+def is_rendered(entry):
+    if not entry or 'error' in entry:
+        return False
+    for url in (entry['url'], entry['thumbnailUrl']):
+        if not os.path.exists(os.path.join(UPLOADS_DIR, url[len(UPLOADS_URL) + 1:])):
+            return False
+    return True
+
+def content_sha(media, record):
+    """Manifest key: the sha256 of the media's content key, else of the file itself."""
+    return media['content_key'].split(':', 1)[-1] if media.get('content_key') else record['sha256']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--knowledge', default=AUTOMATION_FILE, help='knowledge file whose media to render and link')
+    parser.add_argument('--export', action='append', help='Chat export (repeat for several); default CHAT_FILE')
+    args = parser.parse_args()
+
+    with open(args.knowledge, 'r', encoding='utf-8') as f:
+        automation = json.load(f)
+
+    media = collect_media(automation['items'])
+    print(f"Media references in knowledge: {len(media)}")
+
+    catalog = index_export(args.export or CHAT_FILE)
+    manifest = load_renditions(MANIFEST_FILE)
+
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    if Image is None:
+        print("Pillow not installed - skipping images")
+    if not has_ffmpeg:
+        print("ffmpeg not found - skipping videos")
+
+    jobs = {}
+    missing = 0
+    rendered = set()
+    for m in media:
+        record = catalog.get(m['filename'])
+        kind = media_kind(m['filename'])
+        if not record:
+            missing += 1
+            continue
+        if kind is None or (kind == 'image' and Image is None) or (kind == 'video' and not has_ffmpeg):
+            continue
+        sha256 = content_sha(m, record)
+        if is_rendered(manifest.get(sha256)):
+            rendered.add(sha256)
+            continue
+        if sha256 in jobs:
+            continue
+        jobs[sha256] = {'export': record['export'], 'filename': m['filename'], 'kind': kind, 'sha256': sha256}
+
+    print(f"Missing from export folder: {missing}")
+    print(f"Already rendered: {len(rendered)}")
+    print(f"To render: {len(jobs)}")
+
+    if jobs:
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+            for sha256, info in pool.map(render, jobs.values()):
+                manifest[sha256] = info
+                if 'error' in info:
+                    print(f"  Failed {jobs[sha256]['filename']}: {info['error']}")
+
+        write_json(MANIFEST_FILE, manifest, keep=0)
+
+    # Attach rendition URLs to the knowledge media entries
+    for m in media:
+        if not m.get('content_key') and m['filename'] in catalog:
+            m['content_key'] = f"sha256:{catalog[m['filename']]['sha256']}"
+    linked = link_renditions(automation['items'], manifest)
+
+    record_build(automation['items'], args.knowledge)
+    write_json(args.knowledge, automation)
+
+    original = sum(e.get('originalSize', 0) for e in manifest.values())
+    optimized = sum(e.get('size', 0) for e in manifest.values())
+    print(f"\nLinked {linked} media references to renditions")
+    if original:
+        print(f"Renditions: {optimized / 1024:.0f}KB (originals {original / 1024:.0f}KB)")
+    print(f"Manifest: {MANIFEST_FILE}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Build-time category classification of knowledge items.
+
+Every item is scored against the categories of a categories.json in one pass:
+one alternation regex counts keyword hits per item into an items x keywords
+matrix, and a single matrix product with the keywords x categories matrix
+gives all scores. Title hits weigh double. The best category is written into
+the item as categorySlug (a stable slug of the English name) and category
+(nameHe, the key load-knowledge.py and import-to-kb.ts resolve to the
+company's Category row id), so retrieval can filter by category instead of
+guessing topics per request. categoryId is left to the loader: it is the
+Prisma foreign key and only exists per company.
+
+Usage:
+  category_classifier.py [knowledge.json ...] [--categories prisma/categories.json]
+"""
+
+import re
+import sys
+import json
+import argparse
+
+from artifact_store import write_json
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required: pip install numpy")
+
+CATEGORIES_FILE = "/Users/avivgranot/klear-ai/prisma/categories.json"
+KNOWLEDGE_FILES = [
+    "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json",
+    "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json",
+]
+
+# Keyword stems per category (by nameHe). Gas station set mirrors
+# detectTopicFromContent in src/lib/whatsapp/import-to-kb.ts, the Jolika set
+# mirrors suggestTopics in src/lib/ai-static.ts.
+CATEGORY_KEYWORDS = {
+    # prisma/categories.json
+    'תדלוק ומשאבות': ['משאב', 'תדלוק', 'דלק', 'בנזין', 'סולר'],
+    'תשלומים וקופה': ['קופה', 'עסקה', 'תשלום', 'מזומן', 'אשראי', 'ביט', 'פייבוקס'],
+    'מלאי והזמנות': ['מלאי', 'חסר', 'הזמנ', 'ספק', 'משלוח'],
+    'כוח אדם ומשמרות': ['עובד', 'משמרת', 'שעות', 'חופש'],
+    'שירות לקוחות': ['לקוח', 'שירות', 'תלונ'],
+    'מחירים ומבצעים': ['מכיר', 'הנחה', 'מבצע', 'קופון'],
+    'בטיחות וחירום': ['בטיח', 'חירום', 'כיבוי', 'אש'],
+    'מוצרים וצרכניה': ['מקרר', 'קפה', 'חלב', 'מזון', 'מוצר'],
+    'תקלות ותחזוקה': ['תקלה', 'בעיה', 'תיקון', 'שירות טכני'],
+    'תיעוד וחשבונות': ['צילום', 'תמונה', 'חשבונית', 'קבלה'],
+    # src/data/categories.json
+    'משלוחים': ['משלו', 'שליח'],
+    'הזמנות': ['הזמנ', 'לקוח'],
+    'מלאי ופרלינים': ['מלאי', 'פרלינ', 'שוקולד', 'טעם'],
+    'תשלומים': ['תשלום', 'כסף', 'העבר'],
+    'מועדון לקוחות': ['מועדון', 'הנח', 'עסק'],
+    'אלרגנים': ['אלרג', 'אגוז', 'גלוטן'],
+    'נהלים ותפעול': ['נוהל', 'נהלים', 'תפעול'],
+    'משמרות': ['משמרת', 'שעות', 'עובד'],
+    'אריזות': ['אריז', 'שקית', 'קופס', 'סרט'],
+}
+
+TITLE_WEIGHT = 2.0
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def item_text(item):
+    title = item.get('titleHe') or item.get('title') or ''
+    content = item.get('contentHe') or item.get('content') or ''
+    return title, content
+
+class CategoryClassifier:
+    def __init__(self, categories):
+        self.categories = [c for c in categories if CATEGORY_KEYWORDS.get(c['nameHe'])]
+        self.slugs = [slugify(c['name']) for c in self.categories]
+
+        self.vocab = sorted({kw for c in self.categories for kw in CATEGORY_KEYWORDS[c['nameHe']]},
+                            key=lambda kw: (-len(kw), kw))
+        # Longest keywords first, so 'שירות טכני' wins over 'שירות'
+        self.pattern = re.compile('|'.join(f'({re.escape(kw)})' for kw in self.vocab))
+
+        self.weights = np.zeros((len(self.vocab), len(self.categories)), dtype=np.float32)
+        index = {kw: i for i, kw in enumerate(self.vocab)}
+        for j, category in enumerate(self.categories):
+            for kw in CATEGORY_KEYWORDS[category['nameHe']]:
+                self.weights[index[kw], j] = 1.0
+
+    @classmethod
+    def from_file(cls, path=CATEGORIES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def features(self, items):
+        """items x keywords matrix of weighted keyword hit counts."""
+        rows, cols, vals = [], [], []
+        for row, item in enumerate(items):
+            for text, weight in zip(item_text(item), (TITLE_WEIGHT, 1.0)):
+                for match in self.pattern.finditer(text.lower()):
+                    rows.append(row)
+                    cols.append(match.lastindex - 1)
+                    vals.append(weight)
+        matrix = np.zeros((len(items), len(self.vocab)), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)),
+                  np.array(vals, dtype=np.float32))
+        return matrix
+
+    def scores(self, items):
+        return self.features(items) @ self.weights
+
+    def classify(self, items):
+        """Set categorySlug / category on every item; None where no keyword matched."""
+        if not items or not self.categories:
+            return items
+        scores = self.scores(items)
+        best = scores.argmax(axis=1)  # ties go to the earlier category in the file
+        matched = scores[np.arange(len(items)), best] > 0
+        for item, j, ok in zip(items, best.tolist(), matched.tolist()):
+            item.pop('categoryId', None)    # Written by earlier builds as a slug
+            item['categorySlug'] = self.slugs[j] if ok else None
+            item['category'] = self.categories[j]['nameHe'] if ok else None
+        return items
+
+def classify_items(items, categories_file=CATEGORIES_FILE):
+    return CategoryClassifier.from_file(categories_file).classify(items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', default=KNOWLEDGE_FILES, help='knowledge JSON files, updated in place')
+    parser.add_argument('--categories', default=CATEGORIES_FILE)
+    args = parser.parse_args()
+
+    classifier = CategoryClassifier.from_file(args.categories)
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        items = data['items'] if isinstance(data, dict) else data
+        classifier.classify(items)
+
+        write_json(path, data)
+
+        counts = {}
+        for item in items:
+            key = item['category'] or '(none)'
+            counts[key] = counts.get(key, 0) + 1
+        print(f"{path}: {len(items)} items")
+        for name, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            print(f"  {name}: {count}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Read WhatsApp exports in any form managers hand us:
+- the _chat.txt file itself
+- the unpacked export folder
+- the .zip WhatsApp produces, read in place
+
+Zip exports are never extracted: _chat.txt is decompressed as a stream and
+`<מצורף: ...>` attachments are resolved through the zip's central directory,
+so multi-GB media exports cost nothing until a file is actually read.
+
+Several overlapping exports of the same group can be passed as a list; messages
+already seen in an earlier export are dropped (see message_fingerprints.py).
+"""
+
+import io
+import os
+import re
+import sys
+import shutil
+import zipfile
+import tempfile
+from contextlib import contextmanager
+
+from message_fingerprints import FingerprintStore, fingerprint
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+CHAT_FILENAME = "_chat.txt"
+
+MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
+
+def is_zip_export(path):
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+def find_chat_member(zf):
+    """The chat transcript inside an export zip (_chat.txt, or the only .txt)."""
+    names = [info.filename for info in zf.infolist() if not info.is_dir()]
+    for name in names:
+        if os.path.basename(name) == CHAT_FILENAME:
+            return name
+    texts = [name for name in names if name.lower().endswith('.txt')]
+    if len(texts) == 1:
+        return texts[0]
+    raise FileNotFoundError(f"No {CHAT_FILENAME} in {zf.filename}")
+
+def export_paths(path):
+    """A single export path or a list of them, as a list."""
+    if isinstance(path, (str, os.PathLike)):
+        return [path]
+    return list(path)
+
+def export_size(path):
+    """Uncompressed transcript size in bytes, for progress reporting."""
+    if is_zip_export(path):
+        with zipfile.ZipFile(path) as zf:
+            return zf.getinfo(find_chat_member(zf)).file_size
+    if os.path.isdir(path):
+        path = os.path.join(path, CHAT_FILENAME)
+    return os.path.getsize(path)
+
+def iter_chat_lines(path, fingerprints=None):
+    """
+    Yield transcript lines from a _chat.txt, an export folder or an export zip.
+
+    path may also be a list of overlapping exports. A message (with its
+    continuation lines) is dropped when its fingerprint was seen in an
+    earlier export; duplicates within one export are kept, they are real
+    re-sends. fingerprints defaults to a fresh in-memory store for lists;
+    pass a persistent FingerprintStore for incremental runs, or False to
+    disable dedup.
+    """
+    paths = export_paths(path)
+    if fingerprints is None and len(paths) > 1:
+        fingerprints = FingerprintStore()
+
+    for export_path in paths:
+        if fingerprints is None or fingerprints is False:
+            yield from iter_export_lines(export_path)
+        else:
+            yield from dedup_lines(iter_export_lines(export_path), fingerprints)
+
+def dedup_lines(lines, fingerprints):
+    """Drop messages already in the store; record this export's messages at the end."""
+    new = []
+    skipping = False
+    for line in lines:
+        match = MESSAGE_PATTERN.match(line.strip())
+        if match:
+            fp = fingerprint(*match.groups())
+            skipping = fp in fingerprints
+            if not skipping:
+                new.append(fp)
+        if not skipping:
+            yield line
+    for fp in new:
+        fingerprints.add(fp)
+    fingerprints.flush()
+
+def iter_export_lines(path):
+    """Transcript lines of one export."""
+    if is_zip_export(path):
+        with zipfile.ZipFile(path) as zf:
+            with zf.open(find_chat_member(zf)) as raw:
+                # utf-8-sig: Android exports start with a BOM
+                yield from io.TextIOWrapper(raw, encoding='utf-8-sig')
+        return
+
+    if os.path.isdir(path):
+        path = os.path.join(path, CHAT_FILENAME)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        yield from f
+
+class ExportMedia:
+    """
+    Attachments of one export, by the filename used in `<מצורף: ...>`.
+
+    Works the same for a folder and a zip; for zips only the central directory
+    is read until open() is called on a member.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.zip = None
+        self.entries = {}
+
+        if is_zip_export(self.path):
+            self.zip = zipfile.ZipFile(self.path)
+            for info in self.zip.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name == CHAT_FILENAME or name.startswith('.'):
+                    continue
+                self.entries[name] = {
+                    'key': f"{self.path}!{info.filename}",
+                    'member': info.filename,
+                    'size': info.file_size,
+                    # CRC from the central directory changes whenever the content does
+                    'mtime': info.CRC
+                }
+            return
+
+        folder = self.path if os.path.isdir(self.path) else os.path.dirname(self.path)
+        if not os.path.isdir(folder):
+            return
+        for entry in os.scandir(folder):
+            if not entry.is_file() or entry.name == CHAT_FILENAME or entry.name.startswith('.'):
+                continue
+            stat = entry.stat()
+            self.entries[entry.name] = {
+                'key': os.path.abspath(entry.path),
+                'member': None,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime
+            }
+
+    def __contains__(self, filename):
+        return filename in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        return self.entries.items()
+
+    def open(self, filename):
+        """Binary stream of an attachment (decompressed lazily for zips)."""
+        entry = self.entries[filename]
+        if self.zip is not None:
+            return self.zip.open(entry['member'])
+        return open(entry['key'], 'rb')
+
+    @contextmanager
+    def local_path(self, filename):
+        """
+        A real filesystem path for tools that need one (ffmpeg).
+        Zip members are extracted one at a time to a temp file.
+        """
+        entry = self.entries[filename]
+        if self.zip is None:
+            yield entry['key']
+            return
+        suffix = os.path.splitext(filename)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+            with self.zip.open(entry['member']) as src:
+                shutil.copyfileobj(src, tmp)
+            tmp.flush()
+            yield tmp.name
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    paths = sys.argv[1:] or [CHAT_FILE]
+    for path in paths:
+        lines = 0
+        for _ in iter_chat_lines(path):
+            lines += 1
+        with ExportMedia(path) as media:
+            total = sum(entry['size'] for _, entry in media.items())
+            print(f"Export: {path}")
+            print(f"  Transcript lines: {lines}")
+            print(f"  Attachments: {len(media)} ({total / 1024 / 1024:.1f}MB)")
+    if len(paths) > 1:
+        merged = sum(1 for _ in iter_chat_lines(paths))
+        print(f"Merged transcript lines (overlap removed): {merged}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Stage checkpoints for long extraction runs, per tenant and per stage.
+
+A script splits its work into named stages and runs each through
+Checkpoints.stage(); the result is pickled to
+
+  CHECKPOINT_DIR/<tenant>/<script>/<stage>.pkl
+
+together with a key chained from the source of the script and of every
+module next to it that it imports (directly or through other modules: the
+parser, media catalog, feature table, ...), the export signatures (path,
+size, mtime) and the previous stage's key. A restarted run
+loads every stage whose key still matches and computes only from the first
+stale or missing one, so a run killed halfway resumes where it stopped and
+an unchanged re-run costs only the loads.
+
+Parsing is checkpointed per export (Checkpoints.parse), with the same
+cross-export dedup as chat_export.iter_chat_lines, and reports progress and
+ETA on stderr based on transcript bytes read.
+
+Usage:
+  checkpoints.py                  # list checkpoints of all tenants
+  checkpoints.py --clear TENANT   # drop a tenant's checkpoints
+"""
+
+import os
+import sys
+import ast
+import time
+import shutil
+import pickle
+import hashlib
+import argparse
+
+from chat_export import export_paths, export_size, is_zip_export, iter_export_lines, dedup_lines
+from message_fingerprints import FingerprintStore
+from artifact_store import write_bytes
+
+CHECKPOINT_DIR = "/Users/avivgranot/klear-ai/.cache/checkpoints"
+CHECKPOINT_VERSION = 1
+PROGRESS_INTERVAL = 2.0  # seconds between progress lines
+PROGRESS_BATCH = 4096    # lines between byte counts
+
+def export_signature(path):
+    """What a stage depends on for one export: the transcript and, for folders, the attachments."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = [path, stat.st_size, stat.st_mtime_ns]
+    if os.path.isfile(path) and not is_zip_export(path):
+        signature.append(os.stat(os.path.dirname(path)).st_mtime_ns)
+    return signature
+
+def local_modules(script):
+    """The script and the modules in its directory that it imports, transitively, as sorted paths."""
+    directory = os.path.dirname(os.path.abspath(script))
+    seen, pending = set(), [os.path.abspath(script)]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(directory, f"{name.split('.')[0]}.py")
+                if os.path.exists(module):
+                    pending.append(module)
+    return sorted(seen)
+
+def source_hash(script):
+    """Changes when the script or any local module it imports changes."""
+    digest = hashlib.sha256()
+    for path in local_modules(script):
+        with open(path, 'rb') as f:
+            digest.update(f"{os.path.basename(path)}\0".encode('utf-8'))
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def chain(*parts):
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+class Progress:
+    """Bytes done / total with throughput and ETA, printed every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, label, total_bytes, interval=PROGRESS_INTERVAL, stream=sys.stderr):
+        self.label = label
+        self.total = max(total_bytes, 1)
+        self.done = 0
+        self.skipped = 0
+        self.interval = interval
+        self.stream = stream
+        self.start = time.monotonic()
+        self.last_report = self.start
+
+    def skip(self, nbytes):
+        """Bytes covered by a checkpoint: count as done, but not toward throughput."""
+        self.done += nbytes
+        self.skipped += nbytes
+
+    def advance(self, nbytes):
+        self.done += nbytes
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def track(self, lines, batch=PROGRESS_BATCH):
+        """Pass lines through, counting their UTF-8 size every `batch` lines."""
+        pending = []
+        for line in lines:
+            pending.append(line)
+            if len(pending) == batch:
+                self.advance(len(''.join(pending).encode('utf-8')))
+                pending = []
+            yield line
+        self.advance(len(''.join(pending).encode('utf-8')))
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        rate = (self.done - self.skipped) / elapsed
+        line = (f"  {self.label}: {min(self.done / self.total, 1):.1%} "
+                f"({self.done / 1024 / 1024:.1f}/{self.total / 1024 / 1024:.1f}MB, {rate / 1024 / 1024:.1f}MB/s")
+        if final:
+            line += f", {format_duration(elapsed)})"
+        else:
+            eta = (self.total - self.done) / rate if rate > 0 else 0
+            line += f", ETA {format_duration(eta)})"
+        print(line, file=self.stream, flush=True)
+
+class Checkpoints:
+    def __init__(self, tenant, script, exports, restart=False, checkpoint_dir=CHECKPOINT_DIR):
+        self.tenant = tenant
+        self.dir = os.path.join(checkpoint_dir, tenant, os.path.splitext(os.path.basename(script))[0])
+        if restart:
+            shutil.rmtree(self.dir, ignore_errors=True)
+        self.code_key = chain(CHECKPOINT_VERSION, source_hash(script))
+        self.key = chain(self.code_key, *(export_signature(p) for p in export_paths(exports)))
+
+    def depend(self, key):
+        """Make the following stages depend on another checkpointed result (by its key)."""
+        self.key = chain(self.key, key)
+
+    def path(self, stage):
+        return os.path.join(self.dir, f"{stage}.pkl")
+
+    def load(self, stage, key):
+        try:
+            with open(self.path(stage), 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return saved if saved.get('key') == key else None
+
+    def save(self, stage, key, **payload):
+        write_bytes(self.path(stage), pickle.dumps({'key': key, **payload}, pickle.HIGHEST_PROTOCOL), keep=0)
+
+    def stage(self, name, compute):
+        """compute() once per inputs: loaded from the checkpoint when this stage already completed."""
+        key = chain(self.key, name)
+        saved = self.load(name, key)
+        if saved is not None:
+            print(f"  [{self.tenant}] {name}: resumed from checkpoint")
+            result = saved['result']
+        else:
+            started = time.monotonic()
+            result = compute()
+            self.save(name, key, result=result)
+            print(f"  [{self.tenant}] {name}: done in {format_duration(time.monotonic() - started)}")
+        self.key = key
+        return result
+
+    def parse(self, exports, parse_lines, merge=None):
+        """
+        parse_lines(lines) over all exports, one checkpoint per export.
+
+        The per-export results are concatenated, or combined by merge(results)
+        when parse_lines returns something other than a list.
+
+        With several exports, messages already seen in an earlier export are
+        dropped as in iter_chat_lines; the fingerprint store lives next to the
+        checkpoints and is cut back to the last completed export on resume.
+        """
+        paths = export_paths(exports)
+        progress = Progress(f"parse [{self.tenant}]", sum(export_size(p) for p in paths))
+        fingerprints_file = os.path.join(self.dir, 'fingerprints.bin')
+
+        # Export n's key covers exports 0..n only, so appending a newer export keeps the earlier checkpoints
+        keys = []
+        key = self.code_key
+        for n, export in enumerate(paths):
+            key = chain(key, 'parse', n, export_signature(export))
+            keys.append(key)
+        saved = []
+        for n, key in enumerate(keys):
+            checkpoint = self.load(f"parse-{n}", key)
+            if checkpoint is None:
+                break
+            saved.append(checkpoint)
+
+        fingerprints = False
+        if len(paths) > 1:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(fingerprints_file, 'ab') as f:
+                f.truncate(saved[-1]['fingerprint_bytes'] if saved else 0)
+            fingerprints = FingerprintStore(fingerprints_file)
+
+        results = []
+        for n, export in enumerate(paths):
+            if n < len(saved):
+                results.append(saved[n]['result'])
+                progress.skip(export_size(export))
+                print(f"  [{self.tenant}] parse {os.path.basename(export)}: resumed from checkpoint")
+                continue
+            lines = progress.track(iter_export_lines(export))
+            if fingerprints is not False:
+                lines = dedup_lines(lines, fingerprints)
+            result = parse_lines(lines)
+            size = os.path.getsize(fingerprints_file) if fingerprints is not False else 0
+            self.save(f"parse-{n}", keys[n], result=result, fingerprint_bytes=size)
+            results.append(result)
+        progress.report(final=True)
+
+        self.key = keys[-1] if keys else self.key
+        if merge is not None:
+            return merge(results)
+        return [message for result in results for message in result]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clear', metavar='TENANT')
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(os.path.join(args.checkpoint_dir, args.clear), ignore_errors=True)
+        print(f"Cleared checkpoints of {args.clear}")
+        return
+
+    if not os.path.isdir(args.checkpoint_dir):
+        print("No checkpoints")
+        return
+    for tenant in sorted(os.listdir(args.checkpoint_dir)):
+        print(f"{tenant}:")
+        for script in sorted(os.listdir(os.path.join(args.checkpoint_dir, tenant))):
+            directory = os.path.join(args.checkpoint_dir, tenant, script)
+            stages = sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.pkl'))
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            print(f"  {script}: {', '.join(stages)} ({size / 1024 / 1024:.1f}MB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Recency-weighted answer counts, updated incrementally across runs.
+
+times_used / frequency count every use since the start of the chat, so an
+instruction repeated 40 times two years ago outranks this month's policy.
+DecayedCounts keeps, per answer cluster, an exponentially time-decayed count:
+a use `age` days old weighs 2 ** (-age / HALF_LIFE_DAYS).
+
+It uses forward decay: each use adds exp(rate * (t - landmark)) to the
+cluster's sum, where t is the message time in days and the landmark is a
+fixed time. The sum never has to be decayed on update. The count at time T is
+
+  score = sum * exp(-rate * (T - landmark))
+
+So a new message costs one addition, and old messages are never revisited.
+When the exponent grows past REBASE_EXPONENT, all sums are rescaled to a new
+landmark. This keeps the floats finite and is rare: every ~250 years at the
+default half-life.
+
+State is kept per tenant and counter name in STATE_DIR:
+  <tenant>/<name>.json               landmark, latest time, sums and raw counts
+  <tenant>/<name>.fingerprints.bin   messages already counted (message_fingerprints.py)
+
+A re-run over the same exports counts only messages it has not seen. The
+fingerprint file is cut back to the size recorded in the JSON on load, so a
+crash between the two writes never counts a message twice. Scores are
+evaluated at the latest message time, not the wall clock, so an unchanged
+chat gives unchanged output. Rebuild from scratch (restart=True) after
+changing how answers are grouped into clusters.
+
+Usage:
+  decayed_counts.py amir-bnei-brak extract-all-managers [--top 20]
+"""
+
+import os
+import json
+import math
+import argparse
+from datetime import datetime, timedelta
+
+from artifact_store import write_json
+from message_fingerprints import FingerprintStore, fingerprint, normalize_date, normalize_time
+
+STATE_DIR = "/Users/avivgranot/klear-ai/.cache/decayed-counts"
+HALF_LIFE_DAYS = 90
+REBASE_EXPONENT = 500       # exp() overflows a float past ~709
+STATE_VERSION = 1
+EPOCH = datetime(1970, 1, 1)
+
+def event_days(date, time):
+    """Chat date and time as days since the epoch, on the chat's own wall clock."""
+    moment = datetime.fromisoformat(f"{normalize_date(date)}T{normalize_time(time)}")
+    return (moment - EPOCH).total_seconds() / 86400
+
+class DecayedCounts:
+    def __init__(self, tenant, name, half_life_days=HALF_LIFE_DAYS, restart=False, state_dir=STATE_DIR):
+        directory = os.path.join(state_dir, tenant)
+        self.state_file = os.path.join(directory, f"{name}.json")
+        self.fingerprints_file = os.path.join(directory, f"{name}.fingerprints.bin")
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / half_life_days
+        self.landmark = None
+        self.latest = None
+        self.sums = {}
+        self.counts = {}
+        self.added = 0
+
+        state = None
+        if not restart and os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != STATE_VERSION or state.get('half_life_days') != half_life_days:
+                state = None    # Weights under another half-life can't be reused
+        if state:
+            self.landmark = state['landmark']
+            self.latest = state['latest']
+            self.sums = state['sums']
+            self.counts = state['counts']
+
+        os.makedirs(directory, exist_ok=True)
+        with open(self.fingerprints_file, 'ab') as f:
+            f.truncate(state['fingerprint_bytes'] if state else 0)
+        self.seen = FingerprintStore(self.fingerprints_file)
+
+    def __len__(self):
+        return len(self.sums)
+
+    def observe(self, key, date, time, sender, text):
+        """Count one message for the cluster `key`; False if it was already counted."""
+        fp = fingerprint(date, time, sender, text)
+        if fp in self.seen:
+            return False
+        self.seen.add(fp)
+
+        t = event_days(date, time)
+        if self.landmark is None:
+            self.landmark = t
+        if self.rate * (t - self.landmark) > REBASE_EXPONENT:
+            self.rebase(t)
+        self.sums[key] = self.sums.get(key, 0.0) + math.exp(self.rate * (t - self.landmark))
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.latest = t if self.latest is None else max(self.latest, t)
+        self.added += 1
+        return True
+
+    def rebase(self, landmark):
+        factor = math.exp(-self.rate * (landmark - self.landmark))
+        self.sums = {key: total * factor for key, total in self.sums.items()}
+        self.landmark = landmark
+
+    def score(self, key, at=None):
+        """Decayed count of the cluster at `at` (days since the epoch; default the latest message)."""
+        total = self.sums.get(key)
+        if total is None:
+            return 0.0
+        at = self.latest if at is None else at
+        return total * math.exp(-self.rate * (at - self.landmark))
+
+    def save(self):
+        self.seen.flush()
+        write_json(self.state_file, {
+            'version': STATE_VERSION,
+            'half_life_days': self.half_life_days,
+            'landmark': self.landmark,
+            'latest': self.latest,
+            'fingerprint_bytes': os.path.getsize(self.fingerprints_file),
+            'sums': self.sums,
+            'counts': self.counts,
+        }, keep=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tenant')
+    parser.add_argument('name', help='counter name, e.g. extract-all-managers')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    counts = DecayedCounts(args.tenant, args.name)
+    if not counts.sums:
+        print(f"No counts for {args.tenant}/{args.name}")
+        return
+    print(f"{len(counts)} clusters, half-life {counts.half_life_days} days, "
+          f"latest message {(EPOCH + timedelta(days=counts.latest)).date()}")
+    ranked = sorted(counts.sums, key=lambda key: -counts.sums[key])[:args.top]
+    for key in ranked:
+        print(f"  {counts.score(key):8.2f}  ({counts.counts[key]}x)  {key[:60]}")
+
+if __name__ == '__main__':
+    main()
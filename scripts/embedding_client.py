@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Batched, concurrent embedding for the KB build.
+
+Inputs are packed into requests under a token budget (BATCH_TOKENS,
+BATCH_INPUTS), and requests run concurrently with asyncio under a rate
+limiter (requests and tokens per minute). Failed requests are retried with
+exponential backoff and full jitter, honouring Retry-After.
+
+Backends:
+- openai: text-embedding-3-small over HTTPS, as generateEmbedding in
+          src/lib/ai.ts (OPENAI_API_KEY)
+- stub:   deterministic local vectors (hashed character trigrams), no
+          network, for offline runs and tests
+
+The CLI embeds a company's active knowledge items exactly like
+indexKnowledgeItem ("title\\n\\ncontent") and stores the vectors as JSON in
+KnowledgeItem.embedding, in one transaction.
+
+Usage:
+  embedding_client.py --company amir-bnei-brak [--backend stub] [--all]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import sqlite3
+import asyncio
+import argparse
+import urllib.error
+import urllib.request
+
+DB_FILE = "/Users/avivgranot/klear-ai/prisma/dev.db"
+
+MODEL = "text-embedding-3-small"
+DIMENSIONS = 1536
+API_URL = "https://api.openai.com/v1/embeddings"
+
+MAX_INPUT_TOKENS = 8191
+BATCH_TOKENS = 50_000
+BATCH_INPUTS = 512
+CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 3000
+TOKENS_PER_MINUTE = 1_000_000
+RETRIES = 5
+BACKOFF_BASE = 1.0     # seconds
+BACKOFF_MAX = 30.0
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def estimate_tokens(text):
+    """Rough upper bound without a tokenizer: Hebrew runs ~2 chars per token."""
+    return len(text) // 2 + 1
+
+def truncate(text, max_tokens=MAX_INPUT_TOKENS):
+    return text if estimate_tokens(text) <= max_tokens else text[:(max_tokens - 1) * 2]
+
+def make_batches(texts, max_tokens=BATCH_TOKENS, max_inputs=BATCH_INPUTS):
+    """Consecutive (start, texts, tokens) groups within both limits."""
+    batches, start, current, tokens = [], 0, [], 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if current and (tokens + cost > max_tokens or len(current) >= max_inputs):
+            batches.append((start, current, tokens))
+            start, current, tokens = i, [], 0
+        current.append(text)
+        tokens += cost
+    if current:
+        batches.append((start, current, tokens))
+    return batches
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, refilled continuously."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.rates = (requests_per_minute / 60, tokens_per_minute / 60)
+        self.capacity = (requests_per_minute, tokens_per_minute)
+        self.levels = list(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        cost = (1, min(tokens, self.capacity[1]))
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                elapsed, self.updated = now - self.updated, now
+                self.levels = [min(cap, level + rate * elapsed)
+                               for cap, level, rate in zip(self.capacity, self.levels, self.rates)]
+                wait = max((need - level) / rate for need, level, rate in zip(cost, self.levels, self.rates))
+                if wait <= 0:
+                    self.levels = [level - need for level, need in zip(self.levels, cost)]
+                    return
+                await asyncio.sleep(wait)
+
+class StubBackend:
+    """
+    Deterministic local embeddings: signed hashed character trigrams,
+    L2-normalized. Texts sharing words get close vectors.
+    fail_every=N makes every Nth request raise RetryableError.
+    """
+    name = 'stub'
+
+    def __init__(self, dimensions=DIMENSIONS, fail_every=0):
+        self.dimensions = dimensions
+        self.fail_every = fail_every
+        self.requests = 0
+
+    def vector(self, text):
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                h = zlib.crc32(padded[i:i + 3].encode('utf-8'))
+                vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [round(v / norm, 6) for v in vector]
+
+    async def embed(self, texts):
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            raise RetryableError("stub: injected failure")
+        return [self.vector(text) for text in texts]
+
+class OpenAIBackend:
+    name = 'openai'
+
+    def __init__(self, api_key=None, model=MODEL, timeout=60):
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
+        if not self.api_key:
+            raise SystemExit("OPENAI_API_KEY is not set (use --backend stub to run offline)")
+        self.model = model
+        self.timeout = timeout
+
+    def post(self, texts):
+        request = urllib.request.Request(
+            API_URL,
+            data=json.dumps({'model': self.model, 'input': texts}).encode('utf-8'),
+            headers={'Authorization': f"Bearer {self.api_key}", 'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                retry_after = e.headers.get('Retry-After')
+                raise RetryableError(f"HTTP {e.code}", float(retry_after) if retry_after else None)
+            raise
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise RetryableError(str(e))
+        return [row['embedding'] for row in sorted(body['data'], key=lambda row: row['index'])]
+
+    async def embed(self, texts):
+        return await asyncio.to_thread(self.post, texts)
+
+BACKENDS = {'stub': StubBackend, 'openai': OpenAIBackend}
+
+async def embed_batch(backend, limiter, semaphore, texts, tokens, retries=RETRIES):
+    for attempt in range(retries + 1):
+        await limiter.acquire(tokens)
+        async with semaphore:
+            try:
+                return await backend.embed(texts)
+            except RetryableError as e:
+                if attempt == retries:
+                    raise
+                delay = e.retry_after or random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        await asyncio.sleep(delay)
+
+async def embed_texts(texts, backend, concurrency=CONCURRENCY, limiter=None, on_batch=None):
+    """Embeddings for texts, in input order."""
+    texts = [truncate(text) for text in texts]
+    limiter = limiter or RateLimiter()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = [None] * len(texts)
+
+    async def run(start, batch, tokens):
+        vectors = await embed_batch(backend, limiter, semaphore, batch, tokens)
+        results[start:start + len(batch)] = vectors
+        if on_batch:
+            on_batch(len(batch))
+
+    await asyncio.gather(*(run(*batch) for batch in make_batches(texts)))
+    return results
+
+def embed(texts, backend=None, **kwargs):
+    """Synchronous wrapper around embed_texts (stub backend by default)."""
+    return asyncio.run(embed_texts(texts, backend or StubBackend(), **kwargs))
+
+def knowledge_text(title, title_he, content, content_he):
+    return f"{title_he or title}\n\n{content_he or content}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--company', required=True, help='Company id or slug')
+    parser.add_argument('--db', default=DB_FILE, help='SQLite database (default DB_FILE)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='openai')
+    parser.add_argument('--all', action='store_true', help='re-embed items that already have an embedding')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    backend = BACKENDS[args.backend]()
+    conn = sqlite3.connect(args.db)
+    try:
+        row = conn.execute('SELECT "id" FROM "Company" WHERE "id" = ? OR "slug" = ?',
+                           (args.company, args.company)).fetchone()
+        if not row:
+            sys.exit(f"Unknown company: {args.company}")
+        sql = ('SELECT "id", "title", "titleHe", "content", "contentHe" FROM "KnowledgeItem" '
+               'WHERE "companyId" = ? AND "isActive" = 1')
+        if not args.all:
+            sql += ' AND "embedding" IS NULL'
+        items = conn.execute(sql, (row[0],)).fetchall()
+        if not items:
+            print("Nothing to embed")
+            return
+
+        texts = [knowledge_text(*item[1:]) for item in items]
+        done = 0
+        start = time.perf_counter()
+
+        def progress(count):
+            nonlocal done
+            done += count
+            print(f"  {done}/{len(texts)} embedded ({time.perf_counter() - start:.1f}s)")
+
+        print(f"Embedding {len(texts)} items with {backend.name} "
+              f"({len(make_batches(texts))} requests, concurrency {args.concurrency})")
+        vectors = asyncio.run(embed_texts(texts, backend, args.concurrency, on_batch=progress))
+
+        with conn:
+            conn.executemany('UPDATE "KnowledgeItem" SET "embedding" = ? WHERE "id" = ?',
+                             [(json.dumps(vector), item[0]) for item, vector in zip(items, vectors)])
+    finally:
+        conn.close()
+
+    print(f"Stored {len(vectors)} embeddings in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
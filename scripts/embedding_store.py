@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Packed, quantized embedding artifact with two-stage search.
+
+KnowledgeItem.embedding holds each vector as JSON text (~30KB per item, parsed
+on every query). This builds one binary file per company next to the search
+index:
+
+  magic | header length | JSON header (ids, dim, offsets) | scan block | scales | exact block
+
+- scan block: int8 (per-row symmetric scale) or float16 copies of the
+  L2-normalized vectors; the only part scanned per query, in chunks
+- exact block: float32 vectors, memory-mapped; only the candidate rows are
+  ever read
+
+search() scans the quantized block for the top `k * RESCORE_FACTOR`
+candidates, then rescores those exactly and returns the top k. `evaluate`
+compares against brute-force float32 search and fails if recall@5 drops
+below 1 - RECALL_TOLERANCE.
+
+Usage:
+  embedding_store.py build --company amir-bnei-brak [--quantization int8|float16]
+  embedding_store.py evaluate --company amir-bnei-brak
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import sqlite3
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required: pip install numpy")
+
+DB_FILE = "/Users/avivgranot/klear-ai/prisma/dev.db"
+STORE_DIR = "/Users/avivgranot/klear-ai/src/data/search"
+
+MAGIC = b'KLEMB001'
+ALIGN = 64
+SCAN_CHUNK = 16384      # rows per scan step, bounds the float32 working set
+RESCORE_FACTOR = 10     # exact rescoring of k * RESCORE_FACTOR candidates
+RECALL_TOLERANCE = 0.01
+EVAL_QUERIES = 200
+EVAL_NOISE = 0.5        # norm of the noise added to a stored vector to make a query
+
+def store_path(company, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f"{company}.emb")
+
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def quantize(vectors, quantization):
+    """(scan block, per-row scales); scales are 1 for float16."""
+    if quantization == 'float16':
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    q = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+def write_store(path, ids, vectors, quantization='int8'):
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    scan, scales = quantize(vectors, quantization)
+    n, dim = vectors.shape
+
+    header = {'ids': ids, 'count': n, 'dim': dim, 'quantization': quantization, 'scan_dtype': str(scan.dtype)}
+    # Offsets depend on the header size, which depends on the offsets: repeat until stable
+    header.update(scan_offset=0, scales_offset=0, exact_offset=0)
+    while True:
+        header_bytes = json.dumps(header).encode('utf-8')
+        start = aligned(len(MAGIC) + 4 + len(header_bytes))
+        if start == header['scan_offset']:
+            break
+        header['scan_offset'] = start
+        header['scales_offset'] = aligned(start + scan.nbytes)
+        header['exact_offset'] = aligned(header['scales_offset'] + scales.nbytes)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        for offset, block in ((header['scan_offset'], scan), (header['scales_offset'], scales),
+                              (header['exact_offset'], vectors)):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(np.ascontiguousarray(block).tobytes())
+    os.replace(tmp_path, path)
+    return header
+
+class EmbeddingStore:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not an embedding store: {path}")
+            (length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(length))
+        n, dim = self.header['count'], self.header['dim']
+        self.ids = self.header['ids']
+        self.scan = np.memmap(path, dtype=self.header['scan_dtype'], mode='r',
+                              offset=self.header['scan_offset'], shape=(n, dim))
+        self.scales = np.memmap(path, dtype=np.float32, mode='r', offset=self.header['scales_offset'], shape=(n,))
+        self.exact = np.memmap(path, dtype=np.float32, mode='r', offset=self.header['exact_offset'], shape=(n, dim))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, query, count):
+        """Indexes of the top `count` rows by quantized score."""
+        best_scores = np.empty(0, dtype=np.float32)
+        best_index = np.empty(0, dtype=np.int64)
+        for start in range(0, len(self), SCAN_CHUNK):
+            block = self.scan[start:start + SCAN_CHUNK].astype(np.float32)
+            scores = (block @ query) * self.scales[start:start + SCAN_CHUNK]
+            best_scores = np.concatenate([best_scores, scores])
+            best_index = np.concatenate([best_index, np.arange(start, start + len(scores))])
+            if best_scores.size > count:
+                keep = np.argpartition(-best_scores, count - 1)[:count]
+                best_scores, best_index = best_scores[keep], best_index[keep]
+        return np.sort(best_index)
+
+    def search(self, query, k=5, rescore_factor=RESCORE_FACTOR):
+        """[(id, cosine)] of the top k: quantized scan, then exact rescoring."""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        k = min(k, len(self))
+        if k == 0:
+            return []
+        index = self.candidates(query, min(len(self), k * rescore_factor))
+        exact = self.exact[index] @ query
+        order = np.argsort(-exact)[:k]
+        return [(self.ids[index[i]], float(exact[i])) for i in order]
+
+def read_db_embeddings(db_path, company):
+    """(ids, float32 matrix, seconds spent parsing JSON) for a company's embedded items."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute('SELECT "id" FROM "Company" WHERE "id" = ? OR "slug" = ?', (company, company)).fetchone()
+        if not row:
+            sys.exit(f"Unknown company: {company}")
+        rows = conn.execute(
+            'SELECT "id", "embedding" FROM "KnowledgeItem" '
+            'WHERE "companyId" = ? AND "isActive" = 1 AND "embedding" IS NOT NULL ORDER BY "id"',
+            (row[0],)
+        ).fetchall()
+    finally:
+        conn.close()
+    start = time.perf_counter()
+    vectors = np.array([json.loads(embedding) for _, embedding in rows], dtype=np.float32)
+    return [item_id for item_id, _ in rows], vectors, time.perf_counter() - start
+
+def evaluate(store, vectors, queries=EVAL_QUERIES, k=5, seed=0):
+    """recall@k of store.search against brute-force float32 search, and mean query time."""
+    rng = np.random.default_rng(seed)
+    exact = normalize_rows(vectors)
+    picks = rng.choice(len(exact), size=min(queries, len(exact)), replace=False)
+    noisy = exact[picks] + rng.normal(0, EVAL_NOISE / np.sqrt(exact.shape[1]), size=(len(picks), exact.shape[1])).astype(np.float32)
+
+    position = {item_id: i for i, item_id in enumerate(store.ids)}
+    hits, elapsed = 0, 0.0
+    for query in noisy:
+        truth = set(np.argsort(-(exact @ (query / np.linalg.norm(query))))[:k].tolist())
+        start = time.perf_counter()
+        found = store.search(query, k)
+        elapsed += time.perf_counter() - start
+        hits += len(truth & {position[item_id] for item_id, _ in found})
+    return hits / (len(picks) * k), elapsed / len(picks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'evaluate'])
+    parser.add_argument('--company', required=True, help='Company id or slug')
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--quantization', choices=['int8', 'float16'], default='int8')
+    args = parser.parse_args()
+
+    path = store_path(args.company, args.store_dir)
+    ids, vectors, parse_time = read_db_embeddings(args.db, args.company)
+    if not ids:
+        sys.exit("No embeddings found (run embedding_client.py first)")
+
+    if args.command == 'build':
+        write_store(path, ids, vectors, args.quantization)
+        print(f"Stored {len(ids)} x {vectors.shape[1]} ({args.quantization}) -> {path} "
+              f"({os.path.getsize(path) / 1024 / 1024:.1f}MB)")
+        return
+
+    start = time.perf_counter()
+    store = EmbeddingStore(path)
+    load_time = time.perf_counter() - start
+    scan_bytes = store.scan.nbytes + store.scales.nbytes
+    json_bytes = sum(len(json.dumps(v.tolist())) for v in vectors[:100]) / min(len(vectors), 100) * len(vectors)
+
+    recall, query_time = evaluate(store, vectors)
+    print(f"Items: {len(store)} ({store.header['quantization']})")
+    print(f"Load: JSON parse {parse_time * 1000:.0f}ms -> store open {load_time * 1000:.1f}ms")
+    print(f"Scanned per query: {scan_bytes / 1024 / 1024:.1f}MB "
+          f"(float32 {vectors.nbytes / 1024 / 1024:.1f}MB, JSON ~{json_bytes / 1024 / 1024:.1f}MB)")
+    print(f"Query: {query_time * 1000:.2f}ms")
+    print(f"recall@5: {recall:.4f} (tolerance {RECALL_TOLERANCE})")
+    if recall < 1 - RECALL_TOLERANCE:
+        sys.exit("recall@5 below tolerance")
+
+if __name__ == '__main__':
+    main()
@@ -6,64 +6,56 @@ Extract repeated answers from ALL managers:
 - Sari Peretz / שרי פרץ
 - Yeshi Peretz / ישי פרץ
 
-Also track associated media files.
+Also track associated media files. Re-sent media are matched by content
+(see media_catalog.py), since WhatsApp renames every re-send. Media already
+rendered by build-media-renditions.py get their url / thumbnailUrl back.
+
+Messages come from the shared per-message feature table
+(message_features.py). Parsing and media hashing are checkpointed per
+tenant (see checkpoints.py): a run that dies partway resumes from the last
+completed stage.
+
+Responses are streamed: message dicts are built one at a time from the
+feature table, collect_responses() looks at a few messages around each one,
+and every response goes straight into spill_grouping.SpillGrouper, which
+moves to a temporary SQLite table past --memory-budget with identical
+output. No list of all messages or responses is ever held.
+
+Each item also gets a recency-weighted `score`: its uses decayed with a
+HALF_LIFE_DAYS half-life, maintained incrementally across runs (see
+decayed_counts.py; --restart recounts). load-knowledge.py ranks by it.
+
+--parquet also writes the parsed messages, Q&A pairs and repeated-answer
+clusters as tenant/month-partitioned Parquet (parquet_store.py, needs
+pyarrow) for query-messages.py.
+
+Usage:
+  extract-all-managers.py [--tenant amir-bnei-brak] [--export PATH ...] [--restart]
+  extract-all-managers.py --memory-budget 64     # MB held in memory while grouping
+  extract-all-managers.py --parquet [DIR]        # also write the Parquet datasets
 """
 
-import re
-import json
-from collections import defaultdict
+import argparse
+from collections import defaultdict, deque
 
+from media_catalog import index_export, content_keys, load_renditions, link_renditions
+from category_classifier import classify_items
+from knowledge_ids import record_build, carry_forward
+from checkpoints import Checkpoints
+from artifact_store import write_json
+from spill_grouping import SpillGrouper
+from message_features import load_features
+from message_fingerprints import normalize_date
+from decayed_counts import DecayedCounts, HALF_LIFE_DAYS
+
+# A single export, or a list of overlapping exports of the same group
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json"
-
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-
-# All managers
-MANAGERS = {
-    "nevo": ["Nevo Perets", "נבו פרץ", "נבו"],
-    "hila": ["Hila Peretz", "הילה פרץ", "הילה"],
-    "sari": ["Sari Peretz", "שרי פרץ", "שרי"],
-    "yeshi": ["Yeshi Peretz", "ישי פרץ", "ישי"],
-}
-
-# Flatten for matching
-ALL_MANAGER_NAMES = []
-for names in MANAGERS.values():
-    ALL_MANAGER_NAMES.extend(names)
-
-# Noise patterns to filter
-NOISE_ANSWERS = [
-    'שבת שלום', 'שבוע טוב', 'בוקר טוב', 'ערב טוב', 'לילה טוב',
-    'תודה', 'בבקשה', 'אמן', 'מחקת את ההודעה',
-    'חחח', 'הההה', 'ok', 'אוקיי', 'סבבה', 'מצויין',
-    'my car', 'שלום', 'היי'
-]
-
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def normalize(text):
-    text = clean_text(text).lower()
-    text = re.sub(r'[?.!,\-\'\"()]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def is_noise(text):
-    text_lower = normalize(text)
-    if len(text_lower) < 5:
-        return True
-    for noise in NOISE_ANSWERS:
-        if text_lower.startswith(noise.lower()) or text_lower == noise.lower():
-            return True
-    return False
-
-def get_manager_id(sender):
-    """Get manager ID from sender name."""
-    sender_clean = clean_text(sender)
-    for manager_id, names in MANAGERS.items():
-        if any(name in sender_clean for name in names):
-            return manager_id
-    return None
+EXPORT_COMPANY = "amir-bnei-brak"
+MEMORY_BUDGET_MB = 256
+QUESTION_LOOKBACK = 4   # messages before an answer searched for its question
+MEDIA_LOOKAHEAD = 2     # messages after an answer searched for its media
+PARQUET_DIR = "/Users/avivgranot/klear-ai/src/data/parquet"
 
 def get_manager_display_name(manager_id):
     """Get display name for manager."""
@@ -75,75 +67,46 @@ def get_manager_display_name(manager_id):
     }
     return names.get(manager_id, "מנהל")
 
-def extract_media_info(text):
-    """Extract media filename and type from message."""
-    if '<מצורף:' in text:
-        match = re.search(r'<מצורף: ([^>]+)>', text)
-        if match:
-            filename = match.group(1)
-            # Determine media type
-            ext = filename.split('.')[-1].lower() if '.' in filename else ''
-            media_type = 'image' if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp'] else \
-                         'video' if ext in ['mp4', 'mov', 'avi'] else \
-                         'document' if ext in ['pdf', 'doc', 'docx', 'xls', 'xlsx'] else 'file'
-            return {'filename': filename, 'type': media_type}
-    if 'התמונה הושמטה' in text:
-        return {'filename': None, 'type': 'image_removed'}
-    return None
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                manager_id = get_manager_id(sender)
-                media_info = extract_media_info(text)
-
-                messages.append({
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': manager_id is not None,
-                    'manager_id': manager_id,
-                    'is_media': media_info is not None,
-                    'media_info': media_info
-                })
-    return messages
-
-def main():
-    print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
-    print(f"Total messages: {len(messages)}")
-
-    # Count messages per manager
-    manager_counts = defaultdict(int)
-    for msg in messages:
-        if msg['manager_id']:
-            manager_counts[msg['manager_id']] += 1
-
-    print("\nMessages per manager:")
-    for manager_id, count in sorted(manager_counts.items(), key=lambda x: -x[1]):
-        print(f"  {get_manager_display_name(manager_id)}: {count}")
-
-    # ============================================
-    # Collect manager responses with context
-    # ============================================
-    manager_responses = []
+def messages_from_features(table, media_keys):
+    """Message dicts for collect_responses(), built one at a time from the shared feature table."""
+    columns = ('date', 'time', 'sender', 'text', 'manager_id', 'media_filename', 'media_type', 'normalized', 'is_noise')
+    for date, time, sender, text, manager_id, filename, media_type, normalized, noise in table.rows(*columns):
+        media_info = {'filename': filename, 'type': media_type} if media_type else None
+        if media_info and filename in media_keys:
+            media_info['content_key'] = media_keys[filename]
+        yield {
+            'date': date,
+            'time': time,
+            'sender': sender,
+            'text': text,
+            'is_manager': manager_id is not None,
+            'manager_id': manager_id,
+            'is_media': media_info is not None,
+            'media_info': media_info,
+            'normalized': normalized,
+            'is_noise': noise
+        }
 
-    for i, msg in enumerate(messages):
+def index_media(exports):
+    catalog = index_export(exports)
+    return len(catalog), content_keys(catalog)
+
+def lookahead(items, size):
+    """(item, [up to `size` items after it]) for each item, holding only size + 1 items."""
+    window = deque()
+    for item in items:
+        window.append(item)
+        if len(window) > size:
+            yield window.popleft(), list(window)
+    while window:
+        yield window.popleft(), list(window)
+
+def collect_responses(messages):
+    """Every manager message with its triggering question and nearby media, as a stream."""
+    previous = deque(maxlen=QUESTION_LOOKBACK)
+    for msg, following in lookahead(messages, MEDIA_LOOKAHEAD):
         if not msg['is_manager']:
+            previous.append(msg)
             continue
 
         answer = msg['text']
@@ -152,8 +115,7 @@ def main():
         # Look back for the triggering question
         question = None
         question_sender = None
-        for j in range(i-1, max(0, i-5), -1):
-            prev = messages[j]
+        for prev in reversed(previous):
             if not prev['is_manager']:
                 if 'בהמתנה' in prev['text'] or len(prev['text']) < 3:
                     continue
@@ -167,14 +129,14 @@ def main():
         if msg['media_info']:
             associated_media.append(msg['media_info'])
         # Check next few messages from same manager
-        for j in range(i+1, min(i+3, len(messages))):
-            next_msg = messages[j]
+        for next_msg in following:
             if next_msg['manager_id'] == manager_id and next_msg['media_info']:
                 associated_media.append(next_msg['media_info'])
             elif next_msg['is_manager'] and next_msg['manager_id'] != manager_id:
                 break  # Different manager responded
 
-        manager_responses.append({
+        previous.append(msg)
+        yield {
             'answer': answer,
             'manager_id': manager_id,
             'manager_name': get_manager_display_name(manager_id),
@@ -183,57 +145,110 @@ def main():
             'associated_media': associated_media,
             'question': question,
             'question_sender': question_sender,
-            'date': msg['date']
-        })
+            'sender': msg['sender'],
+            'date': msg['date'],
+            'time': msg['time'],
+            'answer_key': msg['normalized'],
+            'is_noise': msg['is_noise']
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenant', default=EXPORT_COMPANY)
+    parser.add_argument('--export', action='append', help='Chat export (repeat for overlapping exports); default CHAT_FILE')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--restart', action='store_true', help='Ignore existing checkpoints')
+    parser.add_argument('--memory-budget', type=int, default=MEMORY_BUDGET_MB,
+                        help='MB of grouped responses to hold before spilling to disk')
+    parser.add_argument('--parquet', nargs='?', const=PARQUET_DIR, metavar='DIR',
+                        help=f'Also write Parquet datasets (default dir {PARQUET_DIR})')
+    args = parser.parse_args()
+    if args.parquet:
+        # Only needed (and only requires pyarrow) when asked for
+        import parquet_store
+    exports = args.export or CHAT_FILE
+    checkpoints = Checkpoints(args.tenant, __file__, exports, restart=args.restart)
+
+    print("Parsing chat...")
+    features = load_features(exports, args.tenant, restart=args.restart)
+    checkpoints.depend(features.key)
+    print(f"Total messages: {len(features)}")
+
+    # Identify attachments by content, not by the filename WhatsApp assigned
+    attachments, media_keys = checkpoints.stage('media', lambda: index_media(exports))
+    print(f"Attachments: {attachments} files, {len(set(media_keys.values()))} unique by content")
+
+    # Count messages per manager
+    manager_counts = defaultdict(int)
+    for manager_id in features['manager_id']:
+        if manager_id:
+            manager_counts[manager_id] += 1
 
-    print(f"\nTotal manager responses: {len(manager_responses)}")
+    print("\nMessages per manager:")
+    for manager_id, count in sorted(manager_counts.items(), key=lambda x: -x[1]):
+        print(f"  {get_manager_display_name(manager_id)}: {count}")
 
     # ============================================
-    # Group by answer (text or media filename)
+    # Collect manager responses with context and group them by answer
+    # (text or media content) as they stream past
     # ============================================
-    answer_groups = defaultdict(list)
+    answer_groups = SpillGrouper(memory_budget=args.memory_budget * 1024 * 1024)
+    decayed = DecayedCounts(args.tenant, 'extract-all-managers', restart=args.restart)
 
-    for resp in manager_responses:
+    response_count = 0
+    for resp in collect_responses(messages_from_features(features, media_keys)):
+        response_count += 1
         if resp['is_media'] and resp['media_info'] and resp['media_info'].get('filename'):
-            # Group by media filename
-            key = f"MEDIA:{resp['media_info']['filename']}"
+            # Group by media content, falling back to filename when the file is missing
+            media = resp['media_info']
+            key = f"MEDIA:{media.get('content_key', media['filename'])}"
         else:
             # Group by normalized text
-            key = normalize(resp['answer'])[:80]
+            key = resp['answer_key'][:80]
 
         if len(key) < 5:
             continue
 
-        answer_groups[key].append(resp)
+        answer_groups.add(key, resp)
+        decayed.observe(key, resp['date'], resp['time'], resp['sender'], resp['answer'])
 
-    # Filter to repeated answers (2+ times)
-    repeated = {k: v for k, v in answer_groups.items() if len(v) >= 2}
+    decayed.save()
+    print(f"\nTotal manager responses: {response_count}")
+    print(f"Decayed counts: {decayed.added} new messages counted, {len(decayed)} clusters")
 
-    print(f"\nRepeated patterns (2+ times): {len(repeated)}")
+    # Repeated answers (2+ times), most frequent first
+    if answer_groups.spilled:
+        print(f"Grouping spilled to disk (over {args.memory_budget}MB)")
+    print(f"\nRepeated patterns (2+ times): {answer_groups.group_count(min_size=2)}")
 
     # ============================================
     # Build knowledge items by manager
     # ============================================
     knowledge_items = []
 
-    for answer_key, responses in sorted(repeated.items(), key=lambda x: -len(x[1])):
+    for answer_key, responses in answer_groups.groups(min_size=2):
         first = responses[0]
         count = len(responses)
 
         # Filter noise for text answers
-        if not first['is_media'] and is_noise(first['answer']):
+        if not first['is_media'] and first['is_noise']:
             print(f"  Skipping noise: {first['answer'][:30]}")
             continue
 
         # Collect unique questions that triggered this
-        questions = list(set(r['question'] for r in responses if r['question']))[:5]
+        questions = list(dict.fromkeys(r['question'] for r in responses if r['question']))[:5]
 
-        # Collect all associated media
+        # Collect all associated media (one per content key)
         all_media = []
+        seen_media = set()
         for r in responses:
             if r['associated_media']:
                 for m in r['associated_media']:
-                    if m and m.get('filename') and m['filename'] not in [am.get('filename') for am in all_media]:
+                    if not m or not m.get('filename'):
+                        continue
+                    media_key = m.get('content_key', m['filename'])
+                    if media_key not in seen_media:
+                        seen_media.add(media_key)
                         all_media.append(m)
 
         # Determine type
@@ -244,6 +259,8 @@ def main():
             answer_type = 'text'
             display_answer = first['answer']
 
+        dates = [normalize_date(r['date']) for r in responses]
+
         # Get manager info
         manager_id = first['manager_id']
         manager_name = first['manager_name']
@@ -263,11 +280,15 @@ def main():
             'associated_media': all_media[:3],  # Limit to 3 media files
             'example_questions': questions,
             'times_used': count,
-            'last_date': max(r['date'] for r in responses),
+            'score': round(decayed.score(answer_key), 3),
+            'first_date': min(dates),
+            'last_date': max(dates),
             'status': 'pending_approval'  # All start as pending
         }
         knowledge_items.append(item)
 
+    answer_groups.close()
+
     print(f"\nUseful knowledge items: {len(knowledge_items)}")
 
     # Show results by manager
@@ -306,6 +327,7 @@ def main():
             'answer_type': item['type'],
             'source': 'automation_pattern',
             'frequency': item['times_used'],
+            'score': item['score'],
             'manager_id': item['manager_id'],
             'manager_name': item['manager_name'],
             'media_info': item['media_info'],
@@ -315,6 +337,13 @@ def main():
             'status': item['status']
         })
 
+    classify_items(kb_items)
+
+    # A pattern approved or rejected on an earlier build keeps that status
+    carry_forward(kb_items, args.output, ('status',))
+    link_renditions(kb_items, load_renditions())
+    record_build(kb_items, args.output)
+
     # Save
     output = {
         'description': 'Repeated answers from managers that can be automated',
@@ -322,13 +351,19 @@ def main():
         'by_manager': {m: len([i for i in kb_items if i['manager_name'] == m]) for m in set(i['manager_name'] for i in kb_items)},
         'text_patterns': len([i for i in kb_items if i['answer_type'] == 'text']),
         'media_patterns': len([i for i in kb_items if i['answer_type'] != 'text']),
+        'score_half_life_days': HALF_LIFE_DAYS,
         'items': kb_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(args.output, output)
+
+    print(f"\nSaved to {args.output}")
 
-    print(f"\nSaved to {OUTPUT_FILE}")
+    if args.parquet:
+        # A second streamed pass: cheaper than keeping every response for this
+        responses = collect_responses(messages_from_features(features, media_keys))
+        counts = parquet_store.write_tenant(args.tenant, features, responses, knowledge_items, args.parquet)
+        print(f"Parquet: {', '.join(f'{name} {rows}' for name, rows in counts.items())} rows in {args.parquet}")
 
 if __name__ == '__main__':
     main()
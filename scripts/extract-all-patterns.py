@@ -4,18 +4,22 @@ Extract ALL repeated patterns from Nevo:
 1. Repeated TEXT answers (same text 2+ times)
 2. Repeated MEDIA (same image/file shared 2+ times)
 3. Filter out greetings and noise
+
+Parsing and normalization come from the shared per-message feature table
+(message_features.py). The noise list is this script's own: it is narrower
+than the shared NOISE_ANSWERS, so answers such as 'שלום ...' or 'היי ...'
+are still counted as patterns here.
 """
 
-import re
-import json
 from collections import defaultdict
 
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
 # Filter these out - not useful for automation
 NOISE_ANSWERS = [
     'שבת שלום', 'שבוע טוב', 'בוקר טוב', 'ערב טוב',
@@ -23,66 +27,17 @@ NOISE_ANSWERS = [
     'חחח', 'הההה', 'ok', 'אוקיי', 'סבבה',
     'my car'  # Seems like an error
 ]
+NOISE_ANSWERS_LOWER = [noise.lower() for noise in NOISE_ANSWERS]
 
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def normalize(text):
-    text = clean_text(text).lower()
-    text = re.sub(r'[?.!,\-\'\"()]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def is_noise(text):
-    """Check if answer is noise/greeting."""
-    text_lower = normalize(text)
-    if len(text_lower) < 5:
+def is_noise(normalized):
+    """Check if a normalized answer is noise/greeting."""
+    if len(normalized) < 5:
         return True
-    for noise in NOISE_ANSWERS:
-        if text_lower.startswith(noise.lower()) or text_lower == noise.lower():
-            return True
-    return False
-
-def extract_media_filename(text):
-    """Extract media filename from attachment text."""
-    match = re.search(r'<מצורף: ([^>]+)>', text)
-    if match:
-        return match.group(1)
-    return None
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                is_media = '<מצורף:' in text or 'התמונה הושמטה' in text
-                media_file = extract_media_filename(text) if is_media else None
-
-                messages.append({
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': is_media,
-                    'media_file': media_file
-                })
-    return messages
+    return any(normalized.startswith(noise) or normalized == noise for noise in NOISE_ANSWERS_LOWER)
 
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     # ============================================
@@ -114,7 +69,9 @@ def main():
             'media_file': msg['media_file'],
             'question': question,
             'question_sender': question_sender,
-            'date': msg['date']
+            'date': msg['date'],
+            'normalized': msg['normalized'],
+            'is_noise': is_noise(msg['normalized'])
         })
 
     print(f"Nevo's responses: {len(nevo_responses)}")
@@ -130,7 +87,7 @@ def main():
             key = f"MEDIA:{resp['media_file']}"
         else:
             # Group by normalized text
-            key = normalize(resp['answer'])[:80]
+            key = resp['normalized'][:80]
 
         if len(key) < 5:
             continue
@@ -152,12 +109,12 @@ def main():
         count = len(responses)
 
         # Filter noise for text answers
-        if not first['is_media'] and is_noise(first['answer']):
+        if not first['is_media'] and first['is_noise']:
             print(f"  Skipping noise: {first['answer'][:30]}")
             continue
 
         # Collect unique questions that triggered this
-        questions = list(set(r['question'] for r in responses if r['question']))[:5]
+        questions = list(dict.fromkeys(r['question'] for r in responses if r['question']))[:5]
 
         # Determine type
         if first['is_media']:
@@ -218,6 +175,8 @@ def main():
             'raw_answer': item['answer']
         })
 
+    record_build(kb_items, OUTPUT_FILE)
+
     # Save
     output = {
         'description': 'Repeated answers from Nevo that can be automated',
@@ -227,8 +186,7 @@ def main():
         'items': kb_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
@@ -4,18 +4,22 @@ Extract CORE operational knowledge from WhatsApp chat.
 Focus on:
 1. Nevo's repeated messages (instructions/alerts)
 2. True Q&A patterns where similar questions get similar answers
+
+Messages and their normalized text come from the shared per-message feature
+table (message_features.py); the stricter NOISE_PATTERNS filter is this
+script's own.
 """
 
 import re
-import json
 from collections import Counter, defaultdict
 
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features, normalize
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/core-knowledge.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
 # Filter out these patterns
 NOISE_PATTERNS = [
     r'^בוקר טוב', r'^צהריים טובים', r'^ערב טוב', r'^לילה טוב',
@@ -27,9 +31,6 @@ NOISE_PATTERNS = [
     r'^מחקת את ההודעה', r'^בהמתנה להודעה'
 ]
 
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
 def is_noise(text):
     """Check if text is noise/greeting."""
     if len(text) < 5:
@@ -40,41 +41,9 @@ def is_noise(text):
             return True
     return False
 
-def normalize(text):
-    """Normalize for comparison."""
-    text = clean_text(text).lower()
-    text = re.sub(r'[?.!,\-\'\"()]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-    return messages
-
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     # ============================================
@@ -91,7 +60,7 @@ def main():
         if is_noise(text) or len(text) < 15:
             continue
 
-        norm = normalize(text)
+        norm = msg['normalized']
         if len(norm) < 10:
             continue
 
@@ -213,6 +182,8 @@ def main():
     print(f"Added {len(top_qa)} Q&A pairs")
     print(f"Total knowledge items: {len(knowledge_items)}")
 
+    record_build(knowledge_items, OUTPUT_FILE)
+
     # Save
     output = {
         'total_items': len(knowledge_items),
@@ -221,8 +192,7 @@ def main():
         'items': knowledge_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
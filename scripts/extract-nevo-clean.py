@@ -2,56 +2,17 @@
 """
 Extract CLEAN knowledge from Nevo Perets (manager) responses.
 Focus on his direct text answers, not noisy context.
+
+Messages come from the shared per-message feature table (message_features.py).
 """
 
-import re
-import json
-from pathlib import Path
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features
 
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-knowledge.json"
 
-# Manager identifiers
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
-# Message pattern
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-
-def clean_text(text):
-    """Clean invisible chars."""
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def parse_chat(filepath):
-    """Parse WhatsApp chat into messages."""
-    messages = []
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                # Skip system messages
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-
-    return messages
-
 def extract_qa_pairs(messages):
     """Extract Q&A pairs - employee question followed by Nevo's answer."""
     qa_pairs = []
@@ -114,7 +75,7 @@ def extract_instructions(messages):
 
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     manager_msgs = [m for m in messages if m['is_manager']]
@@ -167,9 +128,10 @@ def main():
 
     print(f"\nTotal unique knowledge items: {len(knowledge_items)}")
 
+    record_build(knowledge_items, OUTPUT_FILE)
+
     # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(knowledge_items, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, knowledge_items)
 
     print(f"Saved to {OUTPUT_FILE}")
 
@@ -2,113 +2,37 @@
 """
 Extract Nevo's operational knowledge - FINAL VERSION.
 Focus on his actual messages, not forced Q&A pairing.
+
+Noise, operational keywords and normalization come from the shared
+per-message feature table (message_features.py). Each item's `score` is
+its recency-weighted frequency (decayed_counts.py), kept across runs.
 """
 
-import re
-import json
 from collections import Counter
 
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features, EXPORT_COMPANY
+from decayed_counts import DecayedCounts
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-operational.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
-# Noise patterns to filter
-NOISE_WORDS = [
-    'בוקר טוב', 'צהריים טובים', 'ערב טוב', 'לילה טוב',
-    'שבוע טוב', 'שבת שלום', 'חג שמח', 'שנה טובה',
-    'תודה', 'בבקשה', 'אמן', 'חחח', 'לול', 'הההה',
-    'שלום', 'היי', 'הי', 'מצויין', 'סבבה', 'אוקיי',
-    'מחקת את ההודעה', 'בהמתנה להודעה', 'התמונה הושמטה'
-]
-
-# Operational keywords - messages containing these are valuable
-OPERATIONAL_KEYWORDS = [
-    # Safety & Alerts
-    'נכה', 'חשוד', 'מטף', 'חירום', 'בטיחות', 'משטרה', 'שוטר',
-    # Fuel
-    'דלק', 'תדלוק', 'משאבה', 'סולר', 'בנזין', 'ליטר', 'אקדח',
-    # Payment
-    'קופה', 'תשלום', 'כרטיס', 'מזומן', 'קבלה', 'חשבונית', 'מחיר',
-    # Equipment
-    'מכונה', 'טרמינל', 'שטיפה', 'מדפסת',
-    # Inventory
-    'מלאי', 'הזמנה', 'שמן', 'חלב', 'מוצר', 'סחורה',
-    # Procedures
-    'אסור', 'מותר', 'חובה', 'צריך', 'שימו לב', 'אישור', 'נוהל',
-    # Shift
-    'משמרת', 'סידור', 'החלפה',
-    # Customer service
-    'לקוח', 'תלונה', 'שירות', 'ארוחה'
-]
-
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def is_noise(text):
-    """Check if message is just noise/greeting."""
-    text_lower = text.lower()
-    if len(text) < 8:
-        return True
-    for noise in NOISE_WORDS:
-        if text_lower.startswith(noise.lower()) and len(text) < 30:
-            return True
-        if text_lower == noise.lower():
-            return True
-    return False
-
-def has_operational_content(text):
-    """Check if message has operational content."""
-    text_lower = text.lower()
-    return any(kw in text_lower for kw in OPERATIONAL_KEYWORDS)
-
-def normalize(text):
-    """Normalize for deduplication."""
-    text = clean_text(text).lower()
-    text = re.sub(r'[?.!,\-\'\"()]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()[:60]
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-    return messages
-
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
-    print(f"Total messages: {len(messages)}")
+    features = load_features(CHAT_FILE)
+    print(f"Total messages: {len(features)}")
 
     # Get all Nevo's text messages
     nevo_messages = []
-    for msg in messages:
-        if not msg['is_manager'] or msg['is_media']:
+    decayed = DecayedCounts(EXPORT_COMPANY, 'extract-nevo-final')
+    columns = ('date', 'time', 'sender', 'text', 'is_nevo', 'is_media', 'is_chatter', 'is_operational', 'normalized')
+    for date, time, sender, text, is_nevo, is_media, is_chatter, is_operational, normalized in features.rows(*columns):
+        if not is_nevo or is_media or is_chatter:
             continue
-        text = msg['text']
-        if is_noise(text):
-            continue
-        nevo_messages.append({'text': text, 'date': msg['date']})
+        nevo_messages.append({'text': text, 'date': date, 'normalized': normalized[:60], 'operational': is_operational})
+        decayed.observe(normalized[:60], date, time, sender, text)
+    decayed.save()
 
     print(f"Nevo's non-noise messages: {len(nevo_messages)}")
 
@@ -116,7 +40,7 @@ def main():
     counter = Counter()
     examples = {}
     for msg in nevo_messages:
-        norm = normalize(msg['text'])
+        norm = msg['normalized']
         if len(norm) < 10:
             continue
         counter[norm] += 1
@@ -134,7 +58,8 @@ def main():
             repeated.append({
                 'text': examples[norm]['text'],
                 'date': examples[norm]['date'],
-                'count': count
+                'count': count,
+                'score': round(decayed.score(norm), 3)
             })
             seen.add(norm)
 
@@ -145,14 +70,15 @@ def main():
 
     # Get operational messages (not already in repeated)
     for msg in nevo_messages:
-        norm = normalize(msg['text'])
+        norm = msg['normalized']
         if norm in seen:
             continue
-        if has_operational_content(msg['text']) and len(msg['text']) >= 15:
+        if msg['operational'] and len(msg['text']) >= 15:
             operational.append({
                 'text': msg['text'],
                 'date': msg['date'],
-                'count': 1
+                'count': 1,
+                'score': round(decayed.score(norm), 3)
             })
             seen.add(norm)
 
@@ -174,6 +100,7 @@ def main():
             'type': 'instruction',
             'source': 'manager_repeated',
             'frequency': item['count'],
+            'score': item['score'],
             'priority': 'high'
         })
 
@@ -187,6 +114,7 @@ def main():
             'type': 'instruction',
             'source': 'manager_operational',
             'frequency': 1,
+            'score': item['score'],
             'priority': 'normal'
         })
 
@@ -194,6 +122,8 @@ def main():
     print(f"  - Repeated (high priority): {len(repeated)}")
     print(f"  - Operational (normal): {min(len(operational), 150)}")
 
+    record_build(knowledge_items, OUTPUT_FILE)
+
     # Save
     output = {
         'manager': 'נבו פרץ (Nevo Perets)',
@@ -203,8 +133,7 @@ def main():
         'items': knowledge_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
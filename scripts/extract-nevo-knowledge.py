@@ -2,59 +2,32 @@
 """
 Extract knowledge from Nevo Perets (manager) responses in WhatsApp chat.
 Creates Q&A pairs where employees ask and Nevo responds.
+
+Messages come from the shared per-message feature table (message_features.py),
+multi-line messages joined back from its continuation column.
 """
 
 import re
-import json
-from pathlib import Path
-from collections import defaultdict
+
+from knowledge_ids import record_build
+from artifact_store import write_json
+from message_features import load_features
 
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-responses.json"
 
-# Manager identifiers
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ", "נבו"]
-
-# Message pattern: [date, time] sender: message
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-
-def parse_chat(filepath):
-    """Parse WhatsApp chat file into list of messages."""
-    messages = []
-    current_message = None
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                if current_message:
-                    messages.append(current_message)
-
-                date, time, sender, text = match.groups()
-                # Clean up invisible characters
-                sender = sender.replace('\u200e', '').replace('\u200f', '').replace('\u202b', '').replace('\u202c', '').strip()
-                text = text.replace('\u200e', '').replace('\u200f', '').replace('\u202b', '').replace('\u202c', '').strip()
-
-                current_message = {
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'has_media': '<מצורף:' in text or 'התמונה הושמטה' in text or 'סרטון' in text
-                }
-            elif current_message:
-                # Multi-line message continuation
-                current_message['text'] += '\n' + line
-
-    if current_message:
-        messages.append(current_message)
-
-    return messages
+def load_messages(filepath):
+    """Messages with their continuation lines; Nevo matched by any name in MANAGERS['nevo']."""
+    columns = ('date', 'time', 'sender', 'text', 'continuation', 'manager_id', 'is_media')
+    return [{
+        'date': date,
+        'time': time,
+        'sender': sender,
+        'text': text + continuation,
+        'is_manager': manager_id == 'nevo',
+        'has_media': is_media or 'סרטון' in text
+    } for date, time, sender, text, continuation, manager_id, is_media
+        in load_features(filepath).rows(*columns)]
 
 def extract_qa_pairs(messages):
     """Extract Q&A pairs where employees ask and Nevo responds."""
@@ -149,7 +122,7 @@ def extract_standalone_instructions(messages):
 
 def main():
     print("Parsing WhatsApp chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_messages(CHAT_FILE)
     print(f"Found {len(messages)} total messages")
 
     manager_messages = [m for m in messages if m['is_manager']]
@@ -193,6 +166,8 @@ def main():
             'source': 'nevo_instruction'
         })
 
+    record_build(knowledge_items, OUTPUT_FILE)
+
     # Save to JSON
     output = {
         'manager': 'נבו פרץ (Nevo Perets)',
@@ -204,8 +179,7 @@ def main():
         'media_files': media_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved {len(knowledge_items)} knowledge items to {OUTPUT_FILE}")
     print(f"Media files list: {len(media_items)} items")
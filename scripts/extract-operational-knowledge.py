@@ -2,18 +2,22 @@
 """
 Extract OPERATIONAL knowledge from WhatsApp chat.
 Focus on substantive Q&A, not greetings.
+
+Messages come from the shared per-message feature table (message_features.py).
+The operational keywords are this script's own: unlike the shared
+OPERATIONAL_KEYWORDS they include 'עבודה' and 'משמרות' and leave out the
+customer-service and police terms.
 """
 
-import re
-import json
 from collections import Counter, defaultdict
 
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/operational-knowledge.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
 # Greetings and noise to filter out
 GREETING_PATTERNS = [
     'בוקר טוב', 'צהריים טובים', 'ערב טוב', 'לילה טוב',
@@ -42,9 +46,6 @@ OPERATIONAL_KEYWORDS = [
     'אסור', 'מותר', 'חובה', 'שימו לב', 'אישור'
 ]
 
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
 def is_greeting_or_noise(text):
     """Check if text is just a greeting or noise."""
     text_lower = text.lower()
@@ -68,34 +69,9 @@ def has_operational_content(text):
     text_lower = text.lower()
     return any(kw in text_lower for kw in OPERATIONAL_KEYWORDS)
 
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-    return messages
-
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     # PART 1: Extract Nevo's standalone operational messages
@@ -223,6 +199,8 @@ def main():
     print(f"  - Repeated instructions: {len(repeated_nevo_msgs)}")
     print(f"  - Q&A pairs: {len(qa_list)}")
 
+    record_build(knowledge_items, OUTPUT_FILE)
+
     # Save
     output = {
         'total_items': len(knowledge_items),
@@ -231,8 +209,7 @@ def main():
         'items': knowledge_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
@@ -5,57 +5,23 @@ Logic: If Nevo gave the SAME answer 2+ times to similar questions,
 that answer becomes automatable knowledge.
 
 This finds answer clusters - consistent responses to recurring questions.
+
+Messages and their normalized text come from the shared per-message feature
+table (message_features.py).
 """
 
-import re
-import json
 from collections import defaultdict
 
+from artifact_store import write_json
+from knowledge_ids import record_build
+from message_features import load_features
+
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/repeated-answers.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
-
-def clean_text(text):
-    return re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-
-def normalize(text):
-    """Normalize for comparison."""
-    text = clean_text(text).lower()
-    text = re.sub(r'[?.!,\-\'\"()]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
-
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
-                    continue
-
-                messages.append({
-                    'date': date,
-                    'time': time,
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
-                })
-    return messages
-
 def main():
     print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
+    messages = load_features(CHAT_FILE).messages()
     print(f"Total messages: {len(messages)}")
 
     # ============================================
@@ -93,6 +59,7 @@ def main():
                 'question_sender': question_sender,
                 'answer': answer,
                 'answer_is_media': answer_is_media,
+                'answer_key': msg['normalized'],
                 'date': msg['date']
             })
 
@@ -105,7 +72,7 @@ def main():
 
     for qa in qa_pairs:
         # Normalize answer for grouping
-        answer_key = normalize(qa['answer'])[:80]  # First 80 chars normalized
+        answer_key = qa['answer_key'][:80]  # First 80 chars normalized
         if len(answer_key) < 5:
             continue
         answer_groups[answer_key].append(qa)
@@ -129,7 +96,7 @@ def main():
         first_qa = qa_list[0]
 
         # Collect all unique questions that triggered this answer
-        unique_questions = list(set(qa['question'] for qa in qa_list))[:5]
+        unique_questions = list(dict.fromkeys(qa['question'] for qa in qa_list))[:5]
 
         item = {
             'answer': first_qa['answer'],
@@ -178,6 +145,8 @@ def main():
             'example_questions': item['example_questions']
         })
 
+    record_build(kb_items, OUTPUT_FILE)
+
     # Save
     output = {
         'total_items': len(kb_items),
@@ -185,8 +154,7 @@ def main():
         'items': kb_items
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved {len(kb_items)} repeated answer patterns to {OUTPUT_FILE}")
 
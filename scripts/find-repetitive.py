@@ -2,96 +2,201 @@
 """
 Find the most repetitive Q&A patterns from WhatsApp chat.
 Identify frequently asked questions and common answers.
+
+--streaming counts in bounded memory (see heavy_hitters.py): a fixed number of
+counters however many messages, with exact counts for every question/answer
+repeated more than N / HEAVY_HITTER_CAPACITY times. Q&A pairs are kept in a
+TOP_QA_PAIRS heap and deduplicated through the candidates, so pairing is
+bounded too.
+
+Messages are parsed line by line (never held as a table, so --streaming
+stays bounded) with the shared parsing helpers of message_features.py.
 """
 
-import re
-import json
-from collections import Counter, defaultdict
+import sys
+import heapq
+from collections import Counter, defaultdict, deque
+
+from chat_export import iter_chat_lines
+from heavy_hitters import SpaceSaving
+from artifact_store import write_json
+from message_features import MESSAGE_PATTERN, MANAGER_NAMES, clean_text, normalize
 
 CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/top-repetitive.json"
 
-MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
-MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
+HEAVY_HITTER_CAPACITY = 5000
+TOP_QA_PAIRS = 50
+
+def iter_messages(filepath):
+    for line in iter_chat_lines(filepath):
+        line = line.strip()
+        if not line:
+            continue
+        match = MESSAGE_PATTERN.match(line)
+        if match:
+            date, time, sender, text = match.groups()
+            sender = clean_text(sender)
+            text = clean_text(text)
 
-def clean_text(text):
-    text = re.sub(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]', '', text).strip()
-    return text
+            if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
+                continue
 
-def normalize_text(text):
-    """Normalize text for comparison."""
-    text = clean_text(text).lower()
-    # Remove punctuation
-    text = re.sub(r'[?.!,\-\'"()]', '', text)
-    # Remove extra spaces
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+            yield {
+                'sender': sender,
+                'text': text,
+                'is_manager': any(name in sender for name in MANAGER_NAMES),
+                'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
+            }
 
 def parse_chat(filepath):
-    messages = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+    return list(iter_messages(filepath))
+
+def question_key(msg):
+    """Normalized employee question (non-manager, non-media), or None."""
+    if msg['is_manager'] or msg['is_media']:
+        return None
+    text = msg['text']
+    if len(text) < 5 or len(text) > 200:
+        return None
+    normalized = normalize(text)
+    return normalized if len(normalized) >= 5 else None
+
+def answer_key(msg):
+    """Normalized manager text answer, or None."""
+    if not msg['is_manager'] or msg['is_media']:
+        return None
+    text = msg['text']
+    if len(text) < 5 or len(text) > 300:
+        return None
+    normalized = normalize(text)
+    return normalized if len(normalized) >= 5 else None
+
+def count_messages(messages, question_candidates=None, answer_candidates=None):
+    """
+    Count questions and answers (with up to 3 examples each).
+    With candidate sets, only those texts are counted.
+    """
+    question_counter = Counter()
+    question_examples = defaultdict(list)
+    answer_counter = Counter()
+    answer_examples = defaultdict(list)
+
+    for msg in messages:
+        for key_fn, candidates, counter, examples in (
+            (question_key, question_candidates, question_counter, question_examples),
+            (answer_key, answer_candidates, answer_counter, answer_examples),
+        ):
+            normalized = key_fn(msg)
+            if normalized is None:
                 continue
-            match = MESSAGE_PATTERN.match(line)
-            if match:
-                date, time, sender, text = match.groups()
-                sender = clean_text(sender)
-                text = clean_text(text)
+            if candidates is not None and normalized not in candidates:
+                continue
+            counter[normalized] += 1
+            if len(examples[normalized]) < 3:
+                examples[normalized].append(msg['text'])
+
+    return question_counter, question_examples, answer_counter, answer_examples
+
+def count_streaming(filepath, capacity=HEAVY_HITTER_CAPACITY):
+    """
+    Two passes in fixed memory: Space-Saving sketches find candidates, then an
+    exact pass counts only the candidates. Counts are exact for every text
+    repeated more than N / capacity times; rarer texts may be missing (count 0).
+    """
+    question_sketch = SpaceSaving(capacity)
+    answer_sketch = SpaceSaving(capacity)
+    for msg in iter_messages(filepath):
+        q = question_key(msg)
+        if q is not None:
+            question_sketch.add(q)
+        a = answer_key(msg)
+        if a is not None:
+            answer_sketch.add(a)
+
+    print(f"Sketch error bound: questions <= {question_sketch.max_error():.1f}, "
+          f"answers <= {answer_sketch.max_error():.1f} occurrences")
+
+    return count_messages(
+        iter_messages(filepath),
+        question_candidates=question_sketch.candidates(min_count=2),
+        answer_candidates=answer_sketch.candidates(min_count=2)
+    )
+
+def find_qa_pairs(messages, question_counter, answer_counter, limit=TOP_QA_PAIRS):
+    """
+    Pair each repeated question with the first Nevo text answer in the next
+    9 messages (skipping answers already paired with the same question), and
+    keep the `limit` most relevant pairs, ties in order of appearance.
+
+    One pass with a sliding window and a bounded heap, so messages can be a
+    stream. Pair keys are remembered only for answers in answer_counter; in
+    --streaming mode that holds just the heavy-hitter candidates, so memory
+    stays bounded. Other pairs are deduplicated against the kept pairs only.
+    """
+    top = []        # min-heap of (relevance, -order, pair key, pair)
+    kept = set()    # pair keys in top
+    seen = set()
+    order = 0
+    pending = deque()  # [question text, normalized, last index that may answer it]
 
-                if 'בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text:
+    for i, msg in enumerate(messages):
+        while pending and pending[0][2] < i:
+            pending.popleft()
+
+        if msg['is_manager'] and not msg['is_media']:
+            a_text = msg['text']
+            a_norm = normalize(a_text)
+            counted = a_norm in answer_counter
+            waiting = deque()
+            for q_text, q_norm, last in pending:
+                # Create unique key
+                pair_key = f"{q_norm[:30]}|{a_norm[:30]}"
+                if pair_key in seen or pair_key in kept:
+                    waiting.append((q_text, q_norm, last))
                     continue
+                if counted:
+                    seen.add(pair_key)
 
-                messages.append({
-                    'sender': sender,
-                    'text': text,
-                    'is_manager': any(name in sender for name in MANAGER_NAMES),
-                    'is_media': '<מצורף:' in text or 'התמונה הושמטה' in text
+                relevance = question_counter[q_norm] + answer_counter[a_norm]
+                entry = (relevance, -order, pair_key, {
+                    'question': q_text,
+                    'answer': a_text,
+                    'q_count': question_counter[q_norm],
+                    'a_count': answer_counter[a_norm],
+                    'relevance_score': relevance
                 })
-    return messages
-
-def main():
-    print("Parsing chat...")
-    messages = parse_chat(CHAT_FILE)
-
-    # Count employee questions (non-manager, non-media)
-    question_counter = Counter()
-    question_examples = defaultdict(list)
+                order += 1
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                    kept.add(pair_key)
+                elif entry[:2] > top[0][:2]:
+                    kept.discard(heapq.heapreplace(top, entry)[2])
+                    kept.add(pair_key)
+            pending = waiting
+            continue
 
-    for msg in messages:
         if msg['is_manager'] or msg['is_media']:
             continue
-        text = msg['text']
-        if len(text) < 5 or len(text) > 200:
-            continue
 
-        normalized = normalize_text(text)
-        if len(normalized) < 5:
+        # Check if this is a frequently asked question
+        q_norm = normalize(msg['text'])
+        if question_counter[q_norm] < 2:
             continue
+        pending.append((msg['text'], q_norm, i + 9))
 
-        question_counter[normalized] += 1
-        if len(question_examples[normalized]) < 3:
-            question_examples[normalized].append(text)
+    return [pair for _, _, _, pair in sorted(top, reverse=True)]
 
-    # Count manager answers
-    answer_counter = Counter()
-    answer_examples = defaultdict(list)
-
-    for msg in messages:
-        if not msg['is_manager'] or msg['is_media']:
-            continue
-        text = msg['text']
-        if len(text) < 5 or len(text) > 300:
-            continue
-
-        normalized = normalize_text(text)
-        if len(normalized) < 5:
-            continue
+def main():
+    streaming = '--streaming' in sys.argv
 
-        answer_counter[normalized] += 1
-        if len(answer_examples[normalized]) < 3:
-            answer_examples[normalized].append(text)
+    if streaming:
+        print("Counting in streaming mode (bounded memory)...")
+        question_counter, question_examples, answer_counter, answer_examples = count_streaming(CHAT_FILE)
+    else:
+        print("Parsing chat...")
+        messages = parse_chat(CHAT_FILE)
+        question_counter, question_examples, answer_counter, answer_examples = count_messages(messages)
 
     print(f"\n=== TOP REPEATED QUESTIONS (by employees) ===")
     top_questions = []
@@ -120,48 +225,9 @@ def main():
     # Find Q&A pairs where both are repeated
     print(f"\n=== BUILDING TOP Q&A PAIRS ===")
 
-    qa_pairs = []
-    seen = set()
-
-    # For each top question, find what Nevo typically answers
-    for i, msg in enumerate(messages):
-        if msg['is_manager'] or msg['is_media']:
-            continue
-
-        q_text = msg['text']
-        q_norm = normalize_text(q_text)
-
-        # Check if this is a frequently asked question
-        if question_counter[q_norm] < 2:
-            continue
-
-        # Look for Nevo's response
-        for j in range(i+1, min(i+10, len(messages))):
-            next_msg = messages[j]
-            if next_msg['is_manager'] and not next_msg['is_media']:
-                a_text = next_msg['text']
-                a_norm = normalize_text(a_text)
-
-                # Create unique key
-                pair_key = f"{q_norm[:30]}|{a_norm[:30]}"
-                if pair_key in seen:
-                    continue
-                seen.add(pair_key)
-
-                qa_pairs.append({
-                    'question': q_text,
-                    'answer': a_text,
-                    'q_count': question_counter[q_norm],
-                    'a_count': answer_counter[a_norm],
-                    'relevance_score': question_counter[q_norm] + answer_counter[a_norm]
-                })
-                break
-
-    # Sort by relevance (most repeated)
-    qa_pairs.sort(key=lambda x: x['relevance_score'], reverse=True)
-
-    # Take top 50 most relevant
-    top_qa = qa_pairs[:50]
+    # For each top question, find what Nevo typically answers; the 50 most relevant
+    top_qa = find_qa_pairs(iter_messages(CHAT_FILE) if streaming else messages,
+                           question_counter, answer_counter)
 
     print(f"\nTop {len(top_qa)} most relevant Q&A pairs:")
     for qa in top_qa[:15]:
@@ -179,8 +245,7 @@ def main():
         }
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, output)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
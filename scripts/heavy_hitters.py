@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory heavy hitters (Space-Saving, Metwally et al. 2005).
+
+SpaceSaving keeps at most `capacity` counters however long the stream is.
+For a stream of N items:
+- every item with true count > N / capacity is guaranteed to be monitored
+- a monitored item's count overestimates the truth by at most its `error`,
+  and error <= N / capacity
+
+So with an exact second pass over the monitored candidates, the reported
+top-k equals the exact top-k for every item above N / capacity.
+"""
+
+import heapq
+
+DEFAULT_CAPACITY = 5000
+
+class SpaceSaving:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}   # item -> [count, error]
+        self.heap = []     # (count, item), lazily invalidated
+        self.total = 0
+
+    def add(self, item, weight=1):
+        self.total += weight
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            entry = self.counts[item] = [weight, 0]
+        else:
+            # Replace the minimum counter; the newcomer inherits its count as error
+            min_count, min_item = self.pop_min()
+            del self.counts[min_item]
+            entry = self.counts[item] = [min_count + weight, min_count]
+        heapq.heappush(self.heap, (entry[0], item))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(entry[0], key) for key, entry in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def pop_min(self):
+        while True:
+            count, item = heapq.heappop(self.heap)
+            entry = self.counts.get(item)
+            if entry is not None and entry[0] == count:
+                return count, item
+
+    def max_error(self):
+        """Upper bound on any overestimate: N / capacity."""
+        return self.total / self.capacity
+
+    def candidates(self, min_count=1):
+        """Monitored items whose upper-bound count reaches min_count."""
+        return {item for item, (count, _) in self.counts.items() if count >= min_count}
+
+    def most_common(self, n=None):
+        """(item, estimated count, error) by estimated count."""
+        ranked = sorted(self.counts.items(), key=lambda kv: -kv[1][0])
+        return [(item, count, error) for item, (count, error) in ranked[:n]]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Hebrew normalization and stemming, ported from src/lib/ai-static.ts
+(normalizeHebrew, stemHebrew, extractKeywords, calculateSimilarity) so
+build-time search ranks text the same way the app does at request time.
+Keep the two in step.
+"""
+
+import re
+
+PREFIXES = ['ה', 'ו', 'ב', 'ל', 'מ', 'כ', 'ש']
+SUFFIXES = ['ים', 'ות', 'ה', 'ת']
+
+STOP_WORDS = {
+    'את', 'של', 'על', 'עם', 'אל', 'זה', 'זו', 'זאת', 'הוא', 'היא', 'הם', 'הן', 'אני', 'אתה',
+    'אנחנו', 'לי', 'לך', 'לו', 'לה', 'כן', 'לא', 'גם', 'רק', 'כל', 'כמו', 'או', 'אם', 'כי',
+    'אבל', 'עוד', 'כבר', 'פה', 'שם', 'איך', 'מה', 'מתי', 'איפה', 'למה', 'כמה', 'מי', 'אז',
+    'יש', 'אין',
+}
+
+PUNCTUATION = re.compile(r'[?.!,\-\'"()״׳]')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_hebrew(text):
+    text = PUNCTUATION.sub('', (text or '').lower())
+    return WHITESPACE.sub(' ', text).strip()
+
+def stem_hebrew(word):
+    """Strip one common prefix, then one common suffix."""
+    result = word
+    for prefix in PREFIXES:
+        if result.startswith(prefix) and len(result) > 2:
+            result = result[1:]
+            break
+    for suffix in SUFFIXES:
+        if result.endswith(suffix) and len(result) > 3:
+            result = result[:-len(suffix)]
+            break
+    return result
+
+def extract_keywords(text):
+    return [w for w in normalize_hebrew(text).split(' ') if len(w) > 1 and w not in STOP_WORDS]
+
+def index_terms(text):
+    """Words plus their stems, for indexing: exact matches score above stem-only ones."""
+    terms = []
+    for word in normalize_hebrew(text).split(' '):
+        if not word:
+            continue
+        terms.append(word)
+        stemmed = stem_hebrew(word)
+        if stemmed != word and len(stemmed) > 2:
+            terms.append(stemmed)
+    return terms
+
+def query_terms(text):
+    """Keywords of a query and their stems, deduplicated in order."""
+    terms = []
+    for word in extract_keywords(text):
+        stemmed = stem_hebrew(word)
+        for term in (word, stemmed if len(stemmed) > 2 else word):
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+def calculate_similarity(query, content, example_questions=()):
+    """Port of calculateSimilarity: 0..1 relevance of content to query."""
+    query_keywords = extract_keywords(query)
+    content_norm = normalize_hebrew(content)
+    if not query_keywords:
+        return 0.0
+
+    score = 0.0
+    matched_words = 0
+    exact_phrase_match = False
+
+    query_norm = normalize_hebrew(query)
+    if query_norm in content_norm and len(query_norm) > 3:
+        exact_phrase_match = True
+        score += 0.5
+
+    for example in example_questions:
+        example_norm = normalize_hebrew(example)
+        if example_norm == query_norm:
+            return 1.0
+        if example_norm in query_norm or query_norm in example_norm:
+            score += 0.4
+            break
+
+    for word in query_keywords:
+        stemmed = stem_hebrew(word)
+        if word in content_norm:
+            matched_words += 1
+            score += 0.15
+        elif stemmed in content_norm and len(stemmed) > 2:
+            matched_words += 1
+            score += 0.08
+
+    coverage_ratio = matched_words / len(query_keywords)
+    if coverage_ratio < 0.3 and not exact_phrase_match:
+        score *= 0.3
+
+    return min(score, 1.0)
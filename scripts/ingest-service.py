@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Local ingestion job service: chat exports uploaded through /api/upload are
+mined asynchronously instead of inside the request.
+
+Jobs live in a SQLite queue (JOBS_DB), so queued and interrupted jobs
+survive a restart; a job that was running when the service died is queued
+again and resumes from its checkpoints. A scheduler thread starts queued
+jobs in order, up to MAX_WORKERS at once and TENANT_CONCURRENCY per tenant.
+Each job runs the pipeline steps of ingest_pipeline.py as worker processes
+over all exports the tenant has ingested so far.
+
+HTTP API (JSON, localhost only):
+  POST /jobs                 {"tenant": "...", "export": "/path/chat.zip"} -> 202 job
+  GET  /jobs?tenant=&status= list jobs, newest first
+  GET  /jobs/<id>            status, step and progress (0..1)
+  POST /jobs/<id>/cancel     cancel a queued or running job
+  GET  /health
+
+Usage:
+  ingest-service.py [--port 8765] [--workers 2] [--tenant-concurrency 1]
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from ingest_pipeline import pipeline_steps
+
+JOBS_DB = "/Users/avivgranot/klear-ai/.cache/ingest-jobs.db"
+HOST = "127.0.0.1"
+PORT = 8765
+
+MAX_WORKERS = 2
+TENANT_CONCURRENCY = 1   # runs of one tenant write the same artifact, keep them serial
+POLL_SECONDS = 0.5
+OUTPUT_TAIL = 20         # last output lines kept on a job
+
+PROGRESS_PATTERN = re.compile(r'parse \[[^\]]*\]: (\d+(?:\.\d+)?)%')
+FINISHED = ('succeeded', 'failed', 'cancelled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    tenant      TEXT NOT NULL,
+    export      TEXT NOT NULL,
+    status      TEXT NOT NULL,   -- queued, running, succeeded, failed, cancelled
+    step        TEXT,
+    progress    REAL NOT NULL DEFAULT 0,
+    message     TEXT,
+    created_at  TEXT NOT NULL,
+    started_at  TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_tenant ON jobs (tenant, status);
+"""
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+class JobQueue:
+    """The jobs table, shared by the HTTP threads, the scheduler and the job runners."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def add(self, tenant, export):
+        job_id = str(uuid.uuid4())
+        self.execute('INSERT INTO jobs (id, tenant, export, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                     (job_id, tenant, export, 'queued', now_iso()))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        rows = self.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def list(self, tenant=None, status=None, limit=100):
+        sql, params = 'SELECT * FROM jobs WHERE 1 = 1', []
+        if tenant:
+            sql += ' AND tenant = ?'
+            params.append(tenant)
+        if status:
+            sql += ' AND status = ?'
+            params.append(status)
+        sql += ' ORDER BY created_at DESC, rowid DESC LIMIT ?'
+        return [dict(row) for row in self.execute(sql, params + [limit])]
+
+    def update(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def claim(self, max_workers, tenant_concurrency):
+        """Mark the next startable queued jobs running and return them."""
+        with self.lock:
+            running = self.conn.execute("SELECT tenant, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY tenant").fetchall()
+            per_tenant = {tenant: count for tenant, count in running}
+            free = max_workers - sum(per_tenant.values())
+            claimed = []
+            for row in self.conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid").fetchall():
+                if free <= 0:
+                    break
+                if per_tenant.get(row['tenant'], 0) >= tenant_concurrency:
+                    continue
+                self.conn.execute("UPDATE jobs SET status = 'running', started_at = ?, progress = 0 WHERE id = ?",
+                                  (now_iso(), row['id']))
+                per_tenant[row['tenant']] = per_tenant.get(row['tenant'], 0) + 1
+                free -= 1
+                claimed.append(dict(row))
+            return claimed
+
+    def tenant_exports(self, tenant, export):
+        """Exports the tenant already ingested, then this one: each run covers the whole history."""
+        rows = self.execute("SELECT DISTINCT export FROM jobs WHERE tenant = ? AND status = 'succeeded' "
+                            "ORDER BY created_at", (tenant,))
+        exports = [row['export'] for row in rows if os.path.exists(row['export'])]
+        return [e for e in exports if e != export] + [export]
+
+    def requeue_interrupted(self):
+        with self.lock:
+            return self.conn.execute("UPDATE jobs SET status = 'queued', step = NULL WHERE status = 'running'").rowcount
+
+class JobRunner(threading.Thread):
+    """Runs one job's pipeline steps as worker processes, reporting progress and honoring cancel."""
+
+    def __init__(self, queue, job, load=True):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.load = load
+        self.process = None
+        self.cancelled = threading.Event()
+        self.interrupted = threading.Event()
+
+    def stop_process(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.stop_process()
+
+    def interrupt(self):
+        """Service shutdown: stop without a final status, so the job is queued again on the next start."""
+        self.interrupted.set()
+        self.stop_process()
+
+    def run_step(self, index, count, name, argv):
+        self.queue.update(self.job['id'], step=name, progress=index / count)
+        tail = []
+        # Own session: a Ctrl-C on the service's terminal must not reach the step, or it would
+        # exit non-zero before interrupt() is set and the job would be marked failed, not re-queued
+        self.process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, encoding='utf-8', errors='replace',
+                                        start_new_session=True)
+        last_update = 0.0
+        for line in self.process.stdout:
+            tail = (tail + [line.rstrip()])[-OUTPUT_TAIL:]
+            match = PROGRESS_PATTERN.search(line)
+            if match and time.monotonic() - last_update > POLL_SECONDS:
+                last_update = time.monotonic()
+                self.queue.update(self.job['id'], progress=(index + float(match.group(1)) / 100) / count)
+        returncode = self.process.wait()
+        if self.cancelled.is_set() or self.interrupted.is_set():
+            return False
+        if returncode != 0:
+            raise RuntimeError(f"{name} exited with {returncode}:\n" + "\n".join(tail[-5:]))
+        return True
+
+    def run(self):
+        job_id = self.job['id']
+        try:
+            exports = self.queue.tenant_exports(self.job['tenant'], self.job['export'])
+            steps = pipeline_steps(self.job['tenant'], exports, load=self.load)
+            for index, (name, argv) in enumerate(steps):
+                if self.cancelled.is_set() or self.interrupted.is_set() or not self.run_step(index, len(steps), name, argv):
+                    if not self.interrupted.is_set():
+                        self.queue.update(job_id, status='cancelled', finished_at=now_iso())
+                    return
+            self.queue.update(job_id, status='succeeded', step=None, progress=1.0,
+                              message=f"Ingested {len(exports)} export(s)", finished_at=now_iso())
+        except Exception as e:
+            self.queue.update(job_id, status='failed', message=str(e), finished_at=now_iso())
+
+class Scheduler(threading.Thread):
+    def __init__(self, queue, max_workers=MAX_WORKERS, tenant_concurrency=TENANT_CONCURRENCY, load=True):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.max_workers = max_workers
+        self.tenant_concurrency = tenant_concurrency
+        self.load = load
+        self.runners = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def cancel(self, job_id):
+        """Cancel a job; returns the job as it stands afterwards, None if unknown."""
+        job = self.queue.get(job_id)
+        if job is None or job['status'] in FINISHED:
+            return job
+        # Queued jobs are cancelled here; a claimed one is stopped by its runner
+        self.queue.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                           (now_iso(), job_id))
+        with self.lock:
+            runner = self.runners.get(job_id)
+        if runner:
+            runner.cancel()
+        return self.queue.get(job_id)
+
+    def run(self):
+        while not self.stopping.is_set():
+            with self.lock:
+                self.runners = {job_id: r for job_id, r in self.runners.items() if r.is_alive()}
+                for job in self.queue.claim(self.max_workers, self.tenant_concurrency):
+                    runner = JobRunner(self.queue, job, load=self.load)
+                    self.runners[job['id']] = runner
+                    runner.start()
+            self.stopping.wait(POLL_SECONDS)
+
+    def stop(self):
+        self.stopping.set()
+        with self.lock:
+            runners = list(self.runners.values())
+        for runner in runners:
+            runner.interrupt()
+        for runner in runners:
+            runner.join()
+
+def make_handler(queue, scheduler):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError:
+                return None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if url.path == '/health':
+                return self.send_json(200, {'status': 'ok'})
+            if parts == ['jobs']:
+                query = parse_qs(url.query)
+                return self.send_json(200, {'jobs': queue.list(query.get('tenant', [None])[0],
+                                                               query.get('status', [None])[0])})
+            if len(parts) == 2 and parts[0] == 'jobs':
+                job = queue.get(parts[1])
+                return self.send_json(200, job) if job else self.send_json(404, {'error': 'Job not found'})
+            self.send_json(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            parts = urlparse(self.path).path.strip('/').split('/')
+            if parts == ['jobs']:
+                body = self.read_json()
+                if not body or not body.get('tenant') or not body.get('export'):
+                    return self.send_json(400, {'error': 'Missing tenant or export'})
+                if not os.path.exists(body['export']):
+                    return self.send_json(400, {'error': f"Export not found: {body['export']}"})
+                return self.send_json(202, queue.add(body['tenant'], os.path.abspath(body['export'])))
+            if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+                job = scheduler.cancel(parts[1])
+                return self.send_json(200, job) if job else self.send_json(404, {'error': 'Job not found'})
+            self.send_json(404, {'error': 'Not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--db', default=JOBS_DB)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--tenant-concurrency', type=int, default=TENANT_CONCURRENCY)
+    parser.add_argument('--no-load', action='store_true', help='only write the JSON artifacts, skip the DB load')
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    requeued = queue.requeue_interrupted()
+    if requeued:
+        print(f"Re-queued {requeued} interrupted job(s)")
+    scheduler = Scheduler(queue, args.workers, args.tenant_concurrency, load=not args.no_load)
+    scheduler.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(queue, scheduler))
+    print(f"Ingestion service on http://{args.host}:{args.port} ({args.workers} workers, "
+          f"{args.tenant_concurrency} per tenant)", flush=True)
+    # SIGTERM (service managers) stops like Ctrl-C: running jobs are queued again, not failed
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+The extraction pipeline for one tenant's chat exports, as subprocess steps.
+
+  extract  extract-all-managers.py over all of the tenant's exports (checkpointed,
+           so only a newly added export is parsed), written atomically to
+           TENANT_OUTPUT_DIR/<tenant>-automation-knowledge.json, plus the
+           Parquet datasets for query-messages.py when pyarrow is installed
+  media    build-media-renditions.py: renders the media the build references and
+           links url / thumbnailUrl into the knowledge file (a new build)
+  lookup   answer_lookup.py: the exact-match table of the approved patterns,
+           TENANT_OUTPUT_DIR/<tenant>-answer-lookup.json
+  load     load-knowledge.py --changes: upsert what the build added or modified
+           into KnowledgeItem, where new patterns are inactive until approved
+
+Shared by watch-inbox.py and the ingestion job service.
+"""
+
+import os
+import sys
+import zipfile
+import importlib.util
+
+from chat_export import CHAT_FILENAME
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TENANT_OUTPUT_DIR = "/Users/avivgranot/klear-ai/src/data/tenants"
+
+def tenant_output(tenant, output_dir=TENANT_OUTPUT_DIR):
+    # Tenant in the file name: the change feed (knowledge_ids.py) is keyed by it
+    return os.path.join(output_dir, f"{tenant}-automation-knowledge.json")
+
+def lookup_output(output, tenant):
+    return os.path.join(os.path.dirname(output), f"{tenant}-answer-lookup.json")
+
+def export_candidates(directory):
+    """Exports in a directory: .zip and .txt files, and unpacked folders with a _chat.txt."""
+    found = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_file() and entry.name.lower().endswith(('.zip', '.txt')):
+            found.append(entry.path)
+        elif entry.is_dir() and os.path.isfile(os.path.join(entry.path, CHAT_FILENAME)):
+            found.append(entry.path)
+    return found
+
+def is_complete(path):
+    """False for a zip whose central directory isn't written yet (upload still running)."""
+    if path.lower().endswith('.zip'):
+        return zipfile.is_zipfile(path)
+    return True
+
+def pipeline_steps(tenant, exports, output=None, load=True):
+    """[(step name, argv)] to run in order."""
+    output = output or tenant_output(tenant)
+    extract = [sys.executable, os.path.join(SCRIPTS_DIR, 'extract-all-managers.py'),
+               '--tenant', tenant, '--output', output]
+    for export in exports:
+        extract += ['--export', export]
+    if importlib.util.find_spec('pyarrow') is not None:
+        extract.append('--parquet')
+    media = [sys.executable, os.path.join(SCRIPTS_DIR, 'build-media-renditions.py'), '--knowledge', output]
+    for export in exports:
+        media += ['--export', export]
+    steps = [('extract', extract),
+             ('media', media),
+             ('lookup', [sys.executable, os.path.join(SCRIPTS_DIR, 'answer_lookup.py'),
+                         '--source', output, '--output', lookup_output(output, tenant)])]
+    if load:
+        steps.append(('load', [sys.executable, os.path.join(SCRIPTS_DIR, 'load-knowledge.py'),
+                               output, '--company', tenant, '--changes']))
+    return steps
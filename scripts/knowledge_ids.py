@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Deterministic knowledge item IDs and a change feed between builds.
+
+An item's id is derived from what it answers, not from where it sits in the
+file: the first 16 hex chars of sha256(type + normalized answer). Re-running
+an extractor gives the same item the same id even when its example
+questions, frequency or ordering change.
+
+Each build records {id: digest of the item} per output file and compares
+it with the previous build of that file, writing a change set:
+
+  {"build": n, "added": [...], "removed": [...], "modified": [...], "unchanged": N}
+
+to CHANGES_DIR/<output name>.changes.json (the latest) and
+CHANGES_DIR/<output name>.changes/<n>.json (the last KEEP_CHANGE_SETS builds).
+Builds are numbered per output file, so DB sync (load-knowledge.py --changes)
+applies every change set since the build it last loaded, not just the latest.
+
+The digest covers every field but the id and VOLATILE_FIELDS. A recency
+`score` (decayed_counts.py) is evaluated at the chat's latest message, so
+one new message anywhere moves the score of every item; counting it would
+mark the whole file modified. The digest takes its log2 bucket instead
+(score_bucket, which load-knowledge.py ranks by): an item is modified when
+its score halves or doubles across a bucket edge, so DB sync keeps the
+priority current without resending unchanged items on every message.
+times_used, frequency and last_date stay in: they change only when the
+item itself is used again.
+
+Usage:
+  knowledge_ids.py src/data/whatsapp-faqs.json   # show the last change set
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+from datetime import datetime, timezone
+
+from artifact_store import write_json
+
+CHANGES_DIR = "/Users/avivgranot/klear-ai/.cache/changes"
+ID_LENGTH = 16
+KEEP_CHANGE_SETS = 50
+VOLATILE_FIELDS = ('id', 'score')
+SCORE_BUCKETS = 8       # bucket 0 holds unscored items and scores below MIN_SCORE
+MIN_SCORE = 0.125       # lowest score with a bucket of its own
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+def content_hash(item):
+    """Identity of an item: its type and the answer it gives, not its wording around it."""
+    answer = item.get('raw_answer') or f"{item.get('titleHe') or item.get('title')}\n{item.get('contentHe') or item.get('content')}"
+    key = f"{item.get('type', 'faq')}\x1f{normalize(answer)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def item_id(item):
+    return content_hash(item)[:ID_LENGTH]
+
+def score_bucket(score):
+    """
+    0 without a score or below MIN_SCORE, else floor(log2(score / MIN_SCORE)) + 1
+    capped at SCORE_BUCKETS - 1: each bucket is twice the score of the one
+    below (0.125 -> 1, 0.25 -> 2, 0.5 -> 3, 1 -> 4, 2 -> 5, 4 -> 6, 8+ -> 7).
+    """
+    if not score or score < MIN_SCORE:
+        return 0
+    return min(int(math.log2(score / MIN_SCORE)) + 1, SCORE_BUCKETS - 1)
+
+def item_digest(item):
+    """Changes whenever any field but the id and the VOLATILE_FIELDS, or the score bucket, changes."""
+    fields = {k: v for k, v in item.items() if k not in VOLATILE_FIELDS}
+    if 'score' in item:
+        fields['score_bucket'] = score_bucket(item['score'])
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def carry_forward(items, output_file, fields):
+    """
+    Copy `fields` from the previous build in output_file onto the items with the
+    same id, so a review decision (an automation pattern's status) survives a
+    re-extraction. Items new to this build keep their own values. Returns the
+    number of items carried forward.
+    """
+    if not os.path.exists(output_file):
+        return 0
+    with open(output_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    previous = {}
+    for item in data['items'] if isinstance(data, dict) else data:
+        previous.setdefault(item.get('id') or item_id(item), item)
+
+    carried = 0
+    for item in items:
+        before = previous.get(item.get('id') or item_id(item))
+        if before is None:
+            continue
+        item.update({field: before[field] for field in fields if field in before})
+        carried += 1
+    return carried
+
+def assign_ids(items):
+    """Set item['id'] on every item. Items with the same answer share an id; the first one counts."""
+    for item in items:
+        item['id'] = item_id(item)
+    return items
+
+def changes_paths(output_file, changes_dir=CHANGES_DIR):
+    name = os.path.splitext(os.path.basename(output_file))[0]
+    return (os.path.join(changes_dir, f"{name}.manifest.json"),
+            os.path.join(changes_dir, f"{name}.changes.json"))
+
+def history_dir(output_file, changes_dir=CHANGES_DIR):
+    name = os.path.splitext(os.path.basename(output_file))[0]
+    return os.path.join(changes_dir, f"{name}.changes")
+
+def loaded_path(output_file, changes_dir=CHANGES_DIR):
+    name = os.path.splitext(os.path.basename(output_file))[0]
+    return os.path.join(changes_dir, f"{name}.loaded.json")
+
+def diff(previous, current):
+    added = [i for i in current if i not in previous]
+    removed = [i for i in previous if i not in current]
+    modified = [i for i in current if i in previous and previous[i] != current[i]]
+    return {
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'unchanged': len(current) - len(added) - len(modified),
+    }
+
+def record_build(items, output_file, changes_dir=CHANGES_DIR):
+    """Assign ids, diff against the previous build of output_file and save the change set."""
+    assign_ids(items)
+    current = {}
+    for item in items:
+        current.setdefault(item['id'], item_digest(item))
+
+    manifest_file, changes_file = changes_paths(output_file, changes_dir)
+    previous, build = {}, 0
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        previous, build = manifest['items'], manifest.get('build', 0)
+
+    changes = {
+        'output': os.path.basename(output_file),
+        'build': build + 1,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'first_build': not os.path.exists(manifest_file),
+        **diff(previous, current),
+    }
+
+    # History first: a crash before the manifest is written only repeats this build number
+    history = history_dir(output_file, changes_dir)
+    write_json(os.path.join(history, f"{changes['build']}.json"), changes, keep=0)
+    for name in os.listdir(history):
+        number = name.split('.')[0]
+        if number.isdigit() and int(number) <= changes['build'] - KEEP_CHANGE_SETS:
+            os.remove(os.path.join(history, name))
+    write_json(changes_file, changes, keep=0)
+    write_json(manifest_file, {'output': changes['output'], 'build': changes['build'], 'items': current},
+               keep=0, indent=None)
+
+    print(f"Changes: +{len(changes['added'])} -{len(changes['removed'])} "
+          f"~{len(changes['modified'])} ({changes['unchanged']} unchanged)")
+    return changes
+
+def load_changes(output_file, changes_dir=CHANGES_DIR):
+    _, changes_file = changes_paths(output_file, changes_dir)
+    with open(changes_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def changes_since(output_file, build, changes_dir=CHANGES_DIR):
+    """
+    The change sets after `build` folded into one {"build", "upsert", "removed"},
+    or None when one of them is no longer kept (or build is None): then the
+    caller has to load the whole file.
+    """
+    latest = load_changes(output_file, changes_dir).get('build', 0)
+    if build is None:
+        return None
+    upsert, removed = set(), set()
+    for number in range(build + 1, latest + 1):
+        path = os.path.join(history_dir(output_file, changes_dir), f"{number}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            changes = json.load(f)
+        for item in changes['added'] + changes['modified']:
+            upsert.add(item)
+            removed.discard(item)
+        for item in changes['removed']:
+            removed.add(item)
+            upsert.discard(item)
+    return {'build': latest, 'upsert': upsert, 'removed': removed}
+
+def loaded_build(output_file, target, changes_dir=CHANGES_DIR):
+    """The last build of output_file loaded into target (a database and company), or None."""
+    path = loaded_path(output_file, changes_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get(target)
+
+def mark_loaded(output_file, target, build, changes_dir=CHANGES_DIR):
+    path = loaded_path(output_file, changes_dir)
+    loaded = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+    loaded[target] = build
+    write_json(path, loaded, keep=0)
+
+def main():
+    for path in sys.argv[1:]:
+        changes = load_changes(path)
+        print(f"{changes['output']} build {changes.get('build', '?')} ({changes['generated_at']}):")
+        for kind in ('added', 'removed', 'modified'):
+            print(f"  {kind}: {len(changes[kind])}")
+        print(f"  unchanged: {changes['unchanged']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Bulk-load extracted knowledge into the database (KnowledgeItem, MediaItem).
+
+Rows are keyed by the deterministic item ids from knowledge_ids.py: the
+row id is a UUIDv5 of (company, item id), so re-running the extraction maps
+every item back to the same row. Everything is upserted in one transaction:
+- SQLite: executemany of INSERT ... ON CONFLICT DO UPDATE, in batches
+- PostgreSQL: COPY into a temp table, then one INSERT ... SELECT ... ON CONFLICT
+The DO UPDATE only fires when a column actually differs, so a re-load of
+unchanged output writes nothing. A row whose title or content changes gets
+its embedding cleared, so embedding_client.py re-embeds exactly those rows.
+
+With --changes only the items added or modified since the build last loaded
+into this database and company are sent, and the ones removed since then
+are deactivated: every change set in between is applied (knowledge_ids.py),
+not just the latest. Without a usable history the whole file is loaded.
+A deactivated row is tagged removed-from-source and switched back on if its
+item comes back; rows an admin deactivated are left alone.
+
+Patterns still pending_approval (or rejected) are loaded inactive and tagged
+with their status; they switch on once a build carries them as approved
+(knowledge_ids.carry_forward).
+
+Priority is a tier plus a recency bucket (item_priority): manager answers
+always rank above the rest, and within a tier items rank by the log2 bucket
+of their recency-weighted `score` (knowledge_ids.score_bucket). The change
+feed tracks the bucket, so --changes resends exactly the items whose
+priority moved.
+
+Category names (see category_classifier.py) are resolved to the company's
+Category rows; media entries with rendition URLs (build-media-renditions.py)
+become MediaItem rows.
+
+Usage:
+  load-knowledge.py --company amir-bnei-brak                       # prisma/dev.db
+  load-knowledge.py --company amir-bnei-brak --changes                # delta only
+  load-knowledge.py --company amir-bnei-brak --database-url postgresql://...
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import mimetypes
+from datetime import datetime, timezone
+
+from knowledge_ids import CHANGES_DIR, SCORE_BUCKETS, item_id, score_bucket, load_changes, changes_since, loaded_build, mark_loaded
+
+DB_FILE = "/Users/avivgranot/klear-ai/prisma/dev.db"
+KNOWLEDGE_FILES = [
+    "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json",
+    "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json",
+]
+MANIFEST_FILE = "/Users/avivgranot/klear-ai/public/uploads/media/manifest.json"
+
+BATCH_SIZE = 1000
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "klear-ai/knowledge")
+PRIORITY_TIER = SCORE_BUCKETS   # manager answers start here; score buckets fill 0..PRIORITY_TIER - 1
+
+KNOWLEDGE_COLUMNS = [
+    'id', 'title', 'titleHe', 'content', 'contentHe', 'type', 'categoryId', 'tags',
+    'priority', 'frequency', 'isActive', 'companyId', 'sourceType', 'sourceUrl',
+    'createdAt', 'updatedAt',
+]
+# Columns a re-load may change; isActive, viewCount and embedding belong to the app
+KNOWLEDGE_UPDATE = [
+    'title', 'titleHe', 'content', 'contentHe', 'type', 'categoryId', 'tags',
+    'priority', 'frequency', 'sourceType', 'sourceUrl',
+]
+
+# deactivate() tags the rows it switches off, and build_rows tags the items withheld
+# for review. A re-load sets isActive only on rows inactive for one of those reasons,
+# or whose review status changed: a row an admin deactivated stays inactive
+REMOVED_TAG = 'removed-from-source'
+WITHHELD_TAGS = {'pending_approval': 'pending-approval', 'rejected': 'rejected'}
+
+def has_tag(row, tags):
+    """SQL: the tags JSON of row ('"KnowledgeItem"' or 'excluded') holds any of tags."""
+    return '(' + ' OR '.join(f'{row}."tags" LIKE \'%"{tag}"%\'' for tag in tags) + ')'
+
+LOADED_ROW, EXISTING_ROW = 'excluded', '"KnowledgeItem"'
+KNOWLEDGE_GUARDED = {
+    'isActive': f'(NOT {EXISTING_ROW}."isActive" AND {has_tag(EXISTING_ROW, [REMOVED_TAG, *WITHHELD_TAGS.values()])}) '
+                f'OR {has_tag(EXISTING_ROW, WITHHELD_TAGS.values())} <> {has_tag(LOADED_ROW, WITHHELD_TAGS.values())}',
+}
+
+# The input of embedding_client.knowledge_text: a change here makes the stored embedding stale
+EMBEDDING_SOURCE = ['title', 'titleHe', 'content', 'contentHe']
+KNOWLEDGE_INVALIDATE = {'embedding': EMBEDDING_SOURCE}
+
+MEDIA_COLUMNS = [
+    'id', 'knowledgeItemId', 'companyId', 'filename', 'originalName', 'mimeType',
+    'size', 'url', 'thumbnailUrl', 'createdAt',
+]
+MEDIA_UPDATE = ['knowledgeItemId', 'filename', 'originalName', 'mimeType', 'size', 'url', 'thumbnailUrl']
+
+def row_id(company_id, key):
+    return str(uuid.uuid5(ID_NAMESPACE, f"{company_id}:{key}"))
+
+def item_key(item):
+    return item.get('id') or item_id(item)
+
+def item_priority(item):
+    """KnowledgeItem.priority: PRIORITY_TIER for manager answers, plus the score bucket."""
+    tier = 1 if item.get('manager_id') else 0
+    return tier * PRIORITY_TIER + score_bucket(item.get('score'))
+
+def load_items(paths):
+    items = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        items.extend(data['items'] if isinstance(data, dict) else data)
+    return items
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def build_rows(items, company_id, category_ids, manifest, now):
+    """(knowledge rows, media rows) as dicts; items with the same id are loaded once."""
+    knowledge, media = {}, {}
+    for item in items:
+        kid = row_id(company_id, item_key(item))
+        if kid in knowledge:
+            continue
+        title = item.get('titleHe') or item.get('title') or ''
+        tags = ['imported', 'whatsapp']
+        if item.get('manager_id'):
+            tags.append('manager-answer')
+        if item.get('source'):
+            tags.append(item['source'])
+        withheld = WITHHELD_TAGS.get(item.get('status'))
+        if withheld:
+            tags.append(withheld)
+        knowledge[kid] = {
+            'id': kid,
+            'title': item.get('title') or title,
+            'titleHe': title,
+            'content': item.get('content') or item.get('contentHe') or '',
+            'contentHe': item.get('contentHe') or item.get('content') or '',
+            'type': item.get('type', 'faq'),
+            'categoryId': category_ids.get(item.get('category')),
+            'tags': json.dumps(tags, ensure_ascii=False),
+            'priority': item_priority(item),
+            'frequency': item.get('frequency', 0),
+            'isActive': not withheld,
+            'companyId': company_id,
+            'sourceType': 'import',
+            'sourceUrl': None,
+            'createdAt': now,
+            'updatedAt': now,
+        }
+
+        for entry in item.get('associated_media') or []:
+            if not entry.get('url'):
+                continue  # not rendered yet, nothing to serve
+            key = entry.get('content_key') or entry['filename']
+            mid = row_id(kid, key)
+            rendition = manifest.get(key.split(':', 1)[-1], {})
+            media[mid] = {
+                'id': mid,
+                'knowledgeItemId': kid,
+                'companyId': company_id,
+                'filename': os.path.basename(entry['url']),
+                'originalName': entry['filename'],
+                'mimeType': mimetypes.guess_type(entry['url'])[0] or 'application/octet-stream',
+                'size': rendition.get('size', 0),
+                'url': entry['url'],
+                'thumbnailUrl': entry.get('thumbnailUrl'),
+                'createdAt': now,
+            }
+    return list(knowledge.values()), list(media.values())
+
+def batches(rows, size=BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def quote(column):
+    return f'"{column}"'
+
+def invalidate_sets(table, invalidate, changed):
+    """SET clauses nulling each column of `invalidate` whose source columns changed."""
+    return [f'{quote(column)} = CASE WHEN {changed(sources)} THEN NULL ELSE {quote(table)}.{quote(column)} END'
+            for column, sources in (invalidate or {}).items()]
+
+def guarded_sets(table, guarded):
+    """SET clauses taking the loaded value of each column of `guarded` only where its condition holds."""
+    return [f'{quote(column)} = CASE WHEN {condition} THEN excluded.{quote(column)} ELSE {quote(table)}.{quote(column)} END'
+            for column, condition in (guarded or {}).items()]
+
+class SqliteTarget:
+    def __init__(self, path):
+        self.name = f"sqlite:{os.path.abspath(path)}"
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+
+    def query(self, sql, params=()):
+        return self.conn.execute(sql.replace('%s', '?'), params).fetchall()
+
+    def upsert(self, table, columns, update, rows, invalidate=None, guarded=None):
+        """INSERT ... ON CONFLICT DO UPDATE only where a column differs. Returns rows written."""
+        def changed(sources):
+            return '(' + ' OR '.join(f'{quote(table)}.{quote(c)} IS NOT excluded.{quote(c)}' for c in sources) + ')'
+        sql = (
+            f'INSERT INTO {quote(table)} ({", ".join(map(quote, columns))}) '
+            f'VALUES ({", ".join("?" for _ in columns)}) '
+            f'ON CONFLICT("id") DO UPDATE SET '
+            + ', '.join([f'{quote(c)} = excluded.{quote(c)}' for c in update + (['updatedAt'] if 'updatedAt' in columns else [])]
+                        + invalidate_sets(table, invalidate, changed) + guarded_sets(table, guarded))
+            + ' WHERE ' + ' OR '.join(f'{quote(table)}.{quote(c)} IS NOT excluded.{quote(c)}' for c in update)
+        )
+        before = self.conn.total_changes
+        for batch in batches(rows):
+            self.conn.executemany(sql, [tuple(self.value(row[c]) for c in columns) for row in batch])
+        return self.conn.total_changes - before
+
+    def deactivate(self, ids, now):
+        before = self.conn.total_changes
+        self.conn.executemany(
+            'UPDATE "KnowledgeItem" SET "isActive" = 0, "updatedAt" = ?, '
+            '"tags" = json_insert(COALESCE("tags", \'[]\'), \'$[#]\', ?) WHERE "id" = ? AND "isActive" = 1',
+            [(self.value(now), REMOVED_TAG, i) for i in ids])
+        return self.conn.total_changes - before
+
+    @staticmethod
+    def value(value):
+        # Prisma keeps SQLite DateTime as epoch milliseconds and Boolean as 0/1
+        if isinstance(value, datetime):
+            return int(value.timestamp() * 1000)
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class PostgresTarget:
+    def __init__(self, url):
+        try:
+            import psycopg
+        except ImportError:
+            raise SystemExit("PostgreSQL loading requires psycopg: pip install 'psycopg[binary]'")
+        # Identifies the database in the loaded-build state without storing credentials
+        self.name = f"postgresql:{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}"
+        self.conn = psycopg.connect(url)
+
+    def query(self, sql, params=()):
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def upsert(self, table, columns, update, rows, invalidate=None, guarded=None):
+        """COPY into a temp table, then a single set-based upsert. Returns rows written."""
+        def changed(sources):
+            return (f'({", ".join(f"{quote(table)}.{quote(c)}" for c in sources)}) '
+                    f'IS DISTINCT FROM ({", ".join(f"excluded.{quote(c)}" for c in sources)})')
+        staging = f"_load_{table.lower()}"
+        column_list = ", ".join(map(quote, columns))
+        set_columns = update + (['updatedAt'] if 'updatedAt' in columns else [])
+        with self.conn.cursor() as cur:
+            cur.execute(f'CREATE TEMP TABLE {staging} (LIKE {quote(table)} INCLUDING DEFAULTS) ON COMMIT DROP')
+            with cur.copy(f'COPY {staging} ({column_list}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row([row[c] for c in columns])
+            cur.execute(
+                f'INSERT INTO {quote(table)} ({column_list}) SELECT {column_list} FROM {staging} '
+                f'ON CONFLICT ("id") DO UPDATE SET '
+                + ', '.join([f'{quote(c)} = excluded.{quote(c)}' for c in set_columns]
+                            + invalidate_sets(table, invalidate, changed) + guarded_sets(table, guarded))
+                + f' WHERE ({", ".join(f"{quote(table)}.{quote(c)}" for c in update)}) '
+                f'IS DISTINCT FROM ({", ".join(f"excluded.{quote(c)}" for c in update)})'
+            )
+            return cur.rowcount
+
+    def deactivate(self, ids, now):
+        with self.conn.cursor() as cur:
+            cur.execute('UPDATE "KnowledgeItem" SET "isActive" = false, "updatedAt" = %s, '
+                        '"tags" = (COALESCE("tags", \'[]\')::jsonb || to_jsonb(%s::text))::text '
+                        'WHERE "id" = ANY(%s) AND "isActive"', (now, REMOVED_TAG, list(ids)))
+            return cur.rowcount
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def resolve_company(target, company):
+    rows = target.query('SELECT "id" FROM "Company" WHERE "id" = %s OR "slug" = %s', (company, company))
+    if not rows:
+        raise SystemExit(f"Unknown company: {company}")
+    return rows[0][0]
+
+def category_map(target, company_id):
+    """nameHe and name -> Category id for the company."""
+    mapping = {}
+    for cid, name, name_he in target.query(
+            'SELECT "id", "name", "nameHe" FROM "Category" WHERE "companyId" = %s', (company_id,)):
+        mapping[name] = cid
+        if name_he:
+            mapping[name_he] = cid
+    return mapping
+
+def load(target, company, files, changes=False, manifest_file=MANIFEST_FILE, changes_dir=CHANGES_DIR):
+    """
+    Upsert the items of `files` into target and commit; with `changes` only the
+    delta since the build last loaded, deactivating removed items. Closes target.
+    Returns the row counts.
+    """
+    try:
+        company_id = resolve_company(target, company)
+        loaded_as = f"{target.name}|{company_id}"
+        items, removed, builds = [], [], {}
+        for path in files:
+            file_items = load_items([path])
+            if changes:
+                since = changes_since(path, loaded_build(path, loaded_as, changes_dir), changes_dir)
+                if since is None:
+                    print(f"{os.path.basename(path)}: no change history since the last load, loading every item")
+                    builds[path] = load_changes(path, changes_dir).get('build', 0)
+                else:
+                    builds[path] = since['build']
+                    file_items = [item for item in file_items if item_key(item) in since['upsert']]
+                    removed.extend(since['removed'])
+            items.extend(file_items)
+
+        now = datetime.now(timezone.utc)
+        knowledge, media = build_rows(items, company_id, category_map(target, company_id),
+                                      load_manifest(manifest_file), now)
+
+        written_knowledge = target.upsert('KnowledgeItem', KNOWLEDGE_COLUMNS, KNOWLEDGE_UPDATE, knowledge,
+                                          invalidate=KNOWLEDGE_INVALIDATE, guarded=KNOWLEDGE_GUARDED)
+        written_media = target.upsert('MediaItem', MEDIA_COLUMNS, MEDIA_UPDATE, media)
+        deactivated = target.deactivate([row_id(company_id, key) for key in removed], now) if removed else 0
+        target.commit()
+    finally:
+        target.close()
+    for path, build in builds.items():
+        mark_loaded(path, loaded_as, build, changes_dir)
+    return {
+        'items': len(items), 'knowledge': len(knowledge), 'written_knowledge': written_knowledge,
+        'media': len(media), 'written_media': written_media, 'removed': len(removed), 'deactivated': deactivated,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', default=KNOWLEDGE_FILES, help='knowledge JSON files')
+    parser.add_argument('--company', required=True, help='Company id or slug')
+    parser.add_argument('--db', default=DB_FILE, help='SQLite database (default DB_FILE)')
+    parser.add_argument('--database-url', default=os.environ.get('LOAD_DATABASE_URL'),
+                        help='PostgreSQL URL; takes precedence over --db')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='media rendition manifest, for sizes')
+    parser.add_argument('--changes', action='store_true',
+                        help='load only what changed since the build last loaded into this database, '
+                             'deactivate what was removed')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    target = PostgresTarget(args.database_url) if args.database_url else SqliteTarget(args.db)
+    counts = load(target, args.company, args.files, changes=args.changes, manifest_file=args.manifest)
+
+    print(f"Items: {counts['items']} ({counts['items'] - counts['knowledge']} duplicates by id)")
+    print(f"KnowledgeItem: {counts['knowledge']} rows, {counts['written_knowledge']} inserted or changed")
+    print(f"MediaItem: {counts['media']} rows, {counts['written_media']} inserted or changed")
+    if args.changes:
+        print(f"Deactivated: {counts['deactivated']} of {counts['removed']} removed items")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Content-hash catalog of WhatsApp export attachments.
+
+WhatsApp gives every re-sent attachment a new filename (00001234-PHOTO-...),
+so grouping answers by filename never sees the same photo twice.
+The catalog maps each attachment filename to a content key:
+- sha256 of the file bytes (exact re-sends)
+- 64-bit dHash of the image (re-compressed / resized re-sends), needs Pillow
+
+Exports can be a folder or a WhatsApp .zip (read in place, see chat_export.py).
+Hashes are cached by (path, size, mtime) so re-runs don't re-read files.
+
+Renditions (build-media-renditions.py) are stored by content key in
+RENDITIONS_FILE; link_renditions() attaches their URLs to knowledge media
+entries, so an extractor keeps the links of media rendered on earlier runs.
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_export import ExportMedia, export_paths
+from artifact_store import write_json
+
+try:
+    from PIL import Image
+except ImportError:  # Perceptual hashing is optional
+    Image = None
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+CACHE_FILE = "/Users/avivgranot/klear-ai/.cache/media-catalog.json"
+RENDITIONS_FILE = "/Users/avivgranot/klear-ai/public/uploads/media/manifest.json"
+
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+HASH_WORKERS = 8
+CHUNK_SIZE = 1024 * 1024
+CACHE_VERSION = 1
+
+# Images within this Hamming distance of each other are the same picture
+PHASH_MAX_DISTANCE = 4
+PHASH_BITS = 64
+
+def is_image(filename):
+    ext = filename.split('.')[-1].lower() if '.' in filename else ''
+    return ext in IMAGE_EXTENSIONS
+
+def stream_sha256(stream):
+    """Hash a stream in chunks so large videos don't load into memory."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def image_dhash(data):
+    """64-bit difference hash: compare adjacent pixels of a 9x8 grayscale thumbnail."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = img.convert('L').resize((9, 8)).tobytes()
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+def hash_attachment(media, filename):
+    with media.open(filename) as f:
+        if not is_image(filename):
+            return {'sha256': stream_sha256(f), 'phash': None}
+        # Images are small: read once, hash bytes and pixels from memory
+        data = f.read()
+    return {'sha256': hashlib.sha256(data).hexdigest(), 'phash': image_dhash(data)}
+
+def load_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('entries', {})
+
+def save_cache(cache_file, entries):
+    if not cache_file:
+        return
+    # A cache: rebuilt from the exports, so no generations are kept
+    write_json(cache_file, {'version': CACHE_VERSION, 'entries': entries}, keep=0, indent=None)
+
+def index_export(export_path, cache_file=CACHE_FILE, workers=HASH_WORKERS):
+    """
+    Hash every attachment of an export (_chat.txt path, folder or zip), or
+    of a list of exports.
+    Returns {filename: {'export', 'path', 'size', 'mtime', 'sha256', 'phash'}},
+    where path is the file path, or 'archive.zip!member' for zipped exports.
+    """
+    cache = load_cache(cache_file)
+    catalog = {}
+
+    for path in export_paths(export_path):
+        to_hash = []
+        with ExportMedia(path) as media:
+            for filename, entry in media.items():
+                record = {'export': path, 'path': entry['key'], 'size': entry['size'], 'mtime': entry['mtime']}
+                cached = cache.get(entry['key'])
+                if cached and cached['size'] == entry['size'] and cached['mtime'] == entry['mtime']:
+                    record['sha256'] = cached['sha256']
+                    record['phash'] = cached['phash']
+                else:
+                    to_hash.append((filename, record))
+                catalog[filename] = record
+
+            if to_hash:
+                # Hashing is I/O bound and hashlib/zlib/PIL release the GIL, so threads are enough
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = pool.map(lambda job: hash_attachment(media, job[0]), to_hash)
+                    for (_, record), hashes in zip(to_hash, results):
+                        record.update(hashes)
+
+    for record in catalog.values():
+        cache[record['path']] = {
+            'size': record['size'],
+            'mtime': record['mtime'],
+            'sha256': record['sha256'],
+            'phash': record['phash']
+        }
+    save_cache(cache_file, cache)
+
+    return catalog
+
+def content_keys(catalog, max_distance=PHASH_MAX_DISTANCE):
+    """
+    Map each attachment filename to a content identity.
+
+    Files with the same sha256 share a key. Images whose dHashes are within
+    max_distance bits are merged too: split the hash into max_distance + 1 bands,
+    any two hashes that close must agree on at least one band, so only files
+    sharing a band bucket are compared.
+    """
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            # Smallest sha wins so the key is stable between runs
+            if rb < ra:
+                ra, rb = rb, ra
+            parent[rb] = ra
+
+    for record in catalog.values():
+        parent.setdefault(record['sha256'], record['sha256'])
+
+    bands = max_distance + 1
+    band_bits = PHASH_BITS // bands
+    buckets = {}
+    phashes = {}
+    for record in catalog.values():
+        if record.get('phash'):
+            value = int(record['phash'], 16)
+            phashes[record['sha256']] = value
+            for band in range(bands):
+                shift = band * band_bits
+                width = band_bits if band < bands - 1 else PHASH_BITS - shift
+                bucket = (band, (value >> shift) & ((1 << width) - 1))
+                buckets.setdefault(bucket, set()).add(record['sha256'])
+
+    for shas in buckets.values():
+        if len(shas) < 2:
+            continue
+        shas = sorted(shas)
+        for i, a in enumerate(shas):
+            for b in shas[i+1:]:
+                if bin(phashes[a] ^ phashes[b]).count('1') <= max_distance:
+                    union(a, b)
+
+    return {filename: f"sha256:{find(record['sha256'])}" for filename, record in catalog.items()}
+
+def load_renditions(path=RENDITIONS_FILE):
+    """{sha256 of the content key: rendition entry}, empty before the first render."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def link_renditions(items, renditions):
+    """Set url / thumbnailUrl on the media entries of items with a rendition. Returns the number linked."""
+    linked = 0
+    for item in items:
+        for media in [item.get('media_info')] + (item.get('associated_media') or []):
+            if not media or not media.get('content_key'):
+                continue
+            entry = renditions.get(media['content_key'].split(':', 1)[-1])
+            if entry and 'error' not in entry:
+                media['url'] = entry['url']
+                media['thumbnailUrl'] = entry['thumbnailUrl']
+                linked += 1
+    return linked
+
+def main():
+    export_path = sys.argv[1] if len(sys.argv) > 1 else CHAT_FILE
+
+    print(f"Indexing {export_path}...")
+    catalog = index_export(export_path)
+    keys = content_keys(catalog)
+
+    print(f"Attachments: {len(catalog)}")
+    print(f"Unique by sha256: {len(set(r['sha256'] for r in catalog.values()))}")
+    print(f"Unique by content (sha256 + dHash): {len(set(keys.values()))}")
+    if Image is None:
+        print("Pillow not installed - perceptual hashing skipped")
+
+if __name__ == '__main__':
+    main()
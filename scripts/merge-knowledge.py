@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 """
 Merge existing FAQs with Nevo's responses into a single knowledge base.
-Clean up data and remove duplicates.
+Clean up data and remove duplicates by title; near-duplicates across all
+sources are merged once, by build-final-structure.py.
+
+The output overwrites the FAQ file it reads, so the merge always starts from
+the FAQs as they were before it first ran: BASE_FILE keeps them together with
+the hash of the output written from them (artifact_store.load_base). While
+the FAQ file is still that output, a re-run merges from BASE_FILE again and
+writes the same result. Once another build replaces the FAQ file, it becomes
+the new base.
 """
 
 import json
 import re
-from pathlib import Path
+
+from search_index import build_index
+from knowledge_ids import record_build
+from artifact_store import write_json, load_base, save_base
 
 EXISTING_FILE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
 NEVO_FILE = "/Users/avivgranot/klear-ai/src/data/nevo-responses.json"
 OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
+BASE_FILE = "/Users/avivgranot/klear-ai/.cache/merge-knowledge/whatsapp-faqs.base.json"
 
 def clean_text(text):
     """Clean up message text."""
@@ -54,8 +66,8 @@ def is_valid_qa(item):
 
 def main():
     # Load existing FAQs
-    with open(EXISTING_FILE, 'r', encoding='utf-8') as f:
-        existing_items = json.load(f)
+    base_items = load_base(EXISTING_FILE, BASE_FILE)
+    existing_items = [dict(item) for item in base_items]
 
     print(f"Existing items: {len(existing_items)}")
 
@@ -96,6 +108,7 @@ def main():
             added += 1
 
     print(f"Added {added} new unique items from Nevo")
+
     print(f"Total items: {len(existing_items)}")
 
     # Count by type
@@ -108,11 +121,16 @@ def main():
     for t, count in sorted(type_counts.items()):
         print(f"  {t}: {count}")
 
+    record_build(existing_items, OUTPUT_FILE)
+
     # Save merged data
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(existing_items, f, ensure_ascii=False, indent=2)
+    write_json(OUTPUT_FILE, existing_items)
+    save_base(OUTPUT_FILE, BASE_FILE, base_items)
 
     print(f"\nSaved to {OUTPUT_FILE}")
 
+    if build_index(OUTPUT_FILE):
+        print("Search index rebuilt")
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Per-message feature table, computed once per export and shared by extractors.
+
+Every extractor used to re-parse the chat and re-run its own copy of
+clean_text(), normalize(), is_noise(), the manager lookup and the media
+regexes. compute_features() does all of it in one pass over the transcript
+and returns a columnar table (one list per column, row i = message i):
+
+  date, time, sender, text    cleaned message fields
+  manager_id                  key of MANAGERS, or None
+  is_nevo                     sender is Nevo by full name (MANAGER_NAMES)
+  is_media                    attachment or omitted-image marker
+  media_filename, media_type  from `<מצורף: ...>` ('image_removed' for omitted images)
+  normalized                  lowercased, punctuation and whitespace collapsed
+  is_noise                    normalized is a short or stock answer (NOISE_ANSWERS)
+  is_chatter                  greeting / small talk (NOISE_WORDS)
+  is_operational              mentions an OPERATIONAL_KEYWORDS term
+  continuation                the message's further lines, each after a '\n' ('' for one line)
+
+The keyword lists are the common ones; a script whose filter is a different
+rule keeps its own list (extract-all-patterns.py's NOISE_ANSWERS,
+extract-operational-knowledge.py's OPERATIONAL_KEYWORDS).
+
+The table is computed per export inside the parse checkpoints
+(checkpoints.py, <tenant>/message_features/parse-<n>.pkl), keyed by the
+exports and this file's source: a new export costs only its own pass, and
+changing a keyword list here recomputes the table for every extractor.
+
+Usage:
+  message_features.py [--tenant amir-bnei-brak] [--export PATH ...]   # build and summarize
+"""
+
+import re
+import time
+import argparse
+
+from checkpoints import Checkpoints
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+EXPORT_COMPANY = "amir-bnei-brak"
+
+MESSAGE_PATTERN = re.compile(r'\[(\d+\.\d+\.\d+), (\d+:\d+:\d+)\] ([^:]+): (.+)')
+INVISIBLE_CHARS = re.compile(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]')
+PUNCTUATION = re.compile(r'[?.!,\-\'\"()]')
+WHITESPACE = re.compile(r'\s+')
+ATTACHMENT = re.compile(r'<מצורף: ([^>]+)>')
+
+MANAGERS = {
+    "nevo": ["Nevo Perets", "נבו פרץ", "נבו"],
+    "hila": ["Hila Peretz", "הילה פרץ", "הילה"],
+    "sari": ["Sari Peretz", "שרי פרץ", "שרי"],
+    "yeshi": ["Yeshi Peretz", "ישי פרץ", "ישי"],
+}
+MANAGER_NAMES = ["Nevo Perets", "נבו פרץ"]
+MANAGER_DISPLAY_NAMES = {
+    "nevo": "נבו פרץ",
+    "hila": "הילה פרץ",
+    "sari": "שרי פרץ",
+    "yeshi": "ישי פרץ",
+}
+
+# Stock answers that are never worth automating
+NOISE_ANSWERS = [
+    'שבת שלום', 'שבוע טוב', 'בוקר טוב', 'ערב טוב', 'לילה טוב',
+    'תודה', 'בבקשה', 'אמן', 'מחקת את ההודעה',
+    'חחח', 'הההה', 'ok', 'אוקיי', 'סבבה', 'מצויין',
+    'my car', 'שלום', 'היי'
+]
+
+# Greetings and small talk
+NOISE_WORDS = [
+    'בוקר טוב', 'צהריים טובים', 'ערב טוב', 'לילה טוב',
+    'שבוע טוב', 'שבת שלום', 'חג שמח', 'שנה טובה',
+    'תודה', 'בבקשה', 'אמן', 'חחח', 'לול', 'הההה',
+    'שלום', 'היי', 'הי', 'מצויין', 'סבבה', 'אוקיי',
+    'מחקת את ההודעה', 'בהמתנה להודעה', 'התמונה הושמטה'
+]
+
+OPERATIONAL_KEYWORDS = [
+    # Safety & Alerts
+    'נכה', 'חשוד', 'מטף', 'חירום', 'בטיחות', 'משטרה', 'שוטר',
+    # Fuel
+    'דלק', 'תדלוק', 'משאבה', 'סולר', 'בנזין', 'ליטר', 'אקדח',
+    # Payment
+    'קופה', 'תשלום', 'כרטיס', 'מזומן', 'קבלה', 'חשבונית', 'מחיר',
+    # Equipment
+    'מכונה', 'טרמינל', 'שטיפה', 'מדפסת',
+    # Inventory
+    'מלאי', 'הזמנה', 'שמן', 'חלב', 'מוצר', 'סחורה',
+    # Procedures
+    'אסור', 'מותר', 'חובה', 'צריך', 'שימו לב', 'אישור', 'נוהל',
+    # Shift
+    'משמרת', 'סידור', 'החלפה',
+    # Customer service
+    'לקוח', 'תלונה', 'שירות', 'ארוחה'
+]
+
+NOISE_ANSWERS_LOWER = [noise.lower() for noise in NOISE_ANSWERS]
+NOISE_WORDS_LOWER = [noise.lower() for noise in NOISE_WORDS]
+
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+VIDEO_EXTENSIONS = ['mp4', 'mov', 'avi']
+DOCUMENT_EXTENSIONS = ['pdf', 'doc', 'docx', 'xls', 'xlsx']
+
+COLUMNS = ['date', 'time', 'sender', 'text', 'manager_id', 'is_nevo', 'is_media',
+           'media_filename', 'media_type', 'normalized', 'is_noise', 'is_chatter', 'is_operational',
+           'continuation']
+
+def clean_text(text):
+    return INVISIBLE_CHARS.sub('', text).strip()
+
+def normalize(text):
+    text = clean_text(text).lower()
+    text = PUNCTUATION.sub('', text)
+    text = WHITESPACE.sub(' ', text)
+    return text.strip()
+
+def get_manager_id(sender):
+    for manager_id, names in MANAGERS.items():
+        if any(name in sender for name in names):
+            return manager_id
+    return None
+
+def media_info(text):
+    """(filename, type) of an attachment, (None, 'image_removed') or (None, None)."""
+    if '<מצורף:' in text:
+        match = ATTACHMENT.search(text)
+        if match:
+            filename = match.group(1)
+            ext = filename.split('.')[-1].lower() if '.' in filename else ''
+            media_type = 'image' if ext in IMAGE_EXTENSIONS else \
+                         'video' if ext in VIDEO_EXTENSIONS else \
+                         'document' if ext in DOCUMENT_EXTENSIONS else 'file'
+            return filename, media_type
+    if 'התמונה הושמטה' in text:
+        return None, 'image_removed'
+    return None, None
+
+def is_noise(normalized):
+    if len(normalized) < 5:
+        return True
+    return any(normalized.startswith(noise) or normalized == noise for noise in NOISE_ANSWERS_LOWER)
+
+def is_chatter(text):
+    text_lower = text.lower()
+    if len(text) < 8:
+        return True
+    for noise in NOISE_WORDS_LOWER:
+        if text_lower.startswith(noise) and len(text) < 30:
+            return True
+        if text_lower == noise:
+            return True
+    return False
+
+def is_operational(text):
+    text_lower = text.lower()
+    return any(kw in text_lower for kw in OPERATIONAL_KEYWORDS)
+
+class FeatureTable:
+    """Columns of equal length; rows are messages in transcript order."""
+
+    def __init__(self, columns, key=None):
+        self.columns = columns
+        self.key = key
+
+    def __len__(self):
+        return len(self.columns['text'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self, *names):
+        """Tuples of the named columns, one per message."""
+        return zip(*(self.columns[name] for name in names))
+
+    def records(self, *names):
+        """Dicts of the named columns (all columns by default), one per message."""
+        names = names or COLUMNS
+        return [dict(zip(names, row)) for row in self.rows(*names)]
+
+    def messages(self):
+        """
+        Message dicts as the Nevo-only extractors used to parse them (is_manager
+        is Nevo by full name), plus media_file, normalized and the noise flags.
+        """
+        columns = ('date', 'time', 'sender', 'text', 'is_nevo', 'is_media', 'media_filename',
+                   'normalized', 'is_noise', 'is_operational')
+        return [{
+            'date': date,
+            'time': time,
+            'sender': sender,
+            'text': text,
+            'is_manager': is_nevo,
+            'is_media': is_media,
+            'media_file': media_file,
+            'normalized': normalized,
+            'is_noise': noise,
+            'is_operational': operational,
+        } for date, time, sender, text, is_nevo, is_media, media_file, normalized, noise, operational
+            in self.rows(*columns)]
+
+def compute_features(lines):
+    """One pass: parse, clean and compute every column."""
+    columns = {name: [] for name in COLUMNS}
+    append = [columns[name].append for name in COLUMNS]
+    continuation = columns['continuation']
+    in_message = False  # a continuation line belongs to the last row
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = MESSAGE_PATTERN.match(line)
+        if not match:
+            if in_message:
+                continuation[-1] += '\n' + line
+            continue
+        date, time, sender, text = match.groups()
+        sender = clean_text(sender)
+        text = clean_text(text)
+        in_message = not ('בהמתנה להודעה' in text or 'הודעה זו נמחקה' in text)
+        if not in_message:
+            continue
+
+        filename, media_type = media_info(text)
+        normalized = normalize(text)
+        row = (
+            date, time, sender, text,
+            get_manager_id(sender),
+            any(name in sender for name in MANAGER_NAMES),
+            '<מצורף:' in text or 'התמונה הושמטה' in text,
+            filename, media_type, normalized,
+            is_noise(normalized), is_chatter(text), is_operational(text), '',
+        )
+        for add, value in zip(append, row):
+            add(value)
+    return columns
+
+def merge_columns(parts):
+    """Concatenate per-export column dicts."""
+    columns = {name: [] for name in COLUMNS}
+    for part in parts:
+        for name in COLUMNS:
+            columns[name].extend(part[name])
+    return columns
+
+def load_features(exports=CHAT_FILE, tenant=EXPORT_COMPANY, restart=False):
+    """The feature table of the exports; exports already computed come from the cache."""
+    checkpoints = Checkpoints(tenant, __file__, exports, restart=restart)
+    columns = checkpoints.parse(exports, compute_features, merge=merge_columns)
+    return FeatureTable(columns, key=checkpoints.key)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenant', default=EXPORT_COMPANY)
+    parser.add_argument('--export', action='append')
+    parser.add_argument('--restart', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = load_features(args.export or CHAT_FILE, args.tenant, restart=args.restart)
+    print(f"Messages: {len(table)} ({time.perf_counter() - start:.2f}s)")
+    for name in ('is_nevo', 'is_media', 'is_noise', 'is_chatter', 'is_operational'):
+        print(f"  {name}: {sum(table[name])}")
+    print(f"  manager messages: {sum(1 for m in table['manager_id'] if m)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Message fingerprints for merging overlapping WhatsApp exports.
+
+The same group is often exported by several managers, or again months later.
+A fingerprint is a stable 64-bit hash of the normalized (timestamp, sender, text),
+so the same message matches across exports even when phones format the date
+differently (1.2.24 vs 01.02.2024) or add invisible direction marks.
+
+FingerprintStore is an exact set (no false positives, so no real message is
+ever dropped), optionally persisted as an append-only file of 8-byte hashes.
+Membership and insert are O(1), so merging N exports is linear in their size.
+"""
+
+import os
+import re
+import sys
+import struct
+import hashlib
+
+FINGERPRINT_SIZE = 8
+INVISIBLE_CHARS = re.compile(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069\ufeff]')
+
+def normalize_date(date):
+    """'1.2.24' and '01.02.2024' both become '2024-02-01'."""
+    day, month, year = (int(part) for part in date.split('.'))
+    if year < 100:
+        year += 2000
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def normalize_time(time):
+    parts = [int(part) for part in time.split(':')] + [0]
+    return f"{parts[0]:02d}:{parts[1]:02d}:{parts[2]:02d}"
+
+def normalize_field(text):
+    text = INVISIBLE_CHARS.sub('', text).lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+def fingerprint(date, time, sender, text):
+    """64-bit fingerprint of a message as an int."""
+    key = '\x1f'.join([
+        normalize_date(date),
+        normalize_time(time),
+        normalize_field(sender),
+        normalize_field(text)
+    ])
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=FINGERPRINT_SIZE).digest()
+    return int.from_bytes(digest, 'little')
+
+class FingerprintStore:
+    """Set of seen message fingerprints, persisted to path when given."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.seen = set()
+        self.pending = []
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % FINGERPRINT_SIZE  # Ignore a torn trailing write
+            self.seen.update(struct.unpack(f'<{usable // FINGERPRINT_SIZE}Q', data[:usable]))
+
+    def __contains__(self, fp):
+        return fp in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+    def add(self, fp):
+        if fp not in self.seen:
+            self.seen.add(fp)
+            self.pending.append(fp)
+
+    def flush(self):
+        """Append fingerprints added since the last flush to the store file."""
+        if not self.path or not self.pending:
+            self.pending = []
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(struct.pack(f'<{len(self.pending)}Q', *self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = []
+
+def main():
+    from chat_export import iter_chat_lines
+
+    if len(sys.argv) < 2:
+        print("Usage: message_fingerprints.py EXPORT [EXPORT ...]")
+        sys.exit(1)
+
+    total = sum(1 for _ in iter_chat_lines(sys.argv[1:], fingerprints=False))
+    merged = sum(1 for _ in iter_chat_lines(sys.argv[1:], fingerprints=FingerprintStore()))
+    print(f"Exports: {len(sys.argv) - 1}")
+    print(f"Lines without dedup: {total}")
+    print(f"Lines after cross-export dedup: {merged}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Mine answer TEMPLATES from manager messages (Drain-style).
+
+Many answers differ only in numbers, names, times or pump IDs
+("משאבה 3 תקולה" / "משאבה 5 תקולה"), so exact-prefix grouping never sees
+them as repeated. Each message is masked (numbers, dates, times, mentions,
+URLs -> placeholders) and assigned in one pass to a template through a
+fixed-depth prefix tree: token count -> first tokens -> leaf clusters.
+Positions that differ between members become <*> slots.
+
+Templates used 2+ times are written as automation-knowledge candidates,
+with counts and example values for each slot. Messages come from the shared
+per-message feature table (message_features.py). As in find-repetitive.py,
+an employee message is the question of the first manager answer within the
+next QUESTION_WINDOW messages, and of no later one.
+"""
+
+import re
+from collections import defaultdict
+
+from artifact_store import write_json
+from knowledge_ids import record_build, carry_forward
+from message_features import load_features, MANAGER_DISPLAY_NAMES, NOISE_ANSWERS_LOWER
+
+CHAT_FILE = "/Users/avivgranot/Desktop/Klear-ai/WhatsApp Chat - צוות אמיר בני ברק/_chat.txt"
+OUTPUT_FILE = "/Users/avivgranot/klear-ai/src/data/answer-templates.json"
+
+# Token masks, applied in order to each whitespace token
+MASKS = [
+    ('<URL>', re.compile(r'^https?://\S+$')),
+    ('<MENTION>', re.compile(r'^@\S+$')),
+    ('<DATE>', re.compile(r'^\d{1,2}[./]\d{1,2}([./]\d{2,4})?$')),
+    ('<TIME>', re.compile(r'^\d{1,2}:\d{2}(:\d{2})?$')),
+    ('<PHONE>', re.compile(r'^0\d{1,2}-?\d{7}$')),
+    ('<NUM>', re.compile(r'^[₪$]?\d+([.,]\d+)?[₪%]?$')),
+]
+WILDCARD = '<*>'
+
+# Tree and matching parameters (Drain defaults)
+TREE_DEPTH = 4           # length level + (TREE_DEPTH - 2) prefix tokens
+MAX_CHILDREN = 100       # per internal node; overflow goes to a <*> child
+SIMILARITY_THRESHOLD = 0.5
+MAX_SLOT_EXAMPLES = 5
+MAX_EXAMPLES = 5
+QUESTION_WINDOW = 9      # messages after a question that may answer it
+
+def is_noise(text):
+    text_lower = text.lower().strip()
+    if len(text_lower) < 5:
+        return True
+    return any(text_lower.startswith(noise) for noise in NOISE_ANSWERS_LOWER) and len(text_lower) < 30
+
+def mask_token(token):
+    for placeholder, pattern in MASKS:
+        if pattern.match(token):
+            return placeholder
+    return token
+
+def is_variable(token):
+    return token.startswith('<') and token.endswith('>')
+
+class Cluster:
+    __slots__ = ('template', 'count', 'slots', 'examples', 'questions', 'manager_ids', 'last_date')
+
+    def __init__(self, tokens):
+        self.template = list(tokens)
+        self.count = 0
+        self.slots = defaultdict(list)   # position -> example values
+        self.examples = []
+        self.questions = []
+        self.manager_ids = set()
+        self.last_date = None
+
+    def similarity(self, tokens):
+        """Share of positions where the template matches (<*> matches anything)."""
+        matched = 0
+        for template_token, token in zip(self.template, tokens):
+            if template_token == WILDCARD or template_token == token:
+                matched += 1
+        return matched / len(tokens)
+
+    def absorb(self, tokens, raw_tokens):
+        for i, (template_token, token) in enumerate(zip(self.template, tokens)):
+            if template_token != token and template_token != WILDCARD:
+                self.template[i] = WILDCARD
+                # Earlier members all had the literal here; masked positions were recorded already
+                if not is_variable(template_token):
+                    self.slots[i].append(template_token)
+        for i, template_token in enumerate(self.template):
+            if is_variable(template_token):
+                values = self.slots[i]
+                if len(values) < MAX_SLOT_EXAMPLES and raw_tokens[i] not in values:
+                    values.append(raw_tokens[i])
+        self.count += 1
+
+class TemplateMiner:
+    """
+    Fixed-depth prefix tree. Each message walks at most TREE_DEPTH nodes and
+    compares against the clusters of one leaf, so assignment is O(1) amortized
+    in the number of messages.
+    """
+
+    def __init__(self, depth=TREE_DEPTH, max_children=MAX_CHILDREN, threshold=SIMILARITY_THRESHOLD):
+        self.prefix_len = depth - 2
+        self.max_children = max_children
+        self.threshold = threshold
+        self.root = {}
+        self.clusters = []
+
+    def leaf(self, tokens):
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_len]:
+            # Tokens with digits are likely variable: route them to the wildcard branch
+            key = WILDCARD if is_variable(token) or any(c.isdigit() for c in token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault(None, [])
+
+    def add(self, text):
+        raw_tokens = text.split()
+        if not raw_tokens:
+            return None
+        tokens = [mask_token(token) for token in raw_tokens]
+        clusters = self.leaf(tokens)
+
+        best, best_sim = None, -1.0
+        for cluster in clusters:
+            sim = cluster.similarity(tokens)
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+        if best is None or best_sim < self.threshold:
+            best = Cluster(tokens)
+            clusters.append(best)
+            self.clusters.append(best)
+
+        best.absorb(tokens, raw_tokens)
+        return best
+
+def main():
+    print("Mining answer templates...")
+    miner = TemplateMiner()
+    total = 0
+    last_question, question_index = None, 0
+
+    features = load_features(CHAT_FILE)
+    for i, (date, text, manager_id, is_media) in enumerate(features.rows('date', 'text', 'manager_id', 'is_media')):
+        if manager_id is None:
+            if len(text) >= 3 and '<מצורף:' not in text:
+                last_question, question_index = text, i
+            continue
+        if last_question and i - question_index > QUESTION_WINDOW:
+            last_question = None
+
+        if is_media or is_noise(text):
+            continue
+
+        total += 1
+        cluster = miner.add(text)
+        cluster.manager_ids.add(manager_id)
+        cluster.last_date = date
+        if len(cluster.examples) < MAX_EXAMPLES and text not in cluster.examples:
+            cluster.examples.append(text)
+        if last_question:
+            if len(cluster.questions) < MAX_EXAMPLES and last_question not in cluster.questions:
+                cluster.questions.append(last_question)
+            last_question = None
+
+    templates = [c for c in miner.clusters if c.count >= 2]
+    templates.sort(key=lambda c: -c.count)
+    variable = [c for c in templates if any(is_variable(t) for t in c.template)]
+
+    print(f"Manager messages: {total}")
+    print(f"Templates: {len(miner.clusters)}")
+    print(f"Repeated templates (2+ times): {len(templates)}")
+    print(f"  with variable slots: {len(variable)}")
+
+    print("\n=== TOP TEMPLATES ===")
+    for c in templates[:15]:
+        print(f"  [{c.count}x] {' '.join(c.template)[:70]}")
+
+    # ============================================
+    # Format as automation knowledge candidates
+    # ============================================
+    kb_items = []
+    for c in templates:
+        template = ' '.join(c.template)
+        manager_id = sorted(c.manager_ids)[0]
+        manager_name = MANAGER_DISPLAY_NAMES[manager_id] if len(c.manager_ids) == 1 else "מנהלים שונים"
+        title = c.questions[0][:100] if c.questions else c.examples[0][:100]
+        questions_text = "\n".join(f"- {q}" for q in c.questions) if c.questions else "N/A"
+        slots_text = "\n".join(
+            f"- {c.template[pos]} ({pos + 1}): {', '.join(values)}"
+            for pos, values in sorted(c.slots.items())
+        )
+
+        content = f"""שאלות שהפעילו תשובה זו:
+{questions_text}
+
+תבנית תשובת מנהל ({manager_name}):
+{template}"""
+        if slots_text:
+            content += f"\n\nערכים לדוגמה:\n{slots_text}"
+
+        kb_items.append({
+            'title': title,
+            'titleHe': title,
+            'content': content,
+            'contentHe': content,
+            'type': 'repeated_answer',
+            'answer_type': 'template',
+            'source': 'answer_template',
+            'frequency': c.count,
+            'manager_id': manager_id,
+            'manager_name': manager_name,
+            'template': template,
+            'slots': {str(pos): values for pos, values in sorted(c.slots.items())},
+            'example_answers': c.examples,
+            'example_questions': c.questions,
+            'raw_answer': c.examples[0],
+            'last_date': c.last_date,
+            'status': 'pending_approval'
+        })
+
+    # A template approved or rejected on an earlier build keeps that status
+    carry_forward(kb_items, OUTPUT_FILE, ('status',))
+    record_build(kb_items, OUTPUT_FILE)
+
+    output = {
+        'description': 'Manager answer templates with variable parts, mined Drain-style',
+        'total_messages': total,
+        'total_items': len(kb_items),
+        'variable_templates': len(variable),
+        'items': kb_items
+    }
+
+    write_json(OUTPUT_FILE, output)
+
+    print(f"\nSaved to {OUTPUT_FILE}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate knowledge items: MinHash over character shingles + LSH.
+
+Each item's answer text (raw_answer, else content) is normalized
+(hebrew_text.normalize_hebrew) and cut into character 5-shingles. A
+NUM_PERM-value MinHash signature is split into BANDS bands; items sharing any
+band bucket are candidates, and candidates whose exact shingle Jaccard
+reaches THRESHOLD are merged (union-find), so the pass stays near-linear in
+the number of items.
+
+Per cluster one canonical item survives (highest frequency, then the
+longest content): frequencies are summed, example questions united, and
+the sources of all members recorded in merged_sources.
+
+Usage:
+  near_duplicates.py                 # report across all knowledge sources
+"""
+
+import sys
+import json
+import zlib
+
+from hebrew_text import normalize_hebrew
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required: pip install numpy")
+
+SOURCE_FILES = {
+    'documents': "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json",
+    'automation': "/Users/avivgranot/klear-ai/src/data/automation-knowledge.json",
+    'nevo_operational': "/Users/avivgranot/klear-ai/src/data/nevo-operational.json",
+    'core_knowledge': "/Users/avivgranot/klear-ai/src/data/core-knowledge.json",
+}
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16              # 16 bands x 8 rows: candidate pairs from Jaccard ~0.7 up
+THRESHOLD = 0.8
+MAX_EXAMPLE_QUESTIONS = 10
+MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = np.random.default_rng(1)
+PERM_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+def item_text(item):
+    return item.get('raw_answer') or item.get('contentHe') or item.get('content') or item.get('titleHe') or ''
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = normalize_hebrew(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def minhash(shingle_set):
+    """NUM_PERM MinHash values of a shingle set (all-max for an empty set)."""
+    if not shingle_set:
+        return np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingle_set], dtype=np.uint64)
+    # (a * x + b) mod p with 32-bit a, x stays below 2^64
+    return ((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def find_clusters(items, threshold=THRESHOLD, bands=BANDS):
+    """Lists of item indexes, one per cluster of 2+ near-duplicates."""
+    sets = [shingles(item_text(item)) for item in items]
+    rows = NUM_PERM // bands
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for i, shingle_set in enumerate(sets):
+        if not shingle_set:
+            continue
+        signature = minhash(shingle_set)
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            for j in buckets.setdefault(key, []):
+                if find(i) != find(j) and jaccard(sets[i], sets[j]) >= threshold:
+                    parent[find(i)] = find(j)
+            buckets[key].append(i)
+
+    clusters = {}
+    for i in range(len(items)):
+        clusters.setdefault(find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+def item_source(item):
+    return item.get('source') or item.get('type') or 'unknown'
+
+def merge_cluster(members):
+    canonical = max(members, key=lambda item: (item.get('frequency', 0), len(item_text(item))))
+    merged = dict(canonical)
+    merged['frequency'] = sum(item.get('frequency', 0) for item in members)
+    questions = []
+    for item in [canonical] + members:
+        questions.extend(item.get('example_questions') or [])
+    if questions:
+        merged['example_questions'] = list(dict.fromkeys(questions))[:MAX_EXAMPLE_QUESTIONS]
+    merged['merged_sources'] = sorted({source for item in members
+                                       for source in item.get('merged_sources', [item_source(item)])})
+    return merged
+
+def dedupe(items, threshold=THRESHOLD):
+    """(items with each near-duplicate cluster replaced by its canonical item, clusters merged)."""
+    clusters = find_clusters(items, threshold)
+    replaced = {}
+    for members in clusters:
+        merged = merge_cluster([items[i] for i in members])
+        first = min(members)
+        for i in members:
+            replaced[i] = merged if i == first else None
+    result = [replaced.get(i, item) for i, item in enumerate(items) if replaced.get(i, item) is not None]
+    return result, len(clusters)
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['items'] if isinstance(data, dict) else data
+
+def main():
+    items = []
+    for name, path in SOURCE_FILES.items():
+        source_items = load(path)
+        if name == 'documents':
+            source_items = [item for item in source_items if item.get('type') == 'document']
+        items.extend(source_items)
+        print(f"{name}: {len(source_items)} items")
+
+    deduped, clusters = dedupe(items)
+    text_size = sum(len(item_text(item)) for item in items)
+    deduped_size = sum(len(item_text(item)) for item in deduped)
+    print(f"\nAll sources: {len(items)} -> {len(deduped)} items "
+          f"({clusters} clusters merged, text {text_size / 1024:.0f}KB -> {deduped_size / 1024:.0f}KB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Parsed messages, Q&A pairs and repeated-answer clusters as partitioned Parquet.
+
+extract-all-managers.py --parquet writes three datasets under PARQUET_DIR,
+hive-partitioned by tenant and month:
+
+  messages/tenant=<tenant>/v<n>/month=YYYY-MM/part-0.parquet   every parsed message
+  qa_pairs/...                                                 manager answer + triggering question
+  clusters/...                                                 repeated answers (month of last use)
+
+Senders, manager ids and media types are dictionary-encoded; dates are real
+date32 columns, so row-group statistics let a scan skip whole row groups.
+query() turns filters into a dataset expression: tenant and month prune
+partition directories before any file is opened, dates and equality filters
+prune row groups, and only the requested columns are read.
+
+A tenant's partitions are rebuilt as a whole on each run into a new version
+directory v<n>; the tenant's CURRENT file names the live one and is replaced
+atomically once v<n> is complete. Readers list only the files of the version
+CURRENT names, so they see the old partitions or the new ones, never a mix
+and never none. The previous version is kept for readers still scanning it
+and removed by the next write.
+"""
+
+import os
+import sys
+import shutil
+from datetime import date as Date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    sys.exit("pyarrow is required: pip install pyarrow")
+
+from artifact_store import write_bytes
+from message_fingerprints import normalize_date
+
+PARQUET_DIR = "/Users/avivgranot/klear-ai/src/data/parquet"
+ROW_GROUP_SIZE = 65536
+POINTER_FILE = 'CURRENT'
+
+DICT = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMAS = {
+    'messages': pa.schema([
+        ('seq', pa.int64()),
+        ('date', pa.date32()),
+        ('time', pa.string()),
+        ('sender', DICT),
+        ('manager_id', DICT),
+        ('text', pa.string()),
+        ('is_media', pa.bool_()),
+        ('media_type', DICT),
+        ('media_filename', pa.string()),
+        ('is_noise', pa.bool_()),
+        ('is_chatter', pa.bool_()),
+        ('is_operational', pa.bool_()),
+    ]),
+    'qa_pairs': pa.schema([
+        ('date', pa.date32()),
+        ('manager_id', DICT),
+        ('question_sender', DICT),
+        ('question', pa.string()),
+        ('answer', pa.string()),
+        ('answer_key', pa.string()),
+        ('is_media', pa.bool_()),
+        ('media_type', DICT),
+    ]),
+    'clusters': pa.schema([
+        ('first_date', pa.date32()),
+        ('last_date', pa.date32()),
+        ('manager_id', DICT),
+        ('manager_name', DICT),
+        ('answer_type', DICT),
+        ('answer', pa.string()),
+        ('times_used', pa.int32()),
+        ('example_questions', pa.list_(pa.string())),
+    ]),
+}
+
+# Column each table is partitioned by month on, and searched by --keyword
+DATE_COLUMN = {'messages': 'date', 'qa_pairs': 'date', 'clusters': 'last_date'}
+TEXT_COLUMNS = {'messages': ['text'], 'qa_pairs': ['question', 'answer'], 'clusters': ['answer']}
+SENDER_COLUMN = {'messages': 'sender', 'qa_pairs': 'question_sender'}
+
+PARTITIONING = ds.partitioning(pa.schema([('tenant', pa.string()), ('month', pa.string())]), flavor='hive')
+
+def to_date(value):
+    """Chat date ('1.2.24', '01.02.2024') or ISO date to a date."""
+    if isinstance(value, Date):
+        return value
+    if '.' in value:
+        value = normalize_date(value)
+    return Date.fromisoformat(value)
+
+def month_of(day):
+    return f"{day.year:04d}-{day.month:02d}"
+
+def message_rows(table):
+    """Rows of the messages table from a message_features.FeatureTable."""
+    columns = ('date', 'time', 'sender', 'manager_id', 'text', 'is_media', 'media_type',
+               'media_filename', 'is_noise', 'is_chatter', 'is_operational')
+    for seq, row in enumerate(table.rows(*columns)):
+        record = dict(zip(columns, row))
+        record['seq'] = seq
+        record['date'] = to_date(record['date'])
+        yield record
+
+def qa_rows(responses):
+    """Rows of the qa_pairs table from extract-all-managers' collect_responses()."""
+    for resp in responses:
+        media = resp['media_info']
+        yield {
+            'date': to_date(resp['date']),
+            'manager_id': resp['manager_id'],
+            'question_sender': resp['question_sender'],
+            'question': resp['question'],
+            'answer': resp['answer'],
+            'answer_key': resp['answer_key'],
+            'is_media': resp['is_media'],
+            'media_type': media['type'] if media else None,
+        }
+
+def cluster_rows(items):
+    """Rows of the clusters table from knowledge items carrying first_date/last_date."""
+    for item in items:
+        yield {
+            'first_date': to_date(item['first_date']),
+            'last_date': to_date(item['last_date']),
+            'manager_id': item['manager_id'],
+            'manager_name': item['manager_name'],
+            'answer_type': item['type'],
+            'answer': item['answer'],
+            'times_used': item['times_used'],
+            'example_questions': item['example_questions'],
+        }
+
+def tenant_dir(name, tenant, root=PARQUET_DIR):
+    return os.path.join(root, name, f"tenant={tenant}")
+
+def current_version(directory):
+    """Name of the live version directory of a tenant (from POINTER_FILE), or None."""
+    try:
+        with open(os.path.join(directory, POINTER_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_table(name, tenant, rows, root=PARQUET_DIR):
+    """Replace the tenant's partitions of one table; returns the row count."""
+    schema = SCHEMAS[name]
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(month_of(row[DATE_COLUMN[name]]), []).append(row)
+
+    final = tenant_dir(name, tenant, root)
+    previous = current_version(final)
+    version = f"v{int(previous[1:]) + 1 if previous else 1}"
+    shutil.rmtree(os.path.join(final, version), ignore_errors=True)   # left by a crashed write
+    for month, month_rows in by_month.items():
+        directory = os.path.join(final, version, f"month={month}")
+        os.makedirs(directory)
+        batch = pa.Table.from_pylist(month_rows, schema=schema)
+        pq.write_table(batch, os.path.join(directory, 'part-0.parquet'),
+                       row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    os.makedirs(os.path.join(final, version), exist_ok=True)
+
+    # Swap: one atomic replace of the pointer; the previous version stays for running scans
+    write_bytes(os.path.join(final, POINTER_FILE), version.encode('utf-8'), keep=0)
+    for entry in os.listdir(final):
+        if entry not in (POINTER_FILE, version, previous):
+            shutil.rmtree(os.path.join(final, entry), ignore_errors=True)
+    return sum(len(month_rows) for month_rows in by_month.values())
+
+def live_files(path):
+    """Parquet files of the live version of every tenant under a table directory."""
+    files = []
+    for tenant in sorted(os.listdir(path)):
+        version = current_version(os.path.join(path, tenant))
+        if not tenant.startswith('tenant=') or version is None:
+            continue
+        for directory, subdirs, names in os.walk(os.path.join(path, tenant, version)):
+            subdirs.sort()
+            files.extend(os.path.join(directory, n) for n in sorted(names) if n.endswith('.parquet'))
+    return files
+
+def write_tenant(tenant, features, responses, clusters, root=PARQUET_DIR):
+    """Write all three tables for a tenant; returns {table: rows}."""
+    return {
+        'messages': write_table('messages', tenant, message_rows(features), root),
+        'qa_pairs': write_table('qa_pairs', tenant, qa_rows(responses), root),
+        'clusters': write_table('clusters', tenant, cluster_rows(clusters), root),
+    }
+
+def dataset(name, root=PARQUET_DIR):
+    path = os.path.join(root, name)
+    if not os.path.isdir(path):
+        sys.exit(f"No {name} dataset under {root} (run extract-all-managers.py --parquet)")
+    # Version directories carry no key=value, so hive partitioning skips them
+    return ds.dataset(live_files(path), schema=SCHEMAS[name].append(pa.field('tenant', pa.string()))
+                      .append(pa.field('month', pa.string())),
+                      format='parquet', partitioning=PARTITIONING, partition_base_dir=path)
+
+def filter_expression(name, tenant=None, since=None, until=None, sender=None, manager=None, keyword=None):
+    """Dataset filter; partition and statistics pruning apply to every term but the keyword."""
+    terms = []
+    if tenant:
+        terms.append(ds.field('tenant') == tenant)
+    date_column = ds.field(DATE_COLUMN[name])
+    if since:
+        since = to_date(since)
+        terms += [ds.field('month') >= month_of(since), date_column >= pa.scalar(since)]
+    if until:
+        until = to_date(until)
+        terms += [ds.field('month') <= month_of(until), date_column <= pa.scalar(until)]
+    if sender:
+        if name not in SENDER_COLUMN:
+            sys.exit(f"{name} has no sender column")
+        terms.append(ds.field(SENDER_COLUMN[name]) == sender)
+    if manager:
+        terms.append(ds.field('manager_id') == manager)
+    if keyword:
+        matches = [pc.match_substring(ds.field(column), keyword, ignore_case=True)
+                   for column in TEXT_COLUMNS[name]]
+        keyword_term = matches[0]
+        for match in matches[1:]:
+            keyword_term = keyword_term | match
+        terms.append(keyword_term)
+
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+def query(name, columns=None, root=PARQUET_DIR, **filters):
+    """pyarrow Table of the rows matching filters (see filter_expression)."""
+    return dataset(name, root).to_table(columns=columns, filter=filter_expression(name, **filters))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Query the Parquet message datasets written by extract-all-managers.py --parquet.
+
+Filters are pushed down into the scan (see parquet_store.py): --tenant and
+the month of --since/--until skip partition directories, dates, --sender and
+--manager skip row groups by their statistics, and only the printed columns
+are read. --keyword is a case-insensitive substring match on the text.
+
+Usage:
+  query-messages.py --manager hila --keyword קופה --since 2024-05-01 --until 2024-05-31
+  query-messages.py qa_pairs --keyword משמרת --tenant amir-bnei-brak
+  query-messages.py clusters --manager nevo --since 2024-01-01 --json
+  query-messages.py messages --sender "דני" --count
+"""
+
+import sys
+import json
+import time
+import argparse
+
+from parquet_store import PARQUET_DIR, SCHEMAS, query
+
+DEFAULT_COLUMNS = {
+    'messages': ['date', 'time', 'sender', 'text'],
+    'qa_pairs': ['date', 'manager_id', 'question', 'answer'],
+    'clusters': ['last_date', 'times_used', 'manager_name', 'answer'],
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('table', nargs='?', default='messages', choices=list(SCHEMAS))
+    parser.add_argument('--dir', default=PARQUET_DIR)
+    parser.add_argument('--tenant')
+    parser.add_argument('--since', help='first date, YYYY-MM-DD or DD.MM.YYYY')
+    parser.add_argument('--until', help='last date, inclusive')
+    parser.add_argument('--sender', help='exact sender (messages) or question sender (qa_pairs)')
+    parser.add_argument('--manager', help='manager id: nevo, hila, sari, yeshi')
+    parser.add_argument('--keyword')
+    parser.add_argument('--columns', help='comma-separated columns to print')
+    parser.add_argument('--limit', type=int, default=50, help='rows to print (0 for all)')
+    parser.add_argument('--count', action='store_true', help='print only the number of matches')
+    parser.add_argument('--json', action='store_true', help='one JSON object per line')
+    args = parser.parse_args()
+
+    columns = args.columns.split(',') if args.columns else DEFAULT_COLUMNS[args.table]
+    unknown = [c for c in columns if c not in SCHEMAS[args.table].names + ['tenant', 'month']]
+    if unknown:
+        sys.exit(f"Unknown {args.table} columns: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    result = query(args.table, columns=columns, root=args.dir, tenant=args.tenant, since=args.since,
+                   until=args.until, sender=args.sender, manager=args.manager, keyword=args.keyword)
+    elapsed = time.perf_counter() - start
+
+    if args.count:
+        print(result.num_rows)
+        return
+    rows = result.to_pylist()
+    shown = rows[:args.limit] if args.limit else rows
+    for row in shown:
+        if args.json:
+            print(json.dumps(row, ensure_ascii=False, default=str))
+        else:
+            print(" | ".join(str(row[c]) if row[c] is not None else '' for c in columns))
+    print(f"{len(shown)} of {result.num_rows} rows ({elapsed:.3f}s)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Per-company SQLite FTS5 (BM25) index over the knowledge base.
+
+Titles, contents and example questions are tokenized in Python with the
+same normalization and stemming as src/lib/ai-static.ts (hebrew_text.py) and
+stored as space-separated terms, each word next to its stem, in a
+contentless FTS5 table. A query goes through the same tokenizer and becomes
+one MATCH ranked by bm25(), instead of scoring every item per message.
+
+The index records the SHA-256 of the whatsapp-faqs.json it was built from
+and is rebuilt (into a temp file, then renamed) only when that changes;
+merge-knowledge.py, build-final-kb.py and build-final-structure.py refresh it
+after writing.
+
+Usage:
+  search_index.py [--company amir-bnei-brak] [--force]
+  search_index.py --query "מתי יש משלוחים?"
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+
+from hebrew_text import index_terms, query_terms
+
+KNOWLEDGE_FILE = "/Users/avivgranot/klear-ai/src/data/whatsapp-faqs.json"
+INDEX_DIR = "/Users/avivgranot/klear-ai/src/data/search"
+COMPANY = "amir-bnei-brak"
+
+# bm25() column weights: title, content, questions
+COLUMN_WEIGHTS = (2.0, 1.0, 1.5)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE items (
+    rowid INTEGER PRIMARY KEY,
+    item_id TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    type TEXT,
+    category TEXT,
+    frequency INTEGER
+);
+CREATE VIRTUAL TABLE fts USING fts5(
+    title, content, questions,
+    content='', tokenize='unicode61 remove_diacritics 0'
+);
+"""
+
+def index_path(company=COMPANY, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"{company}.sqlite")
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def indexed_source_hash(path):
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'source_sha256'").fetchone()
+        return row[0] if row else None
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+def terms(text):
+    return ' '.join(index_terms(text))
+
+def write_index(items, path, source_hash=None):
+    """Build a fresh index file for items (the whatsapp-faqs.json list) at path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        item_rows, fts_rows = [], []
+        for i, item in enumerate(items):
+            title = item.get('titleHe') or item.get('title') or ''
+            content = item.get('contentHe') or item.get('content') or ''
+            questions = ' '.join(item.get('example_questions') or [])
+            item_rows.append((i + 1, item.get('id') or f"kb-{i}", title, content,
+                              item.get('type'), item.get('category'), item.get('frequency', 0)))
+            fts_rows.append((i + 1, terms(title), terms(content), terms(questions)))
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?)", item_rows)
+        conn.executemany("INSERT INTO fts (rowid, title, content, questions) VALUES (?, ?, ?, ?)", fts_rows)
+        conn.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('source_sha256', source_hash),
+            ('items', str(len(items))),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+def build_index(source_file=KNOWLEDGE_FILE, company=COMPANY, index_dir=INDEX_DIR, force=False):
+    """Rebuild the company's index if source_file changed. Returns True when rebuilt."""
+    path = index_path(company, index_dir)
+    source_hash = file_sha256(source_file)
+    if not force and indexed_source_hash(path) == source_hash:
+        return False
+    with open(source_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    write_index(data['items'] if isinstance(data, dict) else data, path, source_hash)
+    return True
+
+def match_expression(query):
+    """Any query term, each as an FTS5 string (terms never contain quotes after normalization)."""
+    return ' OR '.join(f'"{term}"' for term in query_terms(query))
+
+def search(path, query, limit=5, category=None):
+    """Top items for query by BM25: dicts with item fields and score (higher is better)."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    sql = (
+        "SELECT items.item_id, items.title, items.content, items.type, items.category, "
+        f"bm25(fts, {', '.join(map(str, COLUMN_WEIGHTS))}) AS rank "
+        "FROM fts JOIN items ON items.rowid = fts.rowid "
+        "WHERE fts MATCH ?"
+    )
+    params = [expression]
+    if category:
+        sql += " AND items.category = ?"
+        params.append(category)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [
+        {'id': item_id, 'title': title, 'content': content, 'type': item_type,
+         'category': item_category, 'score': round(-rank, 4)}
+        for item_id, title, content, item_type, item_category, rank in rows
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=KNOWLEDGE_FILE)
+    parser.add_argument('--company', default=COMPANY)
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the source is unchanged')
+    parser.add_argument('--query', help='search the index instead of building it')
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+
+    path = index_path(args.company, args.index_dir)
+    if args.query:
+        for result in search(path, args.query, args.limit):
+            print(f"  [{result['score']:.2f}] {result['title'][:70]}")
+        return
+
+    if build_index(args.source, args.company, args.index_dir, force=args.force):
+        print(f"Indexed {args.source} -> {path} ({os.path.getsize(path) / 1024:.1f}KB)")
+    else:
+        print(f"Index up to date: {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'prisma', 'migrations')
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+def load_script(name):
+    """Import a hyphenated entry point (e.g. 'load-knowledge') as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(SCRIPTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def dev_db(tmp_path):
+    """A SQLite database built from the Prisma migrations, with one company ('acme')."""
+    import sqlite3
+    path = str(tmp_path / 'dev.db')
+    conn = sqlite3.connect(path)
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        migration = os.path.join(MIGRATIONS_DIR, name, 'migration.sql')
+        if os.path.exists(migration):
+            with open(migration, 'r', encoding='utf-8') as f:
+                conn.executescript(f.read())
+    conn.execute('INSERT INTO "Company" ("id", "name", "slug", "updatedAt") VALUES (?, ?, ?, ?)',
+                 ('company-1', 'Acme', 'acme', 0))
+    conn.commit()
+    conn.close()
+    return path
@@ -0,0 +1,38 @@
+import os
+import json
+
+from answer_lookup import build_table
+from knowledge_ids import carry_forward
+
+# Output of extract-all-managers.py, as checked in
+AUTOMATION_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                               'src', 'data', 'automation-knowledge.json')
+
+def extracted_items():
+    with open(AUTOMATION_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)['items']
+
+def test_fresh_extract_output_answers_nothing():
+    table, stats = build_table(extracted_items())
+    assert stats['patterns'] == 0
+    assert table['keys'] == {}
+
+def test_approval_carries_to_the_next_build(tmp_path):
+    previous = extracted_items()
+    for item in previous:
+        item['status'] = 'approved'
+    previous_file = tmp_path / 'automation-knowledge.json'
+    previous_file.write_text(json.dumps({'items': previous}, ensure_ascii=False), encoding='utf-8')
+
+    items = extracted_items()  # a re-extraction: every pattern pending again
+    assert carry_forward(items, str(previous_file), ('status',)) == len(items)
+    table, stats = build_table(items)
+    assert stats['patterns'] == len(items)
+    assert table['keys']
+
+def test_new_patterns_stay_pending(tmp_path):
+    previous_file = tmp_path / 'automation-knowledge.json'
+    previous_file.write_text(json.dumps({'items': []}), encoding='utf-8')
+    items = extracted_items()
+    assert carry_forward(items, str(previous_file), ('status',)) == 0
+    assert {item['status'] for item in items} == {'pending_approval'}
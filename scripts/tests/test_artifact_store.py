@@ -0,0 +1,13 @@
+from artifact_store import write_json, read_json, list_generations
+
+def test_same_named_files_keep_separate_generations(tmp_path):
+    generations = str(tmp_path / 'generations')
+    first, second = tmp_path / 'a' / 'company.json', tmp_path / 'b' / 'company.json'
+    for version in (1, 2):
+        write_json(str(first), {'first': version}, generations_dir=generations)
+        write_json(str(second), {'second': version}, generations_dir=generations)
+
+    assert list_generations(str(first), generations) == [1]
+    assert list_generations(str(second), generations) == [1]
+    assert read_json(str(first), 1, generations) == {'first': 1}
+    assert read_json(str(second), 1, generations) == {'second': 1}
@@ -0,0 +1,80 @@
+import json
+import sqlite3
+
+from conftest import load_script
+from knowledge_ids import record_build
+
+loader = load_script('load-knowledge')
+
+ITEMS = {
+    'a': {'titleHe': 'מתי פותחים?', 'contentHe': 'בשמונה', 'type': 'faq', 'frequency': 3},
+    'b': {'titleHe': 'איפה החניה?', 'contentHe': 'מאחורי הבניין', 'type': 'faq', 'frequency': 2},
+}
+
+def build(tmp_path, *names, **edits):
+    """Write a build of the named items (edits: name -> changed fields) and record it, as an extractor does."""
+    output = tmp_path / 'whatsapp-faqs.json'
+    items = [dict(ITEMS[name], **edits.get(name, {})) for name in names]
+    record_build(items, str(output), str(tmp_path / 'changes'))
+    output.write_text(json.dumps({'items': items}, ensure_ascii=False), encoding='utf-8')
+    return str(output)
+
+def load(tmp_path, dev_db, output):
+    return loader.load(loader.SqliteTarget(dev_db), 'acme', [output], changes=True,
+                       manifest_file=str(tmp_path / 'manifest.json'), changes_dir=str(tmp_path / 'changes'))
+
+def active(dev_db):
+    conn = sqlite3.connect(dev_db)
+    try:
+        return {content: bool(is_active) for content, is_active in
+                conn.execute('SELECT "contentHe", "isActive" FROM "KnowledgeItem"')}
+    finally:
+        conn.close()
+
+def test_dropped_item_is_reactivated_when_it_returns(tmp_path, dev_db):
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b'))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': True}
+
+    counts = load(tmp_path, dev_db, build(tmp_path, 'a'))
+    assert counts['deactivated'] == 1
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': False}
+
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b'))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': True}
+
+def test_admin_deactivation_survives_a_reload(tmp_path, dev_db):
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b'))
+    conn = sqlite3.connect(dev_db)
+    conn.execute('UPDATE "KnowledgeItem" SET "isActive" = 0 WHERE "contentHe" = ?', ('מאחורי הבניין',))
+    conn.commit()
+    conn.close()
+
+    # b changes, so the upsert touches its row
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b', b={'frequency': 5}))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': False}
+
+def priorities(dev_db):
+    conn = sqlite3.connect(dev_db)
+    try:
+        return dict(conn.execute('SELECT "contentHe", "priority" FROM "KnowledgeItem"'))
+    finally:
+        conn.close()
+
+def test_changes_refresh_priority_when_the_score_bucket_moves(tmp_path, dev_db):
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b', a={'score': 1.0}, b={'score': 1.0}))
+    assert priorities(dev_db) == {'בשמונה': 4, 'מאחורי הבניין': 4}
+
+    # a decays into a lower bucket, b moves within its bucket and is not resent
+    counts = load(tmp_path, dev_db, build(tmp_path, 'a', 'b', a={'score': 0.4}, b={'score': 1.5}))
+    assert counts['items'] == 1
+    assert priorities(dev_db) == {'בשמונה': 2, 'מאחורי הבניין': 4}
+
+def test_pending_patterns_wait_inactive_until_approved(tmp_path, dev_db):
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b', b={'status': 'pending_approval'}))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': False}
+
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b', b={'status': 'approved'}))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': True}
+
+    load(tmp_path, dev_db, build(tmp_path, 'a', 'b', b={'status': 'rejected'}))
+    assert active(dev_db) == {'בשמונה': True, 'מאחורי הבניין': False}
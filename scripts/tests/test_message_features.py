@@ -0,0 +1,15 @@
+from message_features import compute_features
+
+def test_continuation_lines_stay_with_their_message():
+    columns = compute_features([
+        "[01.01.2024, 09:00:00] דני: מה הנוהל לסגירת קופה?",
+        "[01.01.2024, 09:05:00] נבו פרץ: לסגור קופה לפי הנוהל:",
+        "1. לספור מזומן",
+        "2. להדפיס דוח Z",
+        "[01.01.2024, 09:06:00] יוסי: בהמתנה להודעה",
+        "שורה של הודעה שדולגה",
+        "[01.01.2024, 09:07:00] יוסי: תודה",
+    ])
+    assert columns['text'] == ["מה הנוהל לסגירת קופה?", "לסגור קופה לפי הנוהל:", "תודה"]
+    assert columns['continuation'] == ['', "\n1. לספור מזומן\n2. להדפיס דוח Z", '']
+    assert columns['manager_id'] == [None, 'nevo', None]
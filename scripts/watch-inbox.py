@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Watch an inbox for new WhatsApp exports and run the extraction pipeline.
+
+Managers (or the upload flow) drop exports into INBOX_DIR/<tenant>/, where
+<tenant> is the company slug: a _chat.txt, a WhatsApp .zip or an unpacked
+export folder. The inbox is polled every POLL_SECONDS; an export counts as
+uploaded once its size and mtime have not changed for SETTLE_SECONDS (and,
+for zips, the central directory is readable), so half-copied files are never
+parsed.
+
+A settled export queues its tenant. WORKERS asyncio workers run the
+pipeline (ingest_pipeline.py) as subprocesses, one run per tenant at a time,
+over all of that tenant's exports; checkpoints make the earlier exports free.
+A tenant that receives more exports while running is queued once more.
+Processed (path, size, mtime) signatures are kept in STATE_FILE, so a
+restarted daemon doesn't redo finished work.
+
+Usage:
+  watch-inbox.py [--inbox DIR] [--workers 2] [--no-load]
+  watch-inbox.py --once            # process what is there, then exit
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+from datetime import datetime
+
+from ingest_pipeline import export_candidates, is_complete, pipeline_steps
+from artifact_store import write_json
+
+INBOX_DIR = "/Users/avivgranot/Desktop/Klear-ai/inbox"
+STATE_FILE = "/Users/avivgranot/klear-ai/.cache/inbox-state.json"
+
+POLL_SECONDS = 1.0
+SETTLE_SECONDS = 3.0
+WORKERS = 2
+
+def log(message):
+    print(f"[{datetime.now().isoformat(timespec='seconds')}] {message}", flush=True)
+
+def signature(path):
+    """(size, mtime_ns) of a file, or of a folder's _chat.txt and entries."""
+    stat = os.stat(path)
+    if not os.path.isdir(path):
+        return [stat.st_size, stat.st_mtime_ns]
+    entries = [entry.stat() for entry in os.scandir(path)]
+    return [sum(e.st_size for e in entries), max([stat.st_mtime_ns] + [e.st_mtime_ns for e in entries])]
+
+class Inbox:
+    def __init__(self, inbox_dir, state_file, settle=SETTLE_SECONDS):
+        self.inbox_dir = inbox_dir
+        self.state_file = state_file
+        self.settle = settle
+        self.seen = {}          # path -> (signature, first seen unchanged at)
+        self.processed = {}     # path -> signature
+        self.failed = {}        # path -> signature, retried once the file changes
+        if os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
+                self.processed = json.load(f)
+
+    def tenant_exports(self, tenant):
+        directory = os.path.join(self.inbox_dir, tenant)
+        return sorted(export_candidates(directory), key=lambda p: os.stat(p).st_mtime_ns)
+
+    def scan(self, now):
+        """Tenants with at least one settled, unprocessed export."""
+        ready = set()
+        if not os.path.isdir(self.inbox_dir):
+            return ready
+        for entry in os.scandir(self.inbox_dir):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            for path in export_candidates(entry.path):
+                try:
+                    current = signature(path)
+                except FileNotFoundError:
+                    continue
+                previous = self.seen.get(path)
+                if previous is None or previous[0] != current:
+                    self.seen[path] = (current, now)
+                    continue
+                if current in (self.processed.get(path), self.failed.get(path)):
+                    continue
+                if now - previous[1] >= self.settle and is_complete(path):
+                    ready.add(entry.name)
+        return ready
+
+    def settled(self, tenant, now):
+        """The tenant's settled exports with their signatures, for a run."""
+        return {path: self.seen[path][0] for path in self.tenant_exports(tenant)
+                if path in self.seen and now - self.seen[path][1] >= self.settle}
+
+    def pending(self):
+        """Any export seen that is neither processed nor failed in its current form."""
+        return any(sig not in (self.processed.get(path), self.failed.get(path))
+                   for path, (sig, _) in self.seen.items())
+
+    def mark_processed(self, exports):
+        self.processed.update(exports)
+        write_json(self.state_file, self.processed, keep=0)
+
+async def run_step(tenant, name, argv):
+    started = time.monotonic()
+    proc = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.STDOUT)
+    output, _ = await proc.communicate()
+    if proc.returncode != 0:
+        tail = output.decode('utf-8', 'replace').strip().splitlines()[-5:]
+        raise RuntimeError(f"{name} exited with {proc.returncode}: " + " | ".join(tail))
+    log(f"{tenant}: {name} done in {time.monotonic() - started:.1f}s")
+
+class Daemon:
+    def __init__(self, inbox, workers=WORKERS, load=True):
+        self.inbox = inbox
+        self.workers = workers
+        self.load = load
+        self.queue = asyncio.Queue()
+        self.queued = set()     # tenants waiting in the queue
+        self.running = set()    # tenants a worker is on
+        self.stopping = asyncio.Event()
+
+    def enqueue(self, tenant):
+        if tenant not in self.queued:
+            self.queued.add(tenant)
+            self.queue.put_nowait(tenant)
+
+    async def process(self, tenant):
+        exports = self.inbox.settled(tenant, time.monotonic())
+        if all(self.inbox.processed.get(path) == sig for path, sig in exports.items()):
+            return
+        log(f"{tenant}: ingesting {len(exports)} export(s)")
+        try:
+            for name, argv in pipeline_steps(tenant, list(exports), load=self.load):
+                await run_step(tenant, name, argv)
+        except Exception:
+            self.inbox.failed.update(exports)
+            raise
+        self.inbox.mark_processed(exports)
+        log(f"{tenant}: published")
+
+    async def worker(self):
+        while True:
+            tenant = await self.queue.get()
+            self.queued.discard(tenant)
+            self.running.add(tenant)
+            try:
+                await self.process(tenant)
+            except Exception as e:
+                log(f"{tenant}: failed: {e}")
+            finally:
+                self.running.discard(tenant)
+                self.queue.task_done()
+
+    async def watch(self, once=False):
+        workers = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        log(f"Watching {self.inbox.inbox_dir} ({self.workers} workers)")
+        try:
+            while not self.stopping.is_set():
+                for tenant in self.inbox.scan(time.monotonic()):
+                    # A running tenant is picked up again by the next scan after it finishes
+                    if tenant not in self.running:
+                        self.enqueue(tenant)
+                if once and not self.queued and not self.running and not self.inbox.pending():
+                    break
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            await self.queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+async def serve(args):
+    daemon = Daemon(Inbox(args.inbox, args.state_file, args.settle), args.workers, load=not args.no_load)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, daemon.stopping.set)
+        except NotImplementedError:  # Windows
+            pass
+    await daemon.watch(once=args.once)
+    log("Stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inbox', default=INBOX_DIR)
+    parser.add_argument('--state-file', default=STATE_FILE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS, help='seconds a file must stay unchanged')
+    parser.add_argument('--no-load', action='store_true', help='only write the JSON artifacts, skip the DB load')
+    parser.add_argument('--once', action='store_true', help='exit once everything in the inbox is processed')
+    args = parser.parse_args()
+    if not os.path.isdir(args.inbox):
+        sys.exit(f"Inbox not found: {args.inbox}")
+    asyncio.run(serve(args))
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,29 @@ import { join } from "path"
 import { v4 as uuidv4 } from "uuid"
 import prisma from "@/lib/prisma"
 
+// Chat exports are mined asynchronously by scripts/ingest-service.py
+const INGEST_SERVICE_URL = process.env.INGEST_SERVICE_URL || "http://127.0.0.1:8765"
+const CHAT_EXPORT_EXTENSIONS = ["zip", "txt"]
+
+async function enqueueIngestion(companyId: string, exportPath: string) {
+  try {
+    const res = await fetch(`${INGEST_SERVICE_URL}/jobs`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ tenant: companyId, export: exportPath }),
+    })
+    if (!res.ok) {
+      console.error("Ingestion enqueue failed:", res.status, await res.text())
+      return null
+    }
+    return await res.json()
+  } catch (error) {
+    // The upload itself succeeded; the export can be re-queued once the service is up
+    console.error("Ingestion service unavailable:", error)
+    return null
+  }
+}
+
 export async function POST(request: NextRequest) {
   try {
     const formData = await request.formData()
@@ -47,9 +70,14 @@ export async function POST(request: NextRequest) {
       },
     })
 
+    const ingestJob = CHAT_EXPORT_EXTENSIONS.includes(ext.toLowerCase())
+      ? await enqueueIngestion(companyId, filepath)
+      : null
+
     return NextResponse.json({
       mediaItem,
       url: mediaItem.url,
+      ingestJob,
     }, { status: 201 })
   } catch (error) {
     console.error("Upload error:", error)